@@ -0,0 +1,175 @@
+# agents/history_manager.py
+#
+# Token-budgeted conversation history for the orchestrator loop.
+# The orchestrator resends the whole history every step, so raw tool payloads (full
+# task tables, worksheets, summaries) made each request grow quadratically. This keeps
+# tool outputs compact once the model has seen them and trims old turns once a token
+# budget is hit.
+
+import json
+
+from google.genai import types
+
+DEFAULT_TOKEN_BUDGET = 8000
+MAX_TOOL_OUTPUT_CHARS = 2000     # longer tool outputs are cut to head + tail
+MIN_TOOL_OUTPUT_CHARS = 200      # floor when the newest results must shrink to fit the budget
+CHARS_PER_TOKEN = 4              # cheap local estimate; no count_tokens round trip
+
+# Columns kept when a list of task rows is reduced to references
+TASK_REFERENCE_FIELDS = ("id", "subject", "deadline", "priority")
+
+
+def estimate_tokens(content: types.Content) -> int:
+    """Approximate token count of one history entry."""
+    return len(content.model_dump_json(exclude_none=True)) // CHARS_PER_TOKEN + 1
+
+
+def _truncate(text: str, limit: int = MAX_TOOL_OUTPUT_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    head, tail = text[: limit * 3 // 4], text[-(limit // 4):]
+    return f"{head}\n...[{len(text) - len(head) - len(tail)} chars truncated]...\n{tail}"
+
+
+def compact_tool_output(func_name: str, tool_output, limit: int = MAX_TOOL_OUTPUT_CHARS):
+    """
+    Shrinks a tool result for the history. Task listings become lists of task references
+    (ID + the fields the model needs to pick one); any other payload longer than `limit`
+    characters is truncated.
+    """
+    if func_name == "retrieve_active_tasks" and isinstance(tool_output, str):
+        try:
+            tasks = json.loads(tool_output)
+        except json.JSONDecodeError:
+            tasks = None
+        if isinstance(tasks, list):
+            return [{k: t.get(k) for k in TASK_REFERENCE_FIELDS} for t in tasks if isinstance(t, dict)]
+
+    if isinstance(tool_output, str):
+        return _truncate(tool_output, limit)
+
+    serialized = json.dumps(tool_output, default=str)
+    if len(serialized) > limit:
+        return _truncate(serialized, limit)
+    return tool_output
+
+
+class ConversationHistory:
+    """
+    Orchestrator history with an incrementally maintained token estimate.
+
+    Entries are the initial user prompt followed by (model turn, tool results) pairs.
+    The newest tool results are sent in full (the model is about to answer from them);
+    they are compacted with compact_tool_output() once a newer turn arrives.
+
+    When the estimate exceeds `token_budget`, the oldest tool results are first replaced
+    by short stubs, then the oldest pairs are dropped entirely. The user prompt and the
+    most recent pair are always kept, so the model never sees a dangling function call.
+    If that pair alone still overflows, the newest results are truncated to the room
+    that is left.
+    """
+
+    def __init__(self, user_prompt: str, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        first = types.Content(role="user", parts=[types.Part.from_text(text=user_prompt)])
+        self._entries = [[first, estimate_tokens(first)]]
+        self.token_count = self._entries[0][1]
+        # (content, results, limit) of the newest tool turn; limit is None while uncut
+        self._latest_results = None
+
+    @property
+    def contents(self) -> list:
+        return [content for content, _ in self._entries]
+
+    def add_model_turn(self, content: types.Content) -> None:
+        self._append(content)
+
+    def add_tool_results(self, results: list) -> None:
+        """Appends one turn of (func_name, tool_output, error) results as function responses."""
+        # The previous turn's results are now older context: compact them
+        if self._latest_results is not None:
+            previous, previous_results, previous_limit = self._latest_results
+            limit = min(MAX_TOOL_OUTPUT_CHARS, previous_limit or MAX_TOOL_OUTPUT_CHARS)
+            for index, (content, _) in enumerate(self._entries):
+                if content is previous:
+                    self._replace(index, self._tool_content(previous_results, limit))
+                    break
+
+        content = self._tool_content(results)
+        self._append(content)
+        self._latest_results = (content, results, None)
+        self._enforce_budget()
+        self._fit_latest_results()
+
+    @staticmethod
+    def _tool_content(results: list, limit: int = None) -> types.Content:
+        """Function responses for one turn; outputs are compacted to `limit` chars unless it is None."""
+        return types.Content(
+            role="user", # The tools' output is context for the next user turn
+            parts=[
+                types.Part.from_function_response(
+                    name=func_name,
+                    response={"result": tool_output if limit is None else compact_tool_output(func_name, tool_output, limit)}
+                )
+                for func_name, tool_output, _ in results
+            ]
+        )
+
+    def _append(self, content: types.Content) -> None:
+        tokens = estimate_tokens(content)
+        self._entries.append([content, tokens])
+        self.token_count += tokens
+
+    def _replace(self, index: int, content: types.Content) -> None:
+        tokens = estimate_tokens(content)
+        self.token_count += tokens - self._entries[index][1]
+        self._entries[index] = [content, tokens]
+
+    def _enforce_budget(self) -> None:
+        # Entries: [prompt, model, tools, model, tools, ...]; the last pair is never touched.
+        last_pair_start = len(self._entries) - 2
+
+        # 1. Stub out old tool results (odd model / even tool indexes after the prompt)
+        for index in range(2, last_pair_start, 2):
+            if self.token_count <= self.token_budget:
+                return
+            self._replace(index, self._stub(self._entries[index][0]))
+
+        # 2. Drop the oldest (model, tools) pairs
+        while self.token_count > self.token_budget and len(self._entries) > 3:
+            for _ in range(2):
+                self.token_count -= self._entries.pop(1)[1]
+
+    def _fit_latest_results(self) -> None:
+        """Truncates the newest tool results (evenly per call) to whatever room the budget leaves."""
+        if self.token_count <= self.token_budget:
+            return
+        content, results, _ = self._latest_results
+        index = len(self._entries) - 1
+        room_tokens = self.token_budget - (self.token_count - self._entries[index][1])
+        limit = max(MIN_TOOL_OUTPUT_CHARS, room_tokens * CHARS_PER_TOKEN // len(results))
+
+        # Serialization adds escaping and part overhead, so shrink until the turn fits
+        while True:
+            content = self._tool_content(results, limit)
+            if estimate_tokens(content) <= room_tokens or limit == MIN_TOOL_OUTPUT_CHARS:
+                break
+            limit = max(MIN_TOOL_OUTPUT_CHARS, limit * 3 // 4)
+
+        print(f"[HISTORY] Newest tool results exceed the token budget; truncated to {limit} chars per call.")
+        self._replace(index, content)
+        self._latest_results = (content, results, limit)
+
+    @staticmethod
+    def _stub(content: types.Content) -> types.Content:
+        parts = []
+        for part in content.parts:
+            if part.function_response is None:
+                parts.append(part)
+                continue
+            preview = json.dumps(part.function_response.response, default=str)[:200]
+            parts.append(types.Part.from_function_response(
+                name=part.function_response.name,
+                response={"result": f"[older output omitted to save context; began: {preview}]"}
+            ))
+        return types.Content(role=content.role, parts=parts)
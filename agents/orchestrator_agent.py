@@ -1,15 +1,22 @@
-from google import genai
+from tools.gemini_client import generate_content, generate_content_async
 from google.genai import types
 from tools import orchestrator_tools
+from tools import tracing
+from agents.history_manager import ConversationHistory
+from database.memory_service import bind_student
+import asyncio
 import json
-import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging # Import logging to handle potential warnings cleanly
 # Configure logging to suppress the frequent 'non-text parts' warning
 # NOTE: This is optional but makes the console output much cleaner.
 logging.getLogger("google_genai.types").setLevel(logging.ERROR)
 
 
-client = genai.Client()
+ORCHESTRATOR_MODEL = "gemini-2.0-flash"
+MAX_STEPS = 5 # Limit the number of steps to prevent infinite loops
+HISTORY_TOKEN_BUDGET = 8000 # Upper bound on the resent conversation, see agents/history_manager.py
 
 # Define the list of tools the orchestrator can call
 ORCHESTRATOR_TOOLS = [
@@ -19,20 +26,86 @@ ORCHESTRATOR_TOOLS = [
     orchestrator_tools.schedule_task_tool,
     orchestrator_tools.get_progress_report_tool,
     orchestrator_tools.complete_task_tool,
+    orchestrator_tools.list_study_steps_tool,
+    orchestrator_tools.complete_study_step_tool,
     orchestrator_tools.generate_practice_worksheet,
-    
+    orchestrator_tools.set_reminder_tool,
 ]
 
-def run_orchestrator(user_prompt: str, file_path: str) -> str:
+# Independent tool calls from the same model turn run concurrently on this bounded pool.
+MAX_PARALLEL_TOOLS = 4
+_tool_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOLS, thread_name_prefix="orchestrator-tool")
+
+def _execute_function_call(function_call) -> tuple:
     """
-    The main loop for the Orchestrator Agent. It uses Function Calling
-    to determine the necessary sequence of actions and iteratively calls the model.
+    Executes a single tool call requested by the model.
+
+    Returns:
+        (func_name, tool_output, error) where `error` is a message that must end the
+        orchestrator run (unknown tool, failed extraction) or None.
     """
+    func_name = function_call.name
+    func_args = dict(function_call.args or {})
+
+    print(f"[ORCHESTRATOR] Delegating task to tool: {func_name} with args: {func_args}")
+
+    # Use getattr() to find and execute the actual Python function
+    tool_function = getattr(orchestrator_tools, func_name, None)
+
+    if not tool_function:
+        return func_name, None, f"Error: Tool '{func_name}' not found."
+
+    # Execute the tool function
+    with tracing.span(f"tool:{func_name}"):
+        tool_output = tool_function(**func_args)
+
+    # =========================================================
+    # === CRITICAL FIX: Intercept Extraction Tool Output ===
+    # =========================================================
+    if func_name == 'extract_assignment_data_tool':
+        # The tool_output is a dictionary (from task_extractor_tool.py)
+
+        if "error" in tool_output:
+            # Case 1: The extractor tool failed (e.g., file not found, API error)
+            return func_name, tool_output, f"ERROR: Assignment data extraction failed: {tool_output['error']}"
+
+        # Note: memory_service.insert_task returns the new task_id (integer)
+        # If the database insertion failed (NOT NULL error), it returns -1.
+        if isinstance(tool_output, int) and tool_output == -1:
+            # Case 2: The database insertion failed (This is the source of the persistent crash)
+            return func_name, tool_output, "ERROR: Failed to save task data to the database due to missing required fields (e.g., deadline). Check database constraints."
+
+        # Case 3: SUCCESS. The output is the task_id. We must now pass the ID and the full data to the scheduler.
+        task_id = tool_output
+
+        # Construct a function response that FORCES the LLM to schedule next.
+        tool_output = {
+            "task_id": task_id,
+            "status": "Task successfully saved to database. Proceed to scheduling."
+        }
+
+    print(f"[ORCHESTRATOR] Tool output received (length: {len(tool_output)} chars).")
+    return func_name, tool_output, None
+
+def _execute_function_calls(function_calls) -> list:
+    """Runs all tool calls of one model turn concurrently; results keep the call order."""
+    if len(function_calls) == 1:
+        # No thread hop for the common single-call turn
+        return [_execute_function_call(function_calls[0])]
+
+    print(f"[ORCHESTRATOR] Running {len(function_calls)} tool calls in parallel.")
+    # Pool threads do not inherit the stream sink (a ContextVar), so concurrent tool
+    # outputs are not streamed on top of each other; they appear in the final answer.
+    # The student scope and the trace are carried over explicitly, so each tool reads
+    # and writes this request's student's rows and its spans join this request's trace.
+    futures = [
+        _tool_executor.submit(tracing.bind(bind_student(_execute_function_call)), call)
+        for call in function_calls
+    ]
+    return [future.result() for future in futures]
 
-    # current_time_str = datetime.now().strftime("%A, %B %d, %Y, %H:%M:%S")
-    
-    # --- 1. Initial Prompt Setup ---
-    system_instruction = (
+def _build_system_instruction(file_path: str) -> str:
+    return (
         "You are the Orchestrator Agent. Your task is to analyze the user's request "
         "and determine the exact sequence of tool calls needed to fulfill it. "
         "The file involved is located at: "
@@ -41,115 +114,129 @@ def run_orchestrator(user_prompt: str, file_path: str) -> str:
 
         "CRITICAL RULE: When 'extract_assignment_data_tool' is called, its result will contain the 'task_id'. "
         "You MUST parse this 'task_id' and the full task details from the output "
-        "and use them as arguments for the 'schedule_task_tool' in the subsequent step."
-        
-       
+        "and use them as arguments for the 'schedule_task_tool' in the subsequent step. "
+        # Needed to turn 'remind me tomorrow at 9' into set_reminder_tool arguments
+        f"The current local time is {datetime.now().strftime('%Y-%m-%d %H:%M')}."
     )
-    
-    # Start the conversation history with only the user prompt.
-    history = [
-        types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=user_prompt)]
-        )
-    ]
 
-    max_steps = 5 # Limit the number of steps to prevent infinite loops
+def _orchestrator_config(system_instruction: str) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        tools=ORCHESTRATOR_TOOLS,
+        system_instruction=system_instruction,
+        # We execute tools ourselves (in parallel); the SDK must hand the calls back
+        automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+    )
 
-    for step in range(max_steps):
-        # print(f"\n[ORCHESTRATOR] STEP {step + 1}: Asking Gemini for next action...")
+def _final_answer(response) -> str:
+    """Final text of a response without function calls, or an explanation of why there is none."""
+    # We check the content parts directly to avoid the `.text` warning
+    if response.text:
+        print("[ORCHESTRATOR] Received final text response.")
+        # Use the .text shortcut, now that we've checked for function calls
+        # The warning is suppressed by the logging configuration above.
+        return response.text
+
+    # Check for block reasons if no text or function call is present
+    finish_reason = response.candidates[0].finish_reason.name
+    if finish_reason == "SAFETY":
+        return "The response was blocked due to safety settings."
+    elif finish_reason == "RECITATION":
+        return "The response was blocked due to potential data recitation."
+    return f"Orchestrator failed to produce an output or call a tool. Finish reason: {finish_reason}"
+
+@tracing.traced("orchestrator")
+def run_orchestrator(user_prompt: str, file_path: str) -> str:
+    """
+    The main loop for the Orchestrator Agent. It uses Function Calling
+    to determine the necessary sequence of actions and iteratively calls the model.
+    """
+
+    # --- 1. Initial Prompt Setup ---
+    config = _orchestrator_config(_build_system_instruction(file_path))
+
+    # Start the conversation history with only the user prompt.
+    # Tool payloads are compacted and old turns trimmed to stay within the token budget.
+    history = ConversationHistory(user_prompt, token_budget=HISTORY_TOKEN_BUDGET)
+
+    for step in range(MAX_STEPS):
+        print(f"[ORCHESTRATOR] Step {step + 1}: prompt history ~{history.token_count} tokens.")
 
         # --- 2. Call the Model with Tools and System Instruction ---
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=history,
-            config=types.GenerateContentConfig(
-                tools=ORCHESTRATOR_TOOLS,
-                system_instruction=system_instruction
-            )
+        # stream=True: when the caller installed a sink (stream_to), the final answer is
+        # shown as it is generated; function calls are still collected from the chunks.
+        response = generate_content(
+            model=ORCHESTRATOR_MODEL,
+            contents=history.contents,
+            config=config,
+            stream=True
         )
-        
-        # --- Get Candidate Content for consistent access ---
-        candidate_content = response.candidates[0].content
-        
+
         # --- 3. Check for Function Calls ---
         if response.function_calls:
-            # We process the first function call only for simplicity
-            function_call = response.function_calls[0]
-            func_name = function_call.name
-            func_args = dict(function_call.args)
-
-            print(f"[ORCHESTRATOR] Delegating task to tool: {func_name} with args: {func_args}")
-
-            # Use getattr() to find and execute the actual Python function
-            tool_function = getattr(orchestrator_tools, func_name, None) # Corrected to one call
-
-            if tool_function:
-                # Execute the tool function
-                tool_output = tool_function(**func_args)
-
-                # =========================================================
-                # === CRITICAL FIX: Intercept Extraction Tool Output ===
-                # =========================================================
-                if func_name == 'extract_assignment_data_tool':
-                    # The tool_output is a dictionary (from task_extractor_tool.py)
-                    
-                    if "error" in tool_output:
-                        # Case 1: The extractor tool failed (e.g., file not found, API error)
-                        return f"ERROR: Assignment data extraction failed: {tool_output['error']}"
-
-                    # Note: memory_service.insert_task returns the new task_id (integer)
-                    # If the database insertion failed (NOT NULL error), it returns -1.
-                    if isinstance(tool_output, int) and tool_output == -1:
-                        # Case 2: The database insertion failed (This is the source of the persistent crash)
-                        return "ERROR: Failed to save task data to the database due to missing required fields (e.g., deadline). Check database constraints."
-
-                    # Case 3: SUCCESS. The output is the task_id. We must now pass the ID and the full data to the scheduler.
-                    task_id = tool_output
-                    
-                    # You MUST get the full task data back from the DB to pass to the Scheduler.
-                    # Since that logic is missing, we'll force the next call:
-                    
-                    # Construct a function response that FORCES the LLM to schedule next.
-                    tool_output_for_llm = {
-                        "task_id": task_id,
-                        "status": "Task successfully saved to database. Proceed to scheduling."
-                    }
-                    tool_output = tool_output_for_llm # Use this for the model response below
-
-                print(f"[ORCHESTRATOR] Tool output received (length: {len(tool_output)} chars).")
-
-                # Append both the model's call and the function's result to the history
-                history.append(candidate_content) # The model's call is already structured
-                history.append(types.Content(
-                    role="user", # The tool's output is context for the next user turn
-                    parts=[ 
-                        types.Part.from_function_response(
-                            name=func_name,
-                            response={"result": tool_output}
-                        )
-                    ]
-                ))
-                # Continue the loop to send the tool output back to the model
-                continue 
-            else:
-                return f"Error: Tool '{func_name}' not found."
-
-        # --- 4. Check for Final Text Response (Only if no tool call was made) ---
-        # We check the content parts directly to avoid the `.text` warning
-        elif response.text:
-            print("[ORCHESTRATOR] Received final text response.")
-            # Use the .text shortcut, now that we've checked for function calls
-            # The warning is suppressed by the logging configuration above.
-            return response.text
-        
-        else:
-            # Check for block reasons if no text or function call is present
-            finish_reason = response.candidates[0].finish_reason.name
-            if finish_reason == "SAFETY":
-                 return "The response was blocked due to safety settings."
-            elif finish_reason == "RECITATION":
-                 return "The response was blocked due to potential data recitation."
-            return f"Orchestrator failed to produce an output or call a tool. Finish reason: {finish_reason}"
-
-    return "Orchestrator reached maximum steps without completing the task."
\ No newline at end of file
+            # Run every call the model emitted this turn, concurrently, and answer them all at once
+            results = _execute_function_calls(response.function_calls)
+
+            for func_name, tool_output, error in results:
+                if error:
+                    return error
+
+            # Append both the model's calls and the functions' results to the history
+            history.add_model_turn(response.candidates[0].content)
+            history.add_tool_results(results)
+            # Continue the loop to send the tool outputs back to the model
+            continue
+
+        # --- 4. Final Text Response (Only if no tool call was made) ---
+        return _final_answer(response)
+
+    return "Orchestrator reached maximum steps without completing the task."
+
+# =========================================================
+# === Async engine (one event loop, many student sessions) ===
+# =========================================================
+# Model calls go through generate_content_async (client.aio) and never block the loop.
+# The tools themselves are synchronous (SQLite, uploads, sub-agents), so their async
+# wrappers run them on a dedicated, bounded pool instead of one OS thread per request.
+
+ASYNC_TOOL_WORKERS = 32
+_async_tool_executor = ThreadPoolExecutor(max_workers=ASYNC_TOOL_WORKERS, thread_name_prefix="orchestrator-async-tool")
+
+async def _execute_function_calls_async(function_calls) -> list:
+    """Async wrapper around the tools: all calls of a turn run concurrently off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*[
+        loop.run_in_executor(_async_tool_executor, tracing.bind(bind_student(_execute_function_call)), call)
+        for call in function_calls
+    ])
+
+@tracing.traced("orchestrator")
+async def run_orchestrator_async(user_prompt: str, file_path: str) -> str:
+    """
+    Async version of run_orchestrator. Same tools, prompts and step limit, but model
+    round trips and retry waits are awaited, so one event loop can serve many sessions.
+    """
+    config = _orchestrator_config(_build_system_instruction(file_path))
+
+    history = ConversationHistory(user_prompt, token_budget=HISTORY_TOKEN_BUDGET)
+
+    for step in range(MAX_STEPS):
+        response = await generate_content_async(
+            model=ORCHESTRATOR_MODEL,
+            contents=history.contents,
+            config=config
+        )
+
+        if response.function_calls:
+            results = await _execute_function_calls_async(response.function_calls)
+
+            for func_name, tool_output, error in results:
+                if error:
+                    return error
+
+            history.add_model_turn(response.candidates[0].content)
+            history.add_tool_results(results)
+            continue
+
+        return _final_answer(response)
+
+    return "Orchestrator reached maximum steps without completing the task."
@@ -1,13 +1,25 @@
 # agents/progress_agent.py
 
-from google import genai
-from database.memory_service import get_all_active_tasks, get_schedule_by_task_id
+from tools.gemini_client import generate_content
+from database.memory_service import (
+    get_all_active_tasks, get_schedule_by_task_id, get_data_version, get_cached_progress_report, save_progress_report
+)
+from tools import tracing
 import json
 from datetime import datetime
 from tools import orchestrator_tools
 from google.genai.errors import APIError
+from agents.task_context import build_task_context, build_schedule_context, SCHEDULE_ITEM_COLUMNS
 
-client = genai.Client()
+REPORT_WINDOW_DAYS = 14
+MAX_REPORT_TASKS = 15
+# A stored report is reused while the student's data version is unchanged and the time
+# stays in the same block of the day, so "today" and "due in N hours" stay correct.
+REPORT_CACHE_BUCKET_MINUTES = 180
+
+
+def _time_bucket(now: datetime) -> str:
+    return f"{now:%Y-%m-%d}/{(now.hour * 60 + now.minute) // REPORT_CACHE_BUCKET_MINUTES}"
 
 
 def generate_progress_report(task_id: int = None) -> str:
@@ -16,21 +28,44 @@ def generate_progress_report(task_id: int = None) -> str:
     If task_id is provided, it focuses on that task. Otherwise, it reviews all active tasks.
     """
     print("\n[PROGRESS AGENT] Generating progress report...")
-    
-    active_tasks = get_all_active_tasks()
-    
-    if not active_tasks:
+
+    # Read the version before the data: a write that lands while this report is being
+    # generated bumps it, so the report saved below can never be served for that write.
+    data_version = get_data_version()
+    time_bucket = _time_bucket(datetime.now())
+    cached = get_cached_progress_report(task_id or 0, data_version, time_bucket)
+    if cached is not None:
+        print("[PROGRESS AGENT] Nothing changed since the last report; reusing it.")
+        tracing.current().add("progress_report_cache_hits")
+        return cached
+    tracing.current().add("progress_report_cache_misses")
+
+    # Prepare context for the LLM: a compact table of the tasks due soon, highest priority first.
+    # If nothing is due in the window, fall back to the next tasks regardless of deadline.
+    tasks_context, task_count = build_task_context(window_days=REPORT_WINDOW_DAYS, max_tasks=MAX_REPORT_TASKS)
+    if task_count == 0:
+        tasks_context, task_count = build_task_context(window_days=None, max_tasks=MAX_REPORT_TASKS)
+
+    if task_count == 0:
         return "You have no active assignments. Enjoy your free time!"
 
-    # Prepare context for the LLM
-    tasks_context = json.dumps(active_tasks, indent=2)
+    # Only the relevant slice of the stored plans: today's steps across all tasks, or the
+    # remaining steps of the requested task.
+    cols = "|".join(SCHEDULE_ITEM_COLUMNS)
     schedule_context = ""
-    
     if task_id:
-        # If a specific ID is requested, get its schedule
-        schedule_text = get_schedule_by_task_id(task_id)
-        if schedule_text and "No schedule found" not in schedule_text:
-            schedule_context = f"\n\n--- SPECIFIC SCHEDULE FOR TASK ID {task_id} ---\n{schedule_text}"
+        items_context, item_count = build_schedule_context(task_id=task_id)
+        if item_count:
+            schedule_context = f"\n\n--- REMAINING PLAN FOR TASK ID {task_id} ({cols}) ---\n{items_context}"
+        else:
+            # Plans saved before schedule steps were stored as rows only exist as text
+            schedule_text = get_schedule_by_task_id(task_id)
+            if schedule_text and "No schedule found" not in schedule_text:
+                schedule_context = f"\n\n--- SPECIFIC SCHEDULE FOR TASK ID {task_id} ---\n{schedule_text}"
+    else:
+        items_context, item_count = build_schedule_context()
+        if item_count:
+            schedule_context = f"\n\n--- PLANNED FOR TODAY ({cols}) ---\n{items_context}"
 
     # --- Construct the LLM Prompt ---
     current_date = datetime.now().strftime("%A, %B %d, %Y, %H:%M:%S")
@@ -60,18 +95,22 @@ def generate_progress_report(task_id: int = None) -> str:
     
     user_prompt = (
         "Analyze the following data and generate the report and/or call the necessary tool. "
-        "\n\n--- ALL ACTIVE TASKS ---\n"
+        "\n\n--- ACTIVE TASKS DUE SOON (id|subject|task_type|deadline|priority) ---\n"
         f"{tasks_context}"
         f"{schedule_context}"
     )
 
     # --- 3. Execute the Tool-Calling Loop ---
-    # The progress agent now acts as a mini-orchestrator using its own tools
-    
-    response = client.models.generate_content(
+    # The progress agent now acts as a mini-orchestrator using its own tools.
+    # The instruction goes in the config, so it is sent once per call rather than as a
+    # user turn repeated in every call's contents.
+    config = {"system_instruction": SYSTEM_INSTRUCTION, "tools": PROGRESS_AGENT_TOOLS}
+
+    response = generate_content(
         model="gemini-2.0-flash", 
-        contents=[SYSTEM_INSTRUCTION, user_prompt],
-        config={"tools": PROGRESS_AGENT_TOOLS}
+        contents=[user_prompt],
+        config=config,
+        stream=True
     )
     
     # Simple loop to handle one tool call
@@ -88,17 +127,23 @@ def generate_progress_report(task_id: int = None) -> str:
             tool_output = orchestrator_tools.generate_practice_worksheet(**tool_args)
             
             # Now, send the tool output back to the LLM to format the final report
-            final_response = client.models.generate_content(
+            final_response = generate_content(
                 model="gemini-2.0-flash",
                 contents=[
-                    SYSTEM_INSTRUCTION, 
                     user_prompt, 
                     response.candidates[0].content, # The original tool call
                     {"functionResponse": {"name": tool_name, "response": {"content": tool_output}}} # Tool Result
                 ],
-                config={"tools": PROGRESS_AGENT_TOOLS}
+                config=config,
+                stream=True
             )
-            return final_response.text
+            return _save_report(task_id, data_version, time_bucket, final_response.text)
 
     # If no tool was called (or if the tool loop completes without a second call), return the text.
-    return response.text
\ No newline at end of file
+    return _save_report(task_id, data_version, time_bucket, response.text)
+
+
+def _save_report(task_id: int, data_version: int, time_bucket: str, report: str) -> str:
+    if report:
+        save_progress_report(task_id or 0, data_version, time_bucket, report)
+    return report
\ No newline at end of file
@@ -0,0 +1,105 @@
+# agents/router_agent.py
+#
+# Local fast path in front of the orchestrator.
+# Most inputs are one-line commands ("I finished Task ID 4", "show me my assignments")
+# that map to exactly one tool. Those are recognised with rules and the tool is called
+# directly, skipping the orchestrator's model round trips. Anything the rules are not
+# sure about (files, several requests in one message, negations, unknown phrasing)
+# returns None and goes to the LLM orchestrator as before.
+
+import json
+import re
+
+from tools import orchestrator_tools
+
+# Phrases that mean the message is more than one simple command
+COMPOUND_MARKERS = re.compile(r"\b(and|then|also|after that|plus)\b|[;&]")
+NEGATION_MARKERS = re.compile(r"\b(not|never|didn'?t|haven'?t|hasn'?t|undo|unmark|reopen)\b|n't\b")
+FILE_MARKERS = re.compile(r"\b(upload(ed)?|file|pdf|document)\b|\.\w{2,4}\b")
+
+TASK_ID = r"task\s*(?:id\s*)?#?\s*(\d+)"
+
+# (intent, pattern) - patterns are matched against the normalised, lower-case input
+INTENT_RULES = [
+    ("complete_task", re.compile(
+        rf"^(?:i(?:'ve| have)?\s+)?(?:just\s+)?(?:finished|completed|done with|submitted)\s+{TASK_ID}"
+        r"(?:\.?\s*(?:please\s+)?mark it\s+(?:as\s+)?(?:done|complete|completed))?$"
+        rf"|^(?:please\s+)?(?:mark|set)\s+{TASK_ID}\s+(?:as\s+)?(?:done|complete|completed|finished)$"
+        rf"|^(?:please\s+)?complete\s+{TASK_ID}$"
+        rf"|^{TASK_ID}\s+(?:is\s+)?(?:done|complete|completed|finished)$"
+    )),
+    ("list_tasks", re.compile(
+        r"^(?:(?:just|please|can you|could you)\s+)*(?:show|list|display|give|get|view)\s+(?:me\s+)?"
+        r"(?:all\s+)?(?:of\s+)?(?:my\s+)?(?:active\s+|current\s+|open\s+|pending\s+)?(?:tasks|assignments)$"
+        r"|^what\s+(?:are|is)\s+(?:all\s+)?my\s+(?:active\s+|current\s+|open\s+|pending\s+)?(?:tasks|assignments)$"
+    )),
+    ("progress_report", re.compile(
+        r"^(?:(?:just|please|can you|could you)\s+)*(?:(?:give|get|show)\s+(?:me\s+)?)?(?:a\s+|my\s+)?"
+        r"(?:quick\s+|detailed\s+)?(?:progress\s+(?:update|report)|status\s+update|reminder)"
+        rf"(?:\s+(?:for|on)\s+(?:my\s+)?(?:upcoming\s+deadlines|{TASK_ID}))?$"
+        rf"|^how\s+am\s+i\s+doing(?:\s+(?:on|with)\s+{TASK_ID})?$"
+    )),
+]
+
+
+def normalise(user_input: str) -> str:
+    text = user_input.strip().lower()
+    text = re.sub(r"[.!?,]+$", "", text)        # trailing punctuation
+    return re.sub(r"\s+", " ", text)
+
+
+def classify(user_input: str):
+    """
+    Returns (intent, task_id or None) when the input is unambiguously one simple
+    command, otherwise None.
+    """
+    text = normalise(user_input)
+    if not text or COMPOUND_MARKERS.search(text) or NEGATION_MARKERS.search(text) or FILE_MARKERS.search(text):
+        return None
+
+    for intent, pattern in INTENT_RULES:
+        match = pattern.match(text)
+        if match:
+            task_id = next((int(group) for group in match.groups() if group), None)
+            return intent, task_id
+    return None
+
+
+def _format_tasks(tasks_json: str) -> str:
+    tasks = json.loads(tasks_json)
+    if not tasks:
+        return "You have no active assignments. Enjoy your free time!"
+    lines = [f"You have {len(tasks)} active assignment{'s' if len(tasks) != 1 else ''}:"]
+    for t in tasks:
+        lines.append(
+            f"- Task ID {t['id']}: {t['subject']} ({t.get('task_type') or 'task'}) - "
+            f"due {t['deadline']}, {t.get('priority') or 'no'} priority"
+            + (f" - {t['description_snippet']}" if t.get("description_snippet") not in (None, "", "No snippet") else "")
+        )
+    return "\n".join(lines)
+
+
+def route(user_input: str, file_path: str = None):
+    """
+    Handles simple commands locally.
+
+    Returns:
+        The response text, or None if the request must go to the LLM orchestrator.
+    """
+    if file_path:
+        return None
+    classified = classify(user_input)
+    if classified is None:
+        return None
+
+    intent, task_id = classified
+    print(f"[ROUTER] Fast path: {intent}" + (f" (Task ID {task_id})" if task_id else ""))
+
+    if intent == "complete_task":
+        return orchestrator_tools.complete_task_tool(task_id)
+    if intent == "list_tasks":
+        return _format_tasks(orchestrator_tools.retrieve_active_tasks())
+    if intent == "progress_report":
+        # Still one model call (the report itself), but no orchestrator round trips
+        return orchestrator_tools.get_progress_report_tool(task_id)
+    return None
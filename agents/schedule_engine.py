@@ -0,0 +1,331 @@
+# agents/schedule_engine.py
+#
+# Deterministic, local schedule generation (no model call).
+# The plan for a task is computed from its deadline, priority and type plus the load of
+# the other active tasks: each of those is modelled as a block of work spread over the
+# days before its own deadline, stored in an interval tree so every plan day can ask
+# "which other tasks are being worked on today?" in O(log n + k).
+# The scheduler renders the result as a Markdown table and only calls the LLM when
+# optional prose enrichment is requested.
+
+from datetime import datetime, timedelta, time as dtime
+
+DEADLINE_FORMAT = "%Y-%m-%d %H:%M"
+
+PLANNING_DAYS = 5            # days of work in a plan (fewer if the deadline is closer)
+BUFFER_DAYS = 1              # work should finish this many days before the deadline
+DAILY_CAPACITY_HOURS = 6.0   # study hours available per day across all tasks
+MIN_SESSION_HOURS = 0.5      # shorter free slots are not worth planning a session in
+REVIEW_SHARE = 0.15          # share of the effort kept for the final review day
+
+# Base effort in hours by task type, scaled by priority (high-priority work is usually
+# the harder / higher-stakes kind) and by the required length when one is given.
+BASE_EFFORT_HOURS = {
+    "essay": 10.0,
+    "presentation": 8.0,
+    "problem set": 6.0,
+    "lab report": 8.0,
+    "reading": 4.0,
+    "exam": 12.0,
+    "project": 14.0,
+}
+DEFAULT_EFFORT_HOURS = 6.0
+PRIORITY_FACTOR = {"high": 1.25, "medium": 1.0, "low": 0.75}
+WORDS_PER_HOUR = 300
+HOURS_PER_SLIDE = 0.5
+
+# What the core phase of the work is called, by task type
+CORE_WORK_LABEL = {
+    "essay": "Write the draft",
+    "presentation": "Build the slides",
+    "problem set": "Solve the problems",
+    "lab report": "Analyse data and write sections",
+    "reading": "Read and annotate",
+    "exam": "Study topics and do practice questions",
+    "project": "Build the main deliverable",
+}
+# (share of the effort completed by the end of the phase, phase label)
+PHASES = (
+    (0.2, "Review requirements, gather sources and outline"),
+    (0.75, None),  # core work, labelled per task type
+    (1.0 - REVIEW_SHARE, "Revise and fill gaps"),
+    (1.0, "Final review and submission check"),
+)
+SINGLE_DAY_FOCUS = "Complete, check and submit the work"
+BUSY_DAY_FOCUS = "No time left after other deadlines"
+
+
+# =========================================================
+# === Interval tree ===
+# =========================================================
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed intervals (start, end, payload).
+
+    Built once per schedule from the other tasks' work windows; `overlapping(lo, hi)`
+    returns the payloads of every interval intersecting [lo, hi].
+    """
+
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals: list):
+        self.center = None
+        self.by_start = self.by_end = ()
+        self.left = self.right = None
+        if not intervals:
+            return
+
+        endpoints = sorted(p for start, end, _ in intervals for p in (start, end))
+        self.center = endpoints[len(endpoints) // 2]
+
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, lo, hi) -> list:
+        found = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.center is None:
+                continue
+            if hi < node.center:
+                # Only intervals here that start early enough can reach [lo, hi]
+                for interval in node.by_start:
+                    if interval[0] > hi:
+                        break
+                    found.append(interval[2])
+                if node.left:
+                    stack.append(node.left)
+            elif lo > node.center:
+                for interval in node.by_end:
+                    if interval[1] < lo:
+                        break
+                    found.append(interval[2])
+                if node.right:
+                    stack.append(node.right)
+            else:
+                # [lo, hi] contains the center, so every interval stored here overlaps
+                found.extend(interval[2] for interval in node.by_start)
+                if node.left:
+                    stack.append(node.left)
+                if node.right:
+                    stack.append(node.right)
+        return found
+
+
+# =========================================================
+# === Effort and load estimation ===
+# =========================================================
+
+def parse_deadline(value):
+    """Parses a 'YYYY-MM-DD HH:MM' deadline; returns None if it is missing or malformed."""
+    try:
+        return datetime.strptime(str(value or "").strip(), DEADLINE_FORMAT)
+    except ValueError:
+        return None
+
+
+def _type_key(task: dict) -> str:
+    return str(task.get("task_type") or "").strip().lower()
+
+
+def estimate_effort_hours(task: dict) -> float:
+    """Rough total effort for a task from its type, priority and required length."""
+    hours = BASE_EFFORT_HOURS.get(_type_key(task), DEFAULT_EFFORT_HOURS)
+
+    length = str(task.get("word_count_or_length") or "").lower().replace(",", "")
+    amount = next((int(tok) for tok in length.split() if tok.isdigit()), None)
+    if amount:
+        if "word" in length:
+            hours = max(hours, amount / WORDS_PER_HOUR + 2)
+        elif "slide" in length:
+            hours = max(hours, amount * HOURS_PER_SLIDE + 1)
+
+    hours *= PRIORITY_FACTOR.get(str(task.get("priority") or "").strip().lower(), 1.0)
+    return round(hours, 1)
+
+
+def work_days(deadline, today) -> list:
+    """
+    The dates to work on a task: the last PLANNING_DAYS days (never before today) ending
+    BUFFER_DAYS before the deadline, squeezed into the remaining days if it is closer.
+    """
+    if deadline is None:
+        return [today + timedelta(days=i) for i in range(PLANNING_DAYS)]
+
+    last_day = deadline.date() - timedelta(days=BUFFER_DAYS)
+    if last_day < today:
+        # Too close for a buffer day: use whatever is left up to the deadline itself
+        last_day = max(deadline.date(), today)
+    first_day = max(today, last_day - timedelta(days=PLANNING_DAYS - 1))
+    return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+
+def build_load_tree(other_tasks: list, today) -> IntervalTree:
+    """
+    Interval tree of the other tasks' work windows (as date ordinals). Each payload is
+    (task, hours per day); overdue tasks are treated as work for today.
+    """
+    intervals = []
+    for task in other_tasks:
+        deadline = parse_deadline(task.get("deadline"))
+        if deadline is None:
+            continue
+        days = work_days(deadline, today)
+        per_day = estimate_effort_hours(task) / len(days)
+        intervals.append((days[0].toordinal(), days[-1].toordinal(), (task, per_day)))
+    return IntervalTree(intervals)
+
+
+# =========================================================
+# === Plan construction ===
+# =========================================================
+
+def _phase_label(task: dict, progress: float) -> str:
+    """Phase of the work at `progress` (share of the effort done, at the middle of a day)."""
+    for end_share, label in PHASES:
+        if progress <= end_share + 1e-9:
+            return label or CORE_WORK_LABEL.get(_type_key(task), "Complete the core work")
+    return PHASES[-1][1]
+
+
+def build_schedule(task: dict, other_tasks: list, now: datetime = None) -> dict:
+    """
+    Computes a day-by-day plan for `task`.
+
+    Args:
+        task: The task being scheduled (deadline, priority, task_type, word_count_or_length).
+        other_tasks: The other active tasks (deadline, priority, task_type, subject, id).
+        now: Planning start; defaults to the current time.
+
+    Returns:
+        {"effort_hours", "deadline", "days": [{"date", "focus", "hours", "other_hours",
+        "overlaps": [subjects]}], "conflicts": [tasks due inside the plan], "warnings": [str]}
+    """
+    now = now or datetime.now()
+    today = now.date()
+    deadline = parse_deadline(task.get("deadline"))
+    effort = estimate_effort_hours(task)
+    days = work_days(deadline, today)
+    tree = build_load_tree(other_tasks, today)
+
+    # Hours already claimed by other tasks on each plan day
+    day_overlaps = [tree.overlapping(day.toordinal(), day.toordinal()) for day in days]
+    other_hours = [sum(per_day for _, per_day in overlaps) for overlaps in day_overlaps]
+
+    # Not enough free time in the window: start earlier, one day at a time, while the
+    # extra days are still in the future.
+    def free_work_hours():  # the last day is kept for the review
+        return sum(max(DAILY_CAPACITY_HOURS - h, 0) for h in other_hours[:-1])
+
+    while days[0] > today and free_work_hours() < effort * (1 - REVIEW_SHARE):
+        days.insert(0, days[0] - timedelta(days=1))
+        day_overlaps.insert(0, tree.overlapping(days[0].toordinal(), days[0].toordinal()))
+        other_hours.insert(0, sum(per_day for _, per_day in day_overlaps[0]))
+
+    # Keep the review share for the last day (when there is more than one), and spread the
+    # rest over the other days in proportion to the capacity they have left.
+    review_hours = effort * REVIEW_SHARE if len(days) > 1 else 0.0
+    work_slots = days[:-1] if review_hours else days
+    free = [DAILY_CAPACITY_HOURS - other_hours[i] for i in range(len(work_slots))]
+    free = [f if f >= MIN_SESSION_HOURS else 0.0 for f in free]   # no token sessions on full days
+    if not any(free):
+        free = [1.0] * len(work_slots)   # fully booked: split evenly and flag the overload below
+    total_free = sum(free)
+    hours = [(effort - review_hours) * f / total_free for f in free]
+    if review_hours:
+        hours.append(review_hours)
+
+    plan_days, done = [], 0.0
+    for i, day in enumerate(days):
+        midpoint = (done + hours[i] / 2) / effort if effort else 1.0
+        done += hours[i]
+        if not hours[i]:
+            focus = BUSY_DAY_FOCUS
+        elif len(days) == 1:
+            focus = SINGLE_DAY_FOCUS
+        else:
+            focus = _phase_label(task, midpoint)
+        plan_days.append({
+            "date": day.isoformat(),
+            "focus": focus,
+            "hours": round(hours[i], 1),
+            "other_hours": round(other_hours[i], 1),
+            "overlaps": sorted({str(t.get("subject", "?")) for t, _ in day_overlaps[i]}),
+        })
+
+    # Other deadlines falling inside this plan compete directly with it
+    plan_start = max(now, datetime.combine(days[0], dtime.min))
+    plan_end = deadline or datetime.combine(days[-1], dtime.max)
+    conflicts = sorted(
+        (t for t in other_tasks
+         if (d := parse_deadline(t.get("deadline"))) is not None and plan_start <= d <= plan_end),
+        key=lambda t: t["deadline"],
+    )
+
+    warnings = []
+    if deadline is None:
+        warnings.append("No valid deadline recorded; planned the next "
+                        f"{PLANNING_DAYS} days. Update the deadline for an exact plan.")
+    elif deadline < now:
+        warnings.append("The deadline has already passed; this plan assumes a late submission is still possible.")
+    elif deadline.date() - timedelta(days=BUFFER_DAYS) < today:
+        warnings.append("The deadline is too close for a buffer day; the plan runs up to the deadline.")
+    overloaded = [
+        f"{day['date']} (~{day['hours'] + day['other_hours']:.1f}h)"
+        for day in plan_days if day["hours"] and day["hours"] + day["other_hours"] > DAILY_CAPACITY_HOURS
+    ]
+    if overloaded:
+        warnings.append(
+            f"More than {DAILY_CAPACITY_HOURS:g}h of work on {', '.join(overloaded)}; "
+            "move lower-priority tasks or ask for an extension."
+        )
+
+    return {
+        "effort_hours": effort,
+        "deadline": task.get("deadline"),
+        "days": plan_days,
+        "conflicts": conflicts,
+        "warnings": warnings,
+    }
+
+
+def render_markdown(task: dict, plan: dict) -> str:
+    """Renders a plan from build_schedule() as Markdown (a day table plus conflict notes)."""
+    lines = [
+        f"### Study plan: {task.get('subject', 'Task')} ({task.get('task_type') or 'Assignment'})",
+        f"Deadline: {plan['deadline'] or 'unknown'} | Estimated effort: {plan['effort_hours']}h",
+        "",
+        "| Day | Date | Focus | Hours | Other work that day |",
+        "|---|---|---|---|---|",
+    ]
+    for index, day in enumerate(plan["days"], start=1):
+        weekday = datetime.fromisoformat(day["date"]).strftime("%a")
+        others = ", ".join(day["overlaps"]) or "-"
+        if day["overlaps"]:
+            others += f" (~{day['other_hours']}h)"
+        lines.append(f"| {index} | {weekday} {day['date']} | {day['focus']} | {day['hours']} | {others} |")
+
+    if plan["conflicts"]:
+        lines += ["", "**Deadlines inside this plan:**"]
+        lines += [
+            f"- Task {t.get('id', '?')}: {t.get('subject', '?')} ({t.get('task_type') or 'task'}, "
+            f"{t.get('priority') or 'n/a'} priority) due {t['deadline']}"
+            for t in plan["conflicts"]
+        ]
+    if plan["warnings"]:
+        lines += ["", "**Adjustments:**"]
+        lines += [f"- {warning}" for warning in plan["warnings"]]
+    return "\n".join(lines)
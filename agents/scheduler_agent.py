@@ -1,81 +1,132 @@
 # agents/scheduler_agent.py
 
-from google import genai
-from database.memory_service import get_all_active_tasks, insert_schedule, get_task_by_id
+from tools.gemini_client import (
+    generate_content, get_circuit_breaker, classify_error, CircuitOpenError, TRANSIENT, PERMANENT
+)
+from database.memory_service import insert_schedule, get_task_by_id, get_active_tasks_due_before
+from agents.schedule_engine import build_schedule, render_markdown, PLANNING_DAYS
+from datetime import datetime, timedelta
 import json
 import traceback
 import sys
 
-client = genai.Client()
+# The plan itself is computed locally (agents/schedule_engine.py). The model is only
+# asked, optionally, to add a short prose introduction and tips on top of it.
+POLISH_WITH_LLM = False
+POLISH_MODEL = "gemini-2.0-flash"
 
-def create_and_save_schedule(task_id: int, task_details: dict) -> str:
+def _error_result(task_id: int, message: str, error: Exception) -> str:
     """
-    Generates a detailed study/work schedule using the LLM and saves it to memory.
-    
+    Structured failure result for the orchestrator (a JSON string, like the other tools).
+
+    `retryable` tells the caller whether asking again later can succeed; `retry_after_s`
+    is set when the polishing model's circuit is open.
+    """
+    error_type = classify_error(error)
+    result = {
+        "error": f"{message} for Task ID {task_id}: {error}",
+        "error_type": error_type,
+        "retryable": error_type == TRANSIENT,
+    }
+    if isinstance(error, CircuitOpenError):
+        result["retry_after_s"] = round(error.retry_after_s)
+    return json.dumps(result)
+
+def _load_task(task_id: int, task_details: dict) -> dict:
+    """The stored task row is authoritative; details passed by the orchestrator fill gaps."""
+    stored = get_task_by_id(task_id) or {}
+    return {**task_details, **{k: v for k, v in stored.items() if v not in (None, "")}}
+
+def _other_tasks(task: dict, task_id: int) -> list:
+    """Active tasks whose work windows can overlap this plan (due up to PLANNING_DAYS after it)."""
+    try:
+        horizon = datetime.strptime(str(task.get("deadline", "")).strip(), "%Y-%m-%d %H:%M")
+    except ValueError:
+        horizon = datetime.now()
+    horizon = max(horizon, datetime.now()) + timedelta(days=PLANNING_DAYS + 1)
+    return [
+        t for t in get_active_tasks_due_before(horizon.strftime("%Y-%m-%d %H:%M"))
+        if str(t["id"]) != str(task_id)
+    ]
+
+def _polish(task: dict, schedule_table: str) -> str:
+    """Optional prose enrichment; returns the table unchanged if the model is unavailable."""
+    prompt = (
+        "You are an encouraging academic coach. Below is a finished study plan for the task "
+        f"'{task.get('subject', 'N/A')}' ({task.get('task_type') or 'assignment'}, due {task.get('deadline')}). "
+        "Write a 2-3 sentence introduction and up to 3 concrete tips for the hardest days. "
+        "Do NOT repeat or change the table; reply with the prose only.\n\n"
+        f"{schedule_table}"
+    )
+    try:
+        response = get_circuit_breaker(POLISH_MODEL).call(
+            generate_content, model=POLISH_MODEL, contents=prompt, stream=True
+        )
+        if response.text:
+            return f"{response.text.strip()}\n\n{schedule_table}"
+    except Exception as e:
+        print(f"[SCHEDULER] Prose enrichment skipped ({classify_error(e)} error): {e}")
+    return schedule_table
+
+def create_and_save_schedule(task_id: int, task_details: dict, polish: bool = None) -> str:
+    """
+    Generates a detailed study/work schedule and saves it to memory.
+
+    The day-by-day plan and conflict analysis are computed locally from the deadline,
+    priority and the load of the other active tasks; the LLM is only used for optional
+    prose on top of the table.
+
     Args:
         task_id: The ID of the task in the database (used to link the schedule).
         task_details: The structured data of the assignment being scheduled.
-        
+        polish: Ask the model for an introduction and tips (defaults to POLISH_WITH_LLM).
+
     Returns:
-        A text summary of the schedule and existing conflicts.
+        A text summary of the schedule and existing conflicts, or on failure a JSON
+        object string with "error", "error_type" and "retryable" keys.
     """
     # print("\n[SCHEDULER] Generating schedule...")
 
     # --- 1. Consult Memory for Context ---
-    # Retrieve all *other* active tasks to ensure the new schedule avoids overlaps.
-    active_tasks = get_all_active_tasks()
-    
-    # Filter out the task we are currently scheduling from the conflict list
-    conflict_tasks = [t for t in active_tasks if str(t.get('id')) != str(task_id)]
-    
-    # Convert data back to clean strings for the model
-    details_string = json.dumps(task_details, indent=2)
-    conflict_string = json.dumps(conflict_tasks, indent=2)
+    task = _load_task(task_id, task_details)
+
+    # --- 2. Compute the Plan Locally ---
+    # A failure here must only fail this request: it is reported back as a structured
+    # error (never sys.exit).
     try:
-    # --- 2. Construct the Memory-Aware Prompt ---
-      scheduling_prompt = (
-        "You are an expert academic scheduler. Your goal is to create a detailed, 5-day work schedule "
-        "to complete the following task, ensuring the work finishes 1 day before the deadline. "
-        "Include daily steps, estimated time, and a final review step. Format the schedule using Markdown tables for clarity."
-        "\n\n--- TARGET TASK DETAILS ---\n"
-        f"{details_string}"
-        "\n\n--- EXISTING SCHEDULED CONFLICTS (Prioritize these deadlines) ---\n"
-        f"{conflict_string}"
-        "\n\nIMPORTANT: Note any potential time conflicts based on existing tasks and suggest adjustments in the final schedule table."
-      )
-
-    # --- 3. Generate Content ---
-      response = client.models.generate_content(
-        model="gemini-2.0-pro",  # Use Pro for better complex generation/formatting
-        contents=scheduling_prompt
-       )
-    
-      schedule_text = response.text
-    
+        plan = build_schedule(task, _other_tasks(task, task_id))
+        schedule_text = render_markdown(task, plan)
+    except Exception as e:
+        print(f"[SCHEDULER] Schedule generation failed for Task ID {task_id}:", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return _error_result(task_id, "Schedule generation failed", e)
+
+    # --- 3. Optional Prose Enrichment ---
+    if POLISH_WITH_LLM if polish is None else polish:
+        schedule_text = _polish(task, schedule_text)
+
     # --- 4. Save Schedule to Database ---
-      # print(f"[SCHEDULER] Saving schedule to memory (Task ID: {task_id})...")
-      insert_schedule(task_id, schedule_text)
-    
-     # --- 5. Return Summary for Orchestrator ---
-      summary = (
-        f"Schedule generated and saved successfully for Task ID {task_id} "
-        f"(Subject: {task_details.get('subject', 'N/A')}).\n\n"
-        "Summary of new schedule:\n"
-        # Ensure the slice is safe even if schedule_text is short
-        f"{schedule_text[:300]}...\n\n" 
-        "The schedule was designed to avoid conflicts with your existing tasks."
-       )
-      return summary
+    # print(f"[SCHEDULER] Saving schedule to memory (Task ID: {task_id})...")
+    # The rendered text is kept for display; the per-day steps are stored as rows so
+    # "what is due today" is an indexed lookup instead of re-reading every plan.
+    items = [
+        {"day": day["date"], "step": day["focus"], "duration_minutes": round(day["hours"] * 60)}
+        for day in plan["days"] if day["hours"]
+    ]
+    if not insert_schedule(task_id, schedule_text, items):
+        return json.dumps({
+            "error": f"Schedule for Task ID {task_id} was generated but could not be saved.",
+            "error_type": PERMANENT,
+            "retryable": False,
+        })
 
-    except Exception as e:
-        # PRINT THE FULL TECHNICAL ERROR HERE
-        print("\n" + "="*50)
-        print("[CRITICAL SCHEDULER AGENT ERROR: FULL TRACEBACK]")
-        traceback.print_exc(file=sys.stderr) # <--- PRINTS THE FULL ERROR TRACE
-        print("="*50 + "\n")
-
-        # 2. EXIT THE PROGRAM IMMEDIATELY
-        sys.exit(1)
-        
-        # Return a simple error message to the Orchestrator
-        return f"ERROR: Internal schedule generation failed. Technical details logged to console."
+    # --- 5. Return Summary for Orchestrator ---
+    conflicts = ", ".join(f"{t.get('subject')} (due {t['deadline']})" for t in plan["conflicts"]) or "none"
+    summary = (
+        f"Schedule generated and saved successfully for Task ID {task_id} "
+        f"(Subject: {task.get('subject', 'N/A')}).\n\n"
+        f"{len(plan['days'])} work days, about {plan['effort_hours']} hours in total. "
+        f"Deadlines inside the plan: {conflicts}.\n\n"
+        f"{schedule_text}"
+    )
+    return summary
@@ -0,0 +1,92 @@
+# agents/task_context.py
+#
+# Compact task context for the scheduler and progress prompts.
+# Instead of json.dumps(get_all_active_tasks(), indent=2) (every column of every open
+# task), prompts get only the tasks due inside the planning window, only the columns
+# the model uses, in a pipe-separated table, capped at a fixed number of rows.
+
+from datetime import datetime, timedelta
+
+from database.memory_service import get_active_tasks_due_before, get_schedule_items_for_day, get_schedule_items
+
+DEFAULT_WINDOW_DAYS = 14
+DEFAULT_MAX_TASKS = 15
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+CONTEXT_COLUMNS = ("id", "subject", "task_type", "deadline", "priority")
+SCHEDULE_ITEM_COLUMNS = ("id", "task_id", "subject", "day", "step", "duration_minutes", "status")
+
+
+def select_tasks(window_end: datetime = None, max_tasks: int = DEFAULT_MAX_TASKS,
+                 exclude_task_id: int = None) -> tuple:
+    """
+    Picks the tasks relevant to a planning window.
+
+    Args:
+        window_end: Only tasks due on or before this moment (overdue ones included).
+            None means no window: every active task is a candidate.
+        max_tasks: Cap on returned tasks; the highest priority (then earliest deadline) win.
+        exclude_task_id: A task to leave out (e.g. the one being scheduled).
+
+    Returns:
+        (tasks, omitted) - the selected tasks in deadline order, and how many candidates
+        were dropped by the cap.
+    """
+    cutoff = window_end.strftime("%Y-%m-%d %H:%M") if window_end else None
+    candidates = [
+        t for t in get_active_tasks_due_before(cutoff)
+        if exclude_task_id is None or str(t["id"]) != str(exclude_task_id)
+    ]
+
+    if len(candidates) > max_tasks:
+        # Rows arrive in deadline order and sorted() is stable, so ties keep that order.
+        by_priority = sorted(candidates, key=lambda t: PRIORITY_RANK.get(str(t["priority"]).lower(), 1))
+        kept = {t["id"] for t in by_priority[:max_tasks]}
+        selected = [t for t in candidates if t["id"] in kept]
+    else:
+        selected = candidates
+
+    return selected, len(candidates) - len(selected)
+
+
+def format_task_table(tasks: list, omitted: int = 0, columns: tuple = CONTEXT_COLUMNS) -> str:
+    """Renders tasks as a compact pipe-separated table (far fewer tokens than indented JSON)."""
+    if not tasks:
+        return "(none)"
+    lines = ["|".join(columns)]
+    lines += ["|".join(str(t.get(col, "")) for col in columns) for t in tasks]
+    if omitted:
+        lines.append(f"(+{omitted} lower-priority tasks in this window not shown)")
+    return "\n".join(lines)
+
+
+def build_task_context(window_days: int = DEFAULT_WINDOW_DAYS, max_tasks: int = DEFAULT_MAX_TASKS,
+                       exclude_task_id: int = None, window_end: datetime = None) -> tuple:
+    """
+    Convenience wrapper: selects tasks for the window ending at `window_end`
+    (default: now + window_days; window_days=None means no window) and renders them.
+
+    Returns:
+        (context_text, task_count)
+    """
+    if window_end is None and window_days is not None:
+        window_end = datetime.now() + timedelta(days=window_days)
+    tasks, omitted = select_tasks(window_end, max_tasks, exclude_task_id)
+    return format_task_table(tasks, omitted), len(tasks)
+
+
+def build_schedule_context(task_id: int = None, day: str = None) -> tuple:
+    """
+    Today's slice of the stored plans, instead of whole schedule texts.
+
+    Args:
+        task_id: Only this task's remaining steps (from `day` on); None means every
+            active task's steps for `day`.
+        day: 'YYYY-MM-DD', default today.
+
+    Returns:
+        (context_text, item_count)
+    """
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    items = get_schedule_items(task_id, from_day=day) if task_id else get_schedule_items_for_day(day)
+    return format_task_table(items, columns=SCHEDULE_ITEM_COLUMNS), len(items)
@@ -0,0 +1,95 @@
+# benchmarks/bench_memory_service.py
+#
+# Micro-benchmark for the SQLite memory layer: cost per operation when every call
+# opens/closes its own connection (the old behaviour) versus the pooled connection.
+#
+# Usage:  python -m benchmarks.bench_memory_service [iterations]
+
+import os
+import sys
+import tempfile
+import time
+
+from database import memory_service
+
+TASK = {
+    "subject": "Computer Networks",
+    "task_type": "Problem Set",
+    "description_snippet": "Subnetting and routing exercises",
+    "deadline": "2030-01-15 23:59",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+}
+
+
+def _per_call_connection(sql: str, params: tuple = (), write: bool = False):
+    """Replicates the old pattern: connect, run one statement, close."""
+    conn = memory_service.create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        if write:
+            conn.commit()
+            return cursor.lastrowid
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+    finally:
+        memory_service.close_connection(conn)
+
+
+def _unpooled_ops():
+    return {
+        "get_all_active_tasks": lambda: _per_call_connection(
+            "SELECT * FROM tasks WHERE is_completed = 0 ORDER BY deadline ASC"
+        ),
+        "get_schedule_by_task_id": lambda: _per_call_connection(
+            "SELECT schedule_text FROM schedules WHERE task_id = ?", (1,)
+        ),
+        # Writes run last so they do not inflate the listing measured above.
+        "insert_task": lambda: _per_call_connection(
+            "INSERT INTO tasks(subject, task_type, description_snippet, deadline, priority, word_count_or_length) "
+            "VALUES(?, ?, ?, ?, ?, ?)",
+            tuple(TASK.values()),
+            write=True,
+        ),
+    }
+
+
+def _pooled_ops():
+    return {
+        "get_all_active_tasks": memory_service.get_all_active_tasks,
+        "get_schedule_by_task_id": lambda: memory_service.get_schedule_by_task_id(1),
+        "insert_task": lambda: memory_service.insert_task(dict(TASK)),
+    }
+
+
+def _time_op(op, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        op()
+    return (time.perf_counter() - start) / iterations * 1e6  # microseconds per op
+
+
+def run(iterations: int = 2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_service.close_all_connections()
+        memory_service.DATABASE_FILE = os.path.join(tmp, "bench.db")
+        memory_service.initialize_database()
+        memory_service.insert_schedule(1, "Day 1: read chapter 3")
+
+        # Keep the active-task listing a realistic size rather than growing unbounded.
+        for _ in range(50):
+            memory_service.insert_task(dict(TASK))
+
+        unpooled, pooled = _unpooled_ops(), _pooled_ops()
+        print(f"{'operation':<26}{'per-call conn (us)':>20}{'pooled (us)':>14}{'speedup':>10}")
+        for name in unpooled:
+            before = _time_op(unpooled[name], iterations)
+            after = _time_op(pooled[name], iterations)
+            print(f"{name:<26}{before:>20.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+        memory_service.close_all_connections()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,240 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end latency benchmark for the agent pipeline, run entirely offline against
+# benchmarks/fake_genai.FakeGeminiClient. Reports p50/p95/p99 latency, model round
+# trips and SQLite time per request (and, with --stream, time to the first streamed
+# text) for:
+#   - run_orchestrator (scripted: list tasks + progress report in one turn, then answer)
+#   - generate_progress_report, cold (the student's data changed since the last report)
+#     and warm (served from the progress_reports cache)
+#   - create_and_save_schedule
+#
+# Cold requests are preceded, outside the timed region, by a write that bumps the
+# student's data version: a task is added and completed, so the active set stays the same.
+#
+# Usage:  python -m benchmarks.bench_pipeline [--requests 50] [--latency 0.2] [--jitter 0.1]
+#                                             [--rate-limit 0.0] [--rpm 6000]
+#                                             [--stream] [--chunk-delay 0.05] [--trace]
+#
+# --trace prints the flame summary (tools/tracing.py) of each scenario's last request.
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_genai import FakeGeminiClient
+from database import memory_service
+from tools import gemini_client, tracing
+from tools.gemini_client import set_client, stream_to
+
+TASK = {
+    "subject": "Computer Networks",
+    "task_type": "Problem Set",
+    "description_snippet": "Subnetting and routing exercises",
+    "deadline": "2030-01-15 23:59",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+}
+
+ORCHESTRATOR_SCRIPT = [
+    [("retrieve_active_tasks", {}), ("get_progress_report_tool", {})],
+    "Here is your update: you have active tasks and a plan for today.",
+]
+
+
+# --- SQLite timing ---
+# Agents import memory_service functions by name, so the harness times the database at
+# the connection level: every pooled connection is wrapped in a proxy whose cursors
+# record time spent executing and fetching. Requests are measured one at a time, but
+# the orchestrator runs tools on worker threads, so the total is a shared counter.
+
+_db_time_lock = threading.Lock()
+_db_time = {"total": 0.0}
+
+
+def _add_db_time(seconds: float) -> None:
+    with _db_time_lock:
+        _db_time["total"] += seconds
+
+
+class _TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name not in ("execute", "executemany", "fetchone", "fetchall", "fetchmany"):
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                _add_db_time(time.perf_counter() - start)
+        return timed
+
+
+class _TimedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            _add_db_time(time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _install_db_timer() -> None:
+    original_get_connection = memory_service.get_connection
+
+    def timed_get_connection(db_file=None):
+        conn = original_get_connection(db_file)
+        return _TimedConnection(conn) if conn is not None else None
+
+    memory_service.get_connection = timed_get_connection
+
+
+# --- Benchmark driver ---
+
+def _percentile(sorted_values: list, pct: int) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[pct - 1]
+
+
+def _change_data() -> None:
+    """Invalidates cached progress reports the way real use does: by writing."""
+    memory_service.mark_task_complete(memory_service.insert_task(dict(TASK)))
+
+
+def _measure(name: str, fake: FakeGeminiClient, request, count: int, stream: bool = False,
+             trace: bool = False, setup=None) -> dict:
+    latencies, first_text, round_trips, db_times, failures = [], [], [], [], 0
+    for _ in range(count):
+        if setup:
+            setup()
+        calls_before = fake.stats["model_calls"]
+        _db_time["total"] = 0.0
+        first_chunk_at = []
+        start = time.perf_counter()
+
+        def on_chunk(text):
+            if not first_chunk_at:
+                first_chunk_at.append(time.perf_counter())
+
+        try:
+            with tracing.trace(name):
+                if stream:
+                    with stream_to(on_chunk):
+                        request()
+                else:
+                    request()
+        except Exception as e:
+            failures += 1
+            print(f"[BENCH] {name} request failed: {e}")
+        end = time.perf_counter()
+        latencies.append(end - start)
+        first_text.append((first_chunk_at[0] if first_chunk_at else end) - start)
+        round_trips.append(fake.stats["model_calls"] - calls_before)
+        db_times.append(_db_time["total"])
+
+    if trace:
+        print(tracing.flame_summary())
+
+    latencies.sort()
+    first_text.sort()
+    return {
+        "name": name,
+        "first_text": _percentile(first_text, 50),
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "round_trips": statistics.mean(round_trips),
+        "db_ms": statistics.mean(db_times) * 1000,
+        "failures": failures,
+    }
+
+
+def _print_report(results: list) -> None:
+    print(f"\n{'request':<28}{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}{'1st text':>10}"
+          f"{'model RTs':>11}{'DB (ms)':>9}{'fail':>6}")
+    for r in results:
+        print(f"{r['name']:<28}{r['p50']:>9.3f}{r['p95']:>9.3f}{r['p99']:>9.3f}{r['first_text']:>10.3f}"
+              f"{r['round_trips']:>11.1f}{r['db_ms']:>9.2f}{r['failures']:>6}")
+
+
+def run(requests: int, latency_s: float, jitter_s: float, rate_limit_probability: float,
+        requests_per_minute: int = 6000, stream: bool = False, chunk_delay_s: float = 0.05,
+        trace: bool = False) -> list:
+    # The shared rate limiter would otherwise make this a quota benchmark
+    gemini_client.MODEL_LIMITS = {}
+    gemini_client.DEFAULT_REQUESTS_PER_MINUTE = requests_per_minute
+
+    fake = FakeGeminiClient(
+        latency_s=latency_s,
+        jitter_s=jitter_s,
+        rate_limit_probability=rate_limit_probability,
+        tool_script=ORCHESTRATOR_SCRIPT,
+        chunk_delay_s=chunk_delay_s,
+    )
+    set_client(fake)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_service.close_all_connections()
+        memory_service.DATABASE_FILE = os.path.join(tmp, "bench.db")
+        _install_db_timer()
+        task_ids = [memory_service.insert_task(dict(TASK)) for _ in range(20)]
+
+        # Imported after the fake is installed and the DB is redirected
+        from agents.orchestrator_agent import run_orchestrator
+        from agents.progress_agent import generate_progress_report
+        from agents.scheduler_agent import create_and_save_schedule
+
+        results = [
+            _measure("run_orchestrator", fake,
+                     lambda: run_orchestrator("Give me a progress update.", None), requests, stream, trace,
+                     setup=_change_data),
+            _measure("progress_report (cold)", fake,
+                     lambda: generate_progress_report(task_id=task_ids[0]), requests, stream, trace,
+                     setup=_change_data),
+            _measure("progress_report (warm)", fake,
+                     lambda: generate_progress_report(task_id=task_ids[0]), requests, stream, trace),
+            _measure("create_and_save_schedule", fake,
+                     lambda: create_and_save_schedule(task_ids[0], dict(TASK)), requests, stream, trace),
+        ]
+
+        memory_service.close_all_connections()
+
+    _print_report(results)
+    print(f"\nFake client totals: {fake.stats}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark.")
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--latency", type=float, default=0.2, help="base model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra random model latency in seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of an injected 429")
+    parser.add_argument("--rpm", type=int, default=6000, help="client-side requests/minute limit per model")
+    parser.add_argument("--stream", action="store_true", help="stream responses (as the CLI does)")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="delay between streamed chunks in seconds")
+    parser.add_argument("--trace", action="store_true", help="print a flame summary of each scenario's last request")
+    args = parser.parse_args()
+    run(args.requests, args.latency, args.jitter, args.rate_limit, args.rpm, args.stream, args.chunk_delay,
+        args.trace)
@@ -0,0 +1,365 @@
+# benchmarks/fake_genai.py
+#
+# Offline stand-in for the parts of the google-genai client this project uses:
+# models.generate_content (incl. function calls), models.generate_content_stream,
+# files.upload/delete/get, caches.create/update/delete/get (context caching) and the
+# matching client.aio surface. Latency, 429 injection
+# and the orchestrator's tool-call sequence are configurable, so agents can be
+# benchmarked without the live API.
+#
+# Usage:
+#     from benchmarks.fake_genai import FakeGeminiClient
+#     from tools.gemini_client import set_client
+#     set_client(FakeGeminiClient(latency_s=0.5, tool_script=[[("retrieve_active_tasks", {})], "Done."]))
+
+import asyncio
+import itertools
+import json
+import mimetypes
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+from google.genai.errors import ClientError
+
+DEFAULT_JSON_RESPONSE = {
+    "deadline": "2030-01-15 23:59",
+    "task_type": "Problem Set",
+    "subject": "Computer Networks",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+    "description_snippet": "Subnetting and routing exercises",
+}
+
+STREAM_CHUNK_CHARS = 40
+
+DEFAULT_TEXT_RESPONSE = (
+    "| Day | Step | Time |\n|---|---|---|\n"
+    + "".join(f"| Day {i} | Work on the assignment, part {i} | 2h |\n" for i in range(1, 6))
+    + "\nKeep going - you are on track."
+)
+
+
+def _estimate_tokens(value) -> int:
+    """Rough token count (~4 chars per token) of anything that can be stringified."""
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_tokens(v) for v in value)
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json(exclude_none=True)) // 4
+    return len(str(value)) // 4
+
+
+def _tool_text(tool) -> str:
+    """What a tool costs in the prompt: its declarations, which the SDK builds from Python functions."""
+    if callable(tool):
+        return types.FunctionDeclaration.from_callable_with_api_option(callable=tool, use_json_schema=True)
+    return tool
+
+
+def _ttl(config) -> timedelta:
+    ttl = _config_value(config, "ttl") or "3600s"
+    return timedelta(seconds=float(str(ttl).rstrip("s")))
+
+
+def _config_value(config, name):
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(name)
+    return getattr(config, name, None)
+
+
+class FakeGeminiClient:
+    """
+    Drop-in replacement for genai.Client in benchmarks and offline runs.
+
+    Args:
+        latency_s: Base latency added to every model call (time to first chunk when streaming).
+        jitter_s: Extra uniformly random latency in [0, jitter_s].
+        upload_latency_s: Latency of files.upload.
+        rate_limit_probability: Chance that a model call raises a 429 ClientError.
+        tool_script: Turns the *orchestrator* plays back. Each turn is either a list of
+            (tool_name, args) function calls or a final text string. The turn is picked by
+            how many model turns are already in `contents`, so one script serves many
+            concurrent conversations. Only requests with automatic function calling
+            disabled (the orchestrator) follow the script.
+        text_response: Text returned for plain generation requests.
+        json_response: Object returned when response_mime_type is application/json.
+        chunk_delay_s: Delay between streamed chunks (text is streamed in STREAM_CHUNK_CHARS pieces).
+        seed: Seed for jitter and 429 injection, for reproducible runs.
+        min_cache_tokens: Smallest prefix caches.create accepts (a smaller one gets a 400).
+            None makes every caches.create fail, like a model without context caching.
+    """
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, upload_latency_s: float = 0.0,
+                 rate_limit_probability: float = 0.0, tool_script: list = None,
+                 text_response: str = DEFAULT_TEXT_RESPONSE, json_response: dict = None,
+                 chunk_delay_s: float = 0.0, seed: int = 0, min_cache_tokens: int = 1024):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.upload_latency_s = upload_latency_s
+        self.rate_limit_probability = rate_limit_probability
+        self.tool_script = tool_script or ["Done."]
+        self.text_response = text_response
+        self.json_response = json_response or DEFAULT_JSON_RESPONSE
+        self.chunk_delay_s = chunk_delay_s
+        self.min_cache_tokens = min_cache_tokens
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._file_ids = itertools.count(1)
+        self.files_store = {}
+        self.caches_store = {}
+        self.stats = {"model_calls": 0, "rate_limited": 0, "uploads": 0, "deletes": 0,
+                      "cache_creates": 0, "cached_calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+        self.models = _FakeModels(self)
+        self.files = _FakeFiles(self)
+        self.caches = _FakeCaches(self)
+        self.aio = _FakeAio(self)
+
+    # --- Internals shared by the sync and async surfaces ---
+
+    def _next_delay(self) -> float:
+        with self._lock:
+            return self.latency_s + self._random.uniform(0, self.jitter_s)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _maybe_rate_limit(self) -> None:
+        with self._lock:
+            limited = self._random.random() < self.rate_limit_probability
+        if limited:
+            self._count("rate_limited")
+            raise ClientError(429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "1s"}],
+            }})
+
+    def _respond(self, model: str, contents, config) -> types.GenerateContentResponse:
+        self._count("model_calls")
+        self._maybe_rate_limit()
+
+        afc = _config_value(config, "automatic_function_calling")
+        if afc is not None and getattr(afc, "disable", False):
+            turn = self._script_turn(contents)
+            if isinstance(turn, str):
+                parts = [types.Part.from_text(text=turn)]
+            else:
+                parts = [types.Part(function_call=types.FunctionCall(name=name, args=args))
+                         for name, args in turn]
+        elif _config_value(config, "response_mime_type") == "application/json":
+            parts = [types.Part.from_text(text=json.dumps(self.json_response))]
+        else:
+            parts = [types.Part.from_text(text=self.text_response)]
+
+        # The system instruction and tool declarations are input tokens too; with a
+        # cached_content they come from the cache and are reported as cached tokens.
+        cached_tokens = self._cached_tokens(_config_value(config, "cached_content"))
+        prompt_tokens = (_estimate_tokens(contents) + cached_tokens
+                         + _estimate_tokens(_config_value(config, "system_instruction") or "")
+                         + _estimate_tokens([_tool_text(t) for t in _config_value(config, "tools") or []]))
+        output_tokens = _estimate_tokens(parts)
+        with self._lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(role="model", parts=parts),
+                finish_reason=types.FinishReason.STOP,
+            )],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                cached_content_token_count=cached_tokens or None,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+            model_version=model,
+        )
+
+    def _chunks(self, response: types.GenerateContentResponse):
+        """Splits a response the way the streaming API delivers it; usage comes on the last chunk."""
+        pieces = []
+        for part in response.candidates[0].content.parts:
+            if part.text:
+                pieces += [types.Part.from_text(text=part.text[i:i + STREAM_CHUNK_CHARS])
+                           for i in range(0, len(part.text), STREAM_CHUNK_CHARS)]
+            else:
+                pieces.append(part)
+
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(
+                    content=types.Content(role="model", parts=[piece]),
+                    finish_reason=response.candidates[0].finish_reason if last else None,
+                )],
+                usage_metadata=response.usage_metadata if last else None,
+                model_version=response.model_version,
+            )
+
+    def _script_turn(self, contents):
+        contents = contents if isinstance(contents, list) else [contents]
+        model_turns = sum(1 for c in contents if getattr(c, "role", None) == "model")
+        return self.tool_script[min(model_turns, len(self.tool_script) - 1)]
+
+    def _upload(self, file) -> types.File:
+        self._count("uploads")
+        file_id = next(self._file_ids)
+        mime_type = mimetypes.guess_type(str(file))[0] or "application/octet-stream"
+        uploaded = types.File(
+            name=f"files/fake-{file_id}",
+            uri=f"https://fake.generativelanguage/files/fake-{file_id}",
+            mime_type=mime_type,
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+        )
+        with self._lock:
+            self.files_store[uploaded.name] = uploaded
+        return uploaded
+
+    def _delete(self, name: str) -> None:
+        self._count("deletes")
+        with self._lock:
+            self.files_store.pop(name, None)
+
+    def _cached_tokens(self, name) -> int:
+        """Token count of a live cached content named in a request (404 if unknown or expired)."""
+        if not name:
+            return 0
+        with self._lock:
+            cached = self.caches_store.get(name)
+        if cached is None or cached.expire_time <= datetime.now(timezone.utc):
+            raise ClientError(404, {"error": {"code": 404, "message": f"CachedContent not found: {name}",
+                                              "status": "NOT_FOUND"}})
+        self._count("cached_calls")
+        return cached.usage_metadata.total_token_count
+
+    def _create_cache(self, model: str, config) -> types.CachedContent:
+        tokens = (_estimate_tokens(_config_value(config, "system_instruction") or "")
+                  + _estimate_tokens([_tool_text(t) for t in _config_value(config, "tools") or []])
+                  + _estimate_tokens(_config_value(config, "contents") or []))
+        if self.min_cache_tokens is None or tokens < self.min_cache_tokens:
+            raise ClientError(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message": (
+                f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.min_cache_tokens}"
+            )}})
+        self._count("cache_creates")
+        now = datetime.now(timezone.utc)
+        cached = types.CachedContent(
+            name=f"cachedContents/fake-{next(self._file_ids)}",
+            model=f"models/{model}",
+            display_name=_config_value(config, "display_name"),
+            create_time=now,
+            expire_time=now + _ttl(config),
+            usage_metadata=types.CachedContentUsageMetadata(total_token_count=tokens),
+        )
+        with self._lock:
+            self.caches_store[cached.name] = cached
+        return cached
+
+    def _update_cache(self, name: str, config) -> types.CachedContent:
+        with self._lock:
+            cached = self.caches_store.get(name)
+            if cached is None:
+                raise ClientError(404, {"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+            cached = cached.model_copy(update={"expire_time": datetime.now(timezone.utc) + _ttl(config)})
+            self.caches_store[name] = cached
+        return cached
+
+    def _delete_cache(self, name: str) -> None:
+        with self._lock:
+            self.caches_store.pop(name, None)
+
+    def _get(self, name: str) -> types.File:
+        with self._lock:
+            uploaded = self.files_store.get(name)
+        if uploaded is None:
+            raise ClientError(404, {"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+        return uploaded
+
+
+class _FakeModels:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    def generate_content(self, *, model: str, contents, config=None):
+        time.sleep(self._client._next_delay())
+        return self._client._respond(model, contents, config)
+
+    def generate_content_stream(self, *, model: str, contents, config=None):
+        time.sleep(self._client._next_delay())
+        for index, chunk in enumerate(self._client._chunks(self._client._respond(model, contents, config))):
+            if index:
+                time.sleep(self._client.chunk_delay_s)
+            yield chunk
+
+
+class _FakeFiles:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    def upload(self, *, file, config=None):
+        time.sleep(self._client.upload_latency_s)
+        return self._client._upload(file)
+
+    def delete(self, *, name: str, config=None):
+        return self._client._delete(name)
+
+    def get(self, *, name: str, config=None):
+        return self._client._get(name)
+
+
+class _FakeCaches:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    def create(self, *, model: str, config=None):
+        return self._client._create_cache(model, config)
+
+    def update(self, *, name: str, config=None):
+        return self._client._update_cache(name, config)
+
+    def delete(self, *, name: str, config=None):
+        return self._client._delete_cache(name)
+
+    def get(self, *, name: str, config=None):
+        with self._client._lock:
+            cached = self._client.caches_store.get(name)
+        if cached is None:
+            raise ClientError(404, {"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+        return cached
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    async def generate_content(self, *, model: str, contents, config=None):
+        await asyncio.sleep(self._client._next_delay())
+        return self._client._respond(model, contents, config)
+
+
+class _FakeAsyncFiles:
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    async def upload(self, *, file, config=None):
+        await asyncio.sleep(self._client.upload_latency_s)
+        return self._client._upload(file)
+
+    async def delete(self, *, name: str, config=None):
+        return self._client._delete(name)
+
+    async def get(self, *, name: str, config=None):
+        return self._client._get(name)
+
+
+class _FakeAio:
+    def __init__(self, client: FakeGeminiClient):
+        self.models = _FakeAsyncModels(client)
+        self.files = _FakeAsyncFiles(client)
@@ -1,9 +1,24 @@
 import sqlite3
 from sqlite3 import Error
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+import atexit
+import contextvars
+import hashlib
+import math
+import os
+import threading
+import time
+import weakref
+
+from tools import tracing
 
 DATABASE_FILE = 'student_agent_memory.db'
 
+# Size of sqlite3's per-connection prepared-statement cache. All queries below use
+# constant SQL strings, so every repeated call is served from this cache.
+STATEMENT_CACHE_SIZE = 256
+
 def create_connection():
     """Create a database connection to the SQLite database"""
     conn = None
@@ -20,136 +35,587 @@ def close_connection(conn):
     if conn:
         conn.close()
 
-def create_tables(conn):
-    """Create the necessary database tables."""
-
-    #--- 1. Tasks Table ---
-    # Stores assignment details (used by scheduler & Progress Agents)
-    sql_create_tasks_table = """ CREATE TABLE IF NOT EXISTS tasks (
-                                    id INTEGER PRIMARY KEY,
-                                    subject TEXT NOT NULL,
-                                    task_type TEXT,
-                                    description_snippet TEXT,
-                                    deadline TEXT NOT NULL,
-                                    priority TEXT,
-                                    word_count_or_length TEXT,
-                                    is_completed INTEGER DEFAULT 0,
-                                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                                ); """
-    
-    # --- 2. Schedules Table ---
-    # Stores the generated study plans/schedules (used by Progress Agent)
-    sql_create_schedules_table = """ CREATE TABLE IF NOT EXISTS schedules (
-                                        id INTEGER PRIMARY KEY,
-                                        task_id INTEGER NOT NULL,
-                                        schedule_text TEXT NOT NULL,
-                                        date_generated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                        FOREIGN KEY (task_id) REFERENCES tasks (id)
-                                    ); """
-    try:
-        cursor = conn.cursor()
-        cursor.execute(sql_create_tasks_table)
-        cursor.execute(sql_create_schedules_table)
-        conn.commit()
-    except Error as e:
-        print(f"Error creating tables: {e}")
+# Per-connection tuning applied to every pooled connection. synchronous=NORMAL is safe
+# with WAL (a crash can only lose the last commits, never corrupt the file).
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",     # ~16 MB page cache (negative value = KiB)
+    "PRAGMA mmap_size = 268435456",   # map up to 256 MB of the file
+    "PRAGMA temp_store = MEMORY",
+)
+
+def configure_connection(conn):
+    """Applies CONNECTION_PRAGMAS to a freshly opened connection."""
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+# --- Traced connections ---
+# Inside a request trace (tools/tracing.py) every statement and fetch becomes a "db"
+# span; outside one the only cost is a ContextVar lookup.
+
+def _sql_label(sql: str) -> str:
+    return " ".join(sql.split())[:80]
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        if not tracing.active():
+            return super().execute(sql, parameters)
+        with tracing.span("db", sql=_sql_label(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not tracing.active():
+            return super().executemany(sql, seq_of_parameters)
+        with tracing.span("db", sql=_sql_label(sql)) as db_span:
+            result = super().executemany(sql, seq_of_parameters)
+            db_span.set("rows", self.rowcount)
+            return result
+
+    def fetchone(self):
+        if not tracing.active():
+            return super().fetchone()
+        with tracing.span("db", sql="fetchone"):
+            return super().fetchone()
+
+    def fetchall(self):
+        if not tracing.active():
+            return super().fetchall()
+        with tracing.span("db", sql="fetchall") as db_span:
+            rows = super().fetchall()
+            db_span.set("rows", len(rows))
+            return rows
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+# --- Long-lived connection manager ---
+# Opening the file and parsing the schema on every call dominated DB latency, so each
+# thread keeps one connection per database file for the lifetime of the process.
+# sqlite3 connections must not be shared between threads, hence the thread-local.
+# When a thread exits (e.g. a worker of a short-lived pool) its thread-local holder is
+# dropped and a finalizer closes that thread's connections, so they do not pile up.
+
+class _ThreadConnections:
+    """One thread's connections by database file; its finalizer closes them."""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.by_file = {}
+
+class ConnectionManager:
+    """Hands out one long-lived connection per (thread, database file)."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._all_connections = []
+        # Bumped by close_all() so every thread drops its (now closed) cached handles.
+        self._generation = 0
+        # Database files whose schema has been checked/migrated by this process.
+        self._initialized_files = set()
+
+    def get(self, db_file: str = None):
+        db_file = db_file or DATABASE_FILE
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.generation != self._generation:
+            holder = _ThreadConnections(self._generation)
+            weakref.finalize(holder, self._close_thread_connections, holder.by_file)
+            self._local.holder = holder
+        connections = holder.by_file
+
+        conn = connections.get(db_file)
+        if conn is not None:
+            return conn
+
+        try:
+            # check_same_thread=False only so close_all() can run from the exit handler;
+            # each connection is still used exclusively by the thread that opened it.
+            conn = sqlite3.connect(
+                db_file,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                factory=TracedConnection,
+            )
+            configure_connection(conn)
+        except Error as e:
+            print(f"Error connecting to database: {e}")
+            return None
+
+        connections[db_file] = conn
+        with self._lock:
+            self._all_connections.append(conn)
 
-    # ---- 3.Reminders Table ----
-    sql_create_reminders_table = """ CREATE TABLE IF NOT EXISTS reminders (
-                                        id INTEGER PRIMARY KEY,
-                                        reminder_text TEXT NOT NULL,
-                                        target_datetime TEXT NOT NULL,
-                                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                                    ); """
+        # Schema setup happens on first use rather than at import time, so importing
+        # memory_service (and every agent that imports it) costs nothing. Other threads
+        # opening their first connection wait here until the migration has finished.
+        with self._schema_lock:
+            # A failed migration is rolled back, so leave the file unmarked and let the
+            # next connection retry it instead of running on a half-built schema.
+            if db_file not in self._initialized_files and create_tables(conn):
+                self._initialized_files.add(db_file)
+        return conn
+
+    def _close_thread_connections(self, connections: dict):
+        """Finalizer of a thread's holder: closes the connections of a thread that exited."""
+        with self._lock:
+            for conn in connections.values():
+                if conn in self._all_connections:
+                    self._all_connections.remove(conn)
+        for conn in connections.values():
+            try:
+                conn.close()
+            except Error:
+                pass
+
+    @property
+    def open_connection_count(self) -> int:
+        with self._lock:
+            return len(self._all_connections)
+
+    def close_all(self):
+        """Closes every connection opened by any thread (used at interpreter exit)."""
+        with self._lock:
+            connections, self._all_connections = self._all_connections, []
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except Error:
+                pass
+
+_connection_manager = ConnectionManager()
+atexit.register(_connection_manager.close_all)
+
+def get_connection(db_file: str = None):
+    """Returns this thread's pooled connection (to DATABASE_FILE by default). Do NOT close it; it is reused."""
+    return _connection_manager.get(db_file)
+
+def close_all_connections():
+    """Closes all pooled connections (e.g. before deleting or swapping the DB file)."""
+    _connection_manager.close_all()
+
+# --- Student scoping and sharding ---
+# Per-student rows (tasks, schedules, schedule_items, reminders, ingested_files) carry a
+# student_id, and every query on them filters by it through indexes that lead with
+# student_id. The current student is a ContextVar set per request with student_scope();
+# code outside any scope (the CLI, scripts) acts as DEFAULT_STUDENT_ID. Like the stream
+# sink, it does not follow work into thread pools: wrap such work with bind_student().
+#
+# With SHARD_COUNT > 1 each student's rows live in one of several database files, picked
+# by a stable hash of the student ID. Shared, content-addressed caches (uploads,
+# extractions, chunk summaries) and the rate-limit buckets stay in DATABASE_FILE.
+# Changing SHARD_COUNT moves students to other files, so set it before onboarding.
+
+DEFAULT_STUDENT_ID = "default"   # also the column default in schema migration 10
+SHARD_COUNT = int(os.environ.get("STUDENT_DB_SHARDS", "1"))
+
+_current_student = contextvars.ContextVar("current_student_id", default=DEFAULT_STUDENT_ID)
+
+@contextmanager
+def student_scope(student_id: str):
+    """Makes every memory_service call inside this block act for `student_id`."""
+    token = _current_student.set(str(student_id))
     try:
-        cursor = conn.cursor()
-        cursor.execute(sql_create_tasks_table)
-        cursor.execute(sql_create_schedules_table)
-        cursor.execute(sql_create_reminders_table)
+        yield
+    finally:
+        _current_student.reset(token)
+
+def current_student_id() -> str:
+    return _current_student.get()
+
+def bind_student(func):
+    """Wraps `func` so that, run on another thread, it acts for the caller's student."""
+    student_id = _current_student.get()
+
+    def run_as_student(*args, **kwargs):
+        with student_scope(student_id):
+            return func(*args, **kwargs)
+    return run_as_student
+
+def shard_index(student_id: str) -> int:
+    # sha256 rather than hash(): str hashes differ between processes
+    return int(hashlib.sha256(student_id.encode("utf-8")).hexdigest()[:8], 16) % SHARD_COUNT
+
+def student_database_file(student_id: str = None) -> str:
+    """Database file holding `student_id`'s rows (default: the current student)."""
+    if SHARD_COUNT <= 1:
+        return DATABASE_FILE
+    stem, ext = os.path.splitext(DATABASE_FILE)
+    return f"{stem}.shard{shard_index(student_id or current_student_id())}{ext}"
+
+def all_student_database_files() -> list:
+    """Every file that holds student rows (for cross-student jobs such as reminders)."""
+    if SHARD_COUNT <= 1:
+        return [DATABASE_FILE]
+    stem, ext = os.path.splitext(DATABASE_FILE)
+    return [f"{stem}.shard{index}{ext}" for index in range(SHARD_COUNT)]
+
+def _student_connection(student_id: str = None):
+    """Pooled connection to the current (or given) student's database file."""
+    return get_connection(student_database_file(student_id))
+
+# --- Schema migrations ---
+# PRAGMA user_version records how many migrations have been applied to a database file.
+# Append new steps to the end of this list; never edit or reorder an existing step.
+SCHEMA_MIGRATIONS = [
+    # --- 1. Base tables ---
+    [
+        # Tasks Table: stores assignment details (used by scheduler & Progress Agents)
+        """ CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                subject TEXT NOT NULL,
+                task_type TEXT,
+                description_snippet TEXT,
+                deadline TEXT NOT NULL,
+                priority TEXT,
+                word_count_or_length TEXT,
+                is_completed INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+        # Schedules Table: stores the generated study plans/schedules (used by Progress Agent)
+        """ CREATE TABLE IF NOT EXISTS schedules (
+                id INTEGER PRIMARY KEY,
+                task_id INTEGER NOT NULL,
+                schedule_text TEXT NOT NULL,
+                date_generated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            ); """,
+        # Reminders Table
+        """ CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY,
+                reminder_text TEXT NOT NULL,
+                target_datetime TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+    ],
+    # --- 2. Indexes for the hot queries ---
+    [
+        # get_all_active_tasks: walks this partial index in deadline order, no sort step
+        "CREATE INDEX IF NOT EXISTS idx_tasks_active_deadline ON tasks(deadline) WHERE is_completed = 0",
+        # get_schedule_by_task_id: lookup by task, newest plan last
+        "CREATE INDEX IF NOT EXISTS idx_schedules_task_date ON schedules(task_id, date_generated)",
+        # Reminder scans by due time
+        "CREATE INDEX IF NOT EXISTS idx_reminders_target ON reminders(target_datetime)",
+    ],
+    # --- 3. Gemini upload cache (see tools/upload_cache.py) ---
+    [
+        # One row per uploaded file content. Times are UTC 'YYYY-MM-DD HH:MM:SS' strings.
+        """ CREATE TABLE IF NOT EXISTS file_uploads (
+                content_hash TEXT PRIMARY KEY,
+                remote_name TEXT NOT NULL,
+                remote_uri TEXT NOT NULL,
+                mime_type TEXT,
+                size_bytes INTEGER,
+                expires_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+        "CREATE INDEX IF NOT EXISTS idx_file_uploads_last_used ON file_uploads(last_used_at)",
+    ],
+    # --- 4. Extraction result cache (see tools/extraction_cache.py) ---
+    [
+        """ CREATE TABLE IF NOT EXISTS extraction_cache (
+                cache_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                schema_hash TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                last_used_at TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+        "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used_at)",
+    ],
+    # --- 5. Batch ingestion bookkeeping (see tools/batch_ingest.py) ---
+    [
+        # Last ingested content of each file, so re-runs only pick up new or changed files
+        """ CREATE TABLE IF NOT EXISTS ingested_files (
+                file_path TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                task_id INTEGER,
+                ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            ); """,
+    ],
+    # --- 6. Shared API rate-limit buckets (see tools/gemini_client.py) ---
+    [
+        """ CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            ); """,
+    ],
+    # --- 7. Structured schedule steps (one row per task per plan day) ---
+    [
+        # day is 'YYYY-MM-DD', start an optional 'HH:MM'; status is 'pending' or 'done'.
+        # schedules.schedule_text keeps the rendered Markdown for display.
+        """ CREATE TABLE IF NOT EXISTS schedule_items (
+                id INTEGER PRIMARY KEY,
+                schedule_id INTEGER NOT NULL,
+                task_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                start TEXT,
+                duration_minutes INTEGER NOT NULL,
+                step TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                FOREIGN KEY (schedule_id) REFERENCES schedules (id),
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            ); """,
+        # "What is due today across all tasks": one range scan on day
+        "CREATE INDEX IF NOT EXISTS idx_schedule_items_day ON schedule_items(day, status)",
+        # One task's plan in day order
+        "CREATE INDEX IF NOT EXISTS idx_schedule_items_task_day ON schedule_items(task_id, day)",
+    ],
+    # --- 8. Reminder fire times as indexed epoch seconds (see tools/reminder_scheduler.py) ---
+    [
+        "ALTER TABLE reminders ADD COLUMN target_ts INTEGER",
+        "ALTER TABLE reminders ADD COLUMN fired_at TEXT",
+        "ALTER TABLE reminders ADD COLUMN task_id INTEGER REFERENCES tasks (id)",
+        # Existing rows hold local 'YYYY-MM-DD HH:MM:SS' text; 'utc' converts it to UTC first
+        "UPDATE reminders SET target_ts = CAST(strftime('%s', target_datetime, 'utc') AS INTEGER)",
+        "DROP INDEX IF EXISTS idx_reminders_target",
+        # Only unfired reminders are ever scanned, in fire-time order
+        "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders(target_ts) WHERE fired_at IS NULL",
+    ],
+    # --- 9. Chunk summary cache for map-reduce summarization (see tools/chunked_summary.py) ---
+    [
+        # cache_key covers the chunk content, model and prompt; times are UTC text
+        """ CREATE TABLE IF NOT EXISTS chunk_summaries (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+        "CREATE INDEX IF NOT EXISTS idx_chunk_summaries_last_used ON chunk_summaries(last_used_at)",
+    ],
+    # --- 10. Per-student rows (see "Student scoping and sharding" above) ---
+    [
+        # Rows written before this migration belong to the default student
+        "ALTER TABLE tasks ADD COLUMN student_id TEXT NOT NULL DEFAULT 'default'",
+        "ALTER TABLE schedules ADD COLUMN student_id TEXT NOT NULL DEFAULT 'default'",
+        "ALTER TABLE schedule_items ADD COLUMN student_id TEXT NOT NULL DEFAULT 'default'",
+        "ALTER TABLE reminders ADD COLUMN student_id TEXT NOT NULL DEFAULT 'default'",
+        # ingested_files is keyed by (student, path), so it is rebuilt rather than altered
+        """ CREATE TABLE ingested_files_new (
+                student_id TEXT NOT NULL DEFAULT 'default',
+                file_path TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                task_id INTEGER,
+                ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (student_id, file_path),
+                FOREIGN KEY (task_id) REFERENCES tasks (id)
+            ); """,
+        """ INSERT INTO ingested_files_new(file_path, content_hash, task_id, ingested_at)
+            SELECT file_path, content_hash, task_id, ingested_at FROM ingested_files """,
+        "DROP TABLE ingested_files",
+        "ALTER TABLE ingested_files_new RENAME TO ingested_files",
+        # The hot-query indexes now lead with student_id, so one student's queries never
+        # touch another student's rows
+        "DROP INDEX IF EXISTS idx_tasks_active_deadline",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_student_active_deadline ON tasks(student_id, deadline) WHERE is_completed = 0",
+        "DROP INDEX IF EXISTS idx_schedules_task_date",
+        "CREATE INDEX IF NOT EXISTS idx_schedules_student_task_date ON schedules(student_id, task_id, date_generated)",
+        "DROP INDEX IF EXISTS idx_schedule_items_day",
+        "CREATE INDEX IF NOT EXISTS idx_schedule_items_student_day ON schedule_items(student_id, day, status)",
+        "DROP INDEX IF EXISTS idx_schedule_items_task_day",
+        "CREATE INDEX IF NOT EXISTS idx_schedule_items_student_task_day ON schedule_items(student_id, task_id, day)",
+    ],
+    # --- 11. Gemini context cache registry (see tools/context_cache.py) ---
+    [
+        # One row per cached request prefix. cache_name is NULL while the API refuses to
+        # cache that prefix (too small, model without caching), until expires_at.
+        """ CREATE TABLE IF NOT EXISTS context_caches (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                cache_name TEXT,
+                token_count INTEGER,
+                expires_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ); """,
+        "CREATE INDEX IF NOT EXISTS idx_context_caches_last_used ON context_caches(last_used_at)",
+    ],
+    # --- 12. Progress report cache (see agents/progress_agent.py) ---
+    [
+        # One counter per student, bumped in the same transaction as every write that
+        # changes what a progress report is built from (tasks, plans, plan steps)
+        """ CREATE TABLE IF NOT EXISTS data_versions (
+                student_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            ); """,
+        # Latest report per student and task (task_id 0 = the report on all tasks)
+        """ CREATE TABLE IF NOT EXISTS progress_reports (
+                student_id TEXT NOT NULL,
+                task_id INTEGER NOT NULL,
+                data_version INTEGER NOT NULL,
+                time_bucket TEXT NOT NULL,
+                report TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (student_id, task_id)
+            ); """,
+    ],
+]
+
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+def create_tables(conn) -> bool:
+    """
+    Create the necessary database tables by applying any pending schema migrations.
+    Returns True once the schema is current, False if a migration failed (it is rolled
+    back, so the next call retries it).
+    """
+    try:
+        # WAL lets readers (progress/scheduler agents) run while a writer commits.
+        # The journal mode is persistent, and it cannot be changed inside a transaction.
+        conn.execute("PRAGMA journal_mode = WAL")
+
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current_version >= SCHEMA_VERSION:
+            return True
+
+        # BEGIN IMMEDIATE takes the write lock, so two processes starting together
+        # cannot both apply the same migration. Re-read the version once we hold it.
+        conn.execute("BEGIN IMMEDIATE")
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version in range(current_version, SCHEMA_VERSION):
+            for statement in SCHEMA_MIGRATIONS[version]:
+                conn.execute(statement)
+            print(f"[DB SERVICE] Applied schema migration {version + 1}.")
+        # PRAGMA does not accept bound parameters; SCHEMA_VERSION is an int we control.
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        return True
     except Error as e:
+        conn.rollback()
         print(f"Error creating tables: {e}")
+        return False
 
-# # Add the function to insert a new reminder:
-# def insert_reminder(reminder_text: str, target_datetime: str) -> int:
-#     """Inserts a new reminder into the reminders table."""
-#     conn = create_connection()
-#     if conn is None:
-#         return -1
-
-#     sql = ''' INSERT INTO reminders(reminder_text, target_datetime)
-#               VALUES(?, ?) '''
-
-#     try:
-#         cursor = conn.cursor()
-#         cursor.execute(sql, (reminder_text, target_datetime))
-#         conn.commit()
-#         return cursor.lastrowid
-#     except Error as e:
-#         print(f"Error inserting reminder: {e}")
-#         return -1
-#     finally:
-#         close_connection(conn)
-
-# --- Initialize the database when the module is imported ---
+# --- Explicit initialization (optional: the first get_connection() also does this) ---
 def initialize_database():
     """Initializes the connection and creates tables if they don't exist."""
-    conn = create_connection()
+    conn = get_connection()
     if conn:
         create_tables(conn)
-        close_connection(conn)
-
-initialize_database()
 
 #This function will be called immediately after the Task Extractor successfully returns the structured JSON data.
 
+def _task_row(task_data: dict) -> tuple:
+    """Builds the INSERT parameters for one task, applying the missing-deadline safeguard."""
+    deadline_value = task_data.get('deadline')
+
+    if not deadline_value or deadline_value.lower().strip() in ['none', 'null', 'n/a', 'missing', '']:
+        default_deadline = datetime.now() + timedelta(days=7)
+        deadline_value = default_deadline.strftime("%Y-%m-%d %H:%M")
+        print(f"[DB SERVICE] WARNING: Deadline missing on insert. Using default: {deadline_value}")
+    # Use .get() with a default value to safely handle potentially missing keys
+    return (
+        task_data.get('subject', 'N/A'),
+        task_data.get('task_type', 'N/A'),
+        task_data.get('description_snippet', 'No snippet'),
+        deadline_value, # Deadline is required (per JSON schema)
+        task_data.get('priority', 'Medium'),
+        task_data.get('word_count_or_length', 'N/A'),
+        current_student_id()
+    )
+
+# Bumped in the same transaction as every write that changes a student's progress
+# report inputs, so a cached report is never served for data it did not see.
+SQL_BUMP_DATA_VERSION = ''' INSERT INTO data_versions(student_id, version) VALUES(?, 1)
+              ON CONFLICT(student_id) DO UPDATE SET version = version + 1 '''
+
+SQL_INSERT_TASK = ''' INSERT INTO tasks(subject, task_type,        description_snippet, deadline, priority,             word_count_or_length, student_id)
+              VALUES(?, ?, ?, ?, ?, ?, ?) '''
+
 def insert_task(task_data: dict)-> int:
-    """Insert a new task into tasks table."""
-    conn = create_connection()
+    """Insert a new task into tasks table, owned by the current student."""
+    conn = _student_connection()
     if conn  is None:
         return -1
     
-    sql = ''' INSERT INTO tasks(subject, task_type,        description_snippet, deadline, priority,             word_count_or_length)
-              VALUES(?, ?, ?, ?, ?, ?) '''
-    
     try:
         cursor = conn.cursor()
-        deadline_value = task_data.get('deadline')
-
-        if not deadline_value or deadline_value.lower().strip() in ['none', 'null', 'n/a', 'missing', '']:
-            default_deadline = datetime.now() + timedelta(days=7)
-            deadline_value = default_deadline.strftime("%Y-%m-%d %H:%M")
-            print(f"[DB SERVICE] WARNING: Deadline missing on insert. Using default: {deadline_value}")
-        # Use .get() with a default value to safely handle potentially missing keys
-        data = (
-            task_data.get('subject', 'N/A'),
-            task_data.get('task_type', 'N/A'),
-            task_data.get('description_snippet', 'No snippet'),
-            deadline_value, # Deadline is required (per JSON schema)
-            task_data.get('priority', 'Medium'),
-            task_data.get('word_count_or_length', 'N/A')
-        )
-        cursor.execute(sql, data)
+        cursor.execute(SQL_INSERT_TASK, _task_row(task_data))
+        task_id = cursor.lastrowid
+        cursor.execute(SQL_BUMP_DATA_VERSION, (current_student_id(),))
         conn.commit()
-        return cursor.lastrowid # Returns the ID of the newly inserted task
+        return task_id # Returns the ID of the newly inserted task
     except Error as e:
         print(f"Error inserting task: {e}")
+        conn.rollback() # Never leave a pooled connection mid-transaction
         return -1
-    finally:
-        close_connection(conn)
+
+def insert_ingested_tasks(entries: list) -> list:
+    """
+    Bulk insert used by batch ingestion (tools/batch_ingest.py).
+    `entries` is a list of (file_path, content_hash, task_data). All tasks are written
+    with one executemany in a single transaction, together with the ingested_files
+    records. Returns the new task IDs in entry order ([] on failure).
+    """
+    conn = _student_connection()
+    if conn is None or not entries:
+        return []
+
+    sql_ingested = ''' INSERT OR REPLACE INTO ingested_files(student_id, file_path, content_hash, task_id)
+                       VALUES(?, ?, ?, ?) '''
+    student_id = current_student_id()
+
+    try:
+        # IMMEDIATE holds the write lock for the whole batch, so the rowids assigned by
+        # executemany are consecutive and end at last_insert_rowid().
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        cursor.executemany(SQL_INSERT_TASK, [_task_row(task_data) for _, _, task_data in entries])
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        task_ids = list(range(last_id - len(entries) + 1, last_id + 1))
+
+        cursor.executemany(sql_ingested, [
+            (student_id, file_path, content_hash, task_id)
+            for (file_path, content_hash, _), task_id in zip(entries, task_ids)
+        ])
+        cursor.execute(SQL_BUMP_DATA_VERSION, (student_id,))
+        conn.commit()
+        return task_ids
+    except Error as e:
+        print(f"Error inserting ingested tasks: {e}")
+        conn.rollback()
+        return []
+
+def get_ingested_hashes() -> dict:
+    """Returns {file_path: content_hash} for every file the current student already ingested."""
+    conn = _student_connection()
+    if conn is None:
+        return {}
+
+    sql = "SELECT file_path, content_hash FROM ingested_files WHERE student_id = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(),))
+        return dict(cursor.fetchall())
+    except Error as e:
+        print(f"Error retrieving ingested files: {e}")
+        return {}
 
 # These are used by the Scheduler Agent to check for conflicts and save the new plan.
 
 def get_all_active_tasks():
-    """Retrieves all tasks that are not marked as completed."""
-    conn = create_connection()
+    """Retrieves all of the current student's tasks that are not marked as completed."""
+    conn = _student_connection()
     if conn is None:
         return []
-    
-    sql = "SELECT * FROM tasks WHERE is_completed = 0 ORDER BY deadline ASC"
+
+    sql = "SELECT * FROM tasks WHERE student_id = ? AND is_completed = 0 ORDER BY deadline ASC"
 
     try:
         cursor = conn.cursor()
-        cursor.execute(sql)
+        cursor.execute(sql, (current_student_id(),))
         # Fetch all results and return them as a list of dictionaries
         rows = cursor.fetchall()
         
@@ -160,118 +626,773 @@ def get_all_active_tasks():
     except Error as e:
         print(f"Error retrieving tasks: {e}")
         return []
-    finally:
-        close_connection(conn)
 
-def insert_schedule(task_id: int, schedule_text: str):
-    """Inserts a generated schedule linked to a specific task ID."""
-    conn = create_connection()
+def get_active_tasks_due_before(cutoff: str = None) -> list:
+    """
+    Retrieves the current student's active tasks due on or before `cutoff`
+    ('YYYY-MM-DD HH:MM'), oldest deadline first, with only the columns prompts need.
+    cutoff=None returns every active task. Deadlines are stored in sortable
+    'YYYY-MM-DD HH:MM' form, so this is a range scan on the partial
+    (student_id, deadline) index.
+    """
+    conn = _student_connection()
+    if conn is None:
+        return []
+
+    sql = ''' SELECT id, subject, task_type, deadline, priority FROM tasks
+              WHERE student_id = ? AND is_completed = 0 AND deadline <= ?
+              ORDER BY deadline ASC '''
+
+    try:
+        cursor = conn.cursor()
+        # '9999' sorts after every real deadline
+        cursor.execute(sql, (current_student_id(), cutoff or '9999'))
+        rows = cursor.fetchall()
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in rows]
+    except Error as e:
+        print(f"Error retrieving tasks: {e}")
+        return []
+
+def get_task_by_id(task_id: int):
+    """Retrieves one of the current student's tasks as a dictionary, or None if there is no such task."""
+    conn = _student_connection()
+    if conn is None:
+        return None
+
+    sql = "SELECT * FROM tasks WHERE id = ? AND student_id = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (task_id, current_student_id()))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cols = [column[0] for column in cursor.description]
+        return dict(zip(cols, row))
+    except Error as e:
+        print(f"Error retrieving task: {e}")
+        return None
+
+def insert_schedule(task_id: int, schedule_text: str, items: list = None):
+    """
+    Inserts a generated schedule linked to a specific task ID.
+
+    Args:
+        items: Optional structured steps, dicts with "day" ('YYYY-MM-DD'), "step",
+            "duration_minutes" and optionally "start" ('HH:MM'). They replace the
+            pending steps of any earlier plan for the task, in the same transaction.
+    """
+    conn = _student_connection()
     if conn is None:
         return False
-    
-    sql = ''' INSERT INTO schedules(task_id, schedule_text)
-              VALUES(?, ?) '''
-    
+
+    sql = ''' INSERT INTO schedules(task_id, schedule_text, student_id)
+              VALUES(?, ?, ?) '''
+    student_id = current_student_id()
+
     try:
         cursor = conn.cursor()
-        cursor.execute(sql, (task_id, schedule_text))
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(sql, (task_id, schedule_text, student_id))
+        if items:
+            schedule_id = cursor.lastrowid
+            cursor.execute(
+                "DELETE FROM schedule_items WHERE student_id = ? AND task_id = ? AND status = 'pending'",
+                (student_id, task_id)
+            )
+            cursor.executemany(
+                ''' INSERT INTO schedule_items(schedule_id, task_id, day, start, duration_minutes, step, student_id)
+                    VALUES(?, ?, ?, ?, ?, ?, ?) ''',
+                [(schedule_id, task_id, item["day"], item.get("start"), item["duration_minutes"], item["step"],
+                  student_id)
+                 for item in items]
+            )
+        cursor.execute(SQL_BUMP_DATA_VERSION, (student_id,))
         conn.commit()
         return True
     except Error as e:
         print(f"Error inserting schedule: {e}")
+        conn.rollback() # Never leave a pooled connection mid-transaction
         return False
-    finally:
-        close_connection(conn)
 
 def get_schedule_by_task_id(task_id: int)->str:
-    """Retrieves the schedule text for a specific task ID"""
-    conn = create_connection()
+    """Retrieves the most recent schedule text for one of the current student's tasks"""
+    conn = _student_connection()
     if conn is None:
         return "Error: Could not connect to database."
-    
-    sql = "SELECT schedule_text FROM schedules WHERE task_id = ?"
+
+    # Walks idx_schedules_student_task_date backwards: newest plan first, no sort step
+    sql = ''' SELECT schedule_text FROM schedules WHERE student_id = ? AND task_id = ?
+              ORDER BY date_generated DESC, id DESC LIMIT 1 '''
 
     try:
         cursor = conn.cursor()
-        cursor.execute(sql,(task_id,))
+        cursor.execute(sql,(current_student_id(), task_id))
         row = cursor.fetchone()
 
         return row[0] if row else "No schedule found for this task."
     except Error as e:
         print(f"Error retrieving schedule: {e}")
         return "Error retrieving schedule from database."
-    finally:
-        close_connection(conn)
+
+SQL_SCHEDULE_ITEM_COLUMNS = ''' si.id, si.task_id, t.subject, si.day, si.start,
+                                si.duration_minutes, si.step, si.status '''
+
+def get_schedule_items_for_day(day: str) -> list:
+    """
+    Retrieves every scheduled step for `day` ('YYYY-MM-DD') across the current student's
+    active tasks, ordered by start time (unset last) then task deadline.
+    """
+    conn = _student_connection()
+    if conn is None:
+        return []
+
+    sql = f''' SELECT {SQL_SCHEDULE_ITEM_COLUMNS}
+               FROM schedule_items si JOIN tasks t ON t.id = si.task_id
+               WHERE si.student_id = ? AND si.day = ? AND t.is_completed = 0
+               ORDER BY si.start IS NULL, si.start, t.deadline '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(), day))
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+    except Error as e:
+        print(f"Error retrieving schedule items: {e}")
+        return []
+
+def get_schedule_items(task_id: int, from_day: str = None) -> list:
+    """Retrieves a task's scheduled steps in day order, optionally only from `from_day` on."""
+    conn = _student_connection()
+    if conn is None:
+        return []
+
+    sql = f''' SELECT {SQL_SCHEDULE_ITEM_COLUMNS}
+               FROM schedule_items si JOIN tasks t ON t.id = si.task_id
+               WHERE si.student_id = ? AND si.task_id = ? AND si.day >= ?
+               ORDER BY si.day, si.start '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(), task_id, from_day or ""))
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+    except Error as e:
+        print(f"Error retrieving schedule items: {e}")
+        return []
+
+def set_schedule_item_status(item_id: int, status: str) -> bool:
+    """Marks one of the current student's scheduled steps 'done' (or back to 'pending')."""
+    conn = _student_connection()
+    if conn is None:
+        return False
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE schedule_items SET status = ? WHERE id = ? AND student_id = ?",
+                       (status, item_id, current_student_id()))
+        updated = cursor.rowcount > 0
+        if updated:
+            cursor.execute(SQL_BUMP_DATA_VERSION, (current_student_id(),))
+        conn.commit()
+        return updated
+    except Error as e:
+        print(f"Error updating schedule item: {e}")
+        conn.rollback()
+        return False
+
+SQL_COMPLETE_TASK_ITEMS = ''' UPDATE schedule_items SET status = 'done'
+                             WHERE student_id = ? AND task_id = ? AND status = 'pending' '''
 
 def mark_task_complete(task_id: int) -> bool:
-    """Marks a specific task as completed in the tasks table."""
-    conn = create_connection()
+    """Marks one of the current student's tasks as completed, along with its pending scheduled steps."""
+    conn = _student_connection()
     if conn is None:
         return False
-        
+
     sql = ''' UPDATE tasks
-              SET is_completed = 1 
-              WHERE id = ?'''
+              SET is_completed = 1
+              WHERE id = ? AND student_id = ?'''
     try:
         cursor = conn.cursor()
-        cursor.execute(sql, (task_id,))
+        cursor.execute(sql, (task_id, current_student_id()))
+        updated = cursor.rowcount > 0
+        if updated:
+            # A finished task has no steps left to do; same transaction as the task row
+            cursor.execute(SQL_COMPLETE_TASK_ITEMS, (current_student_id(), task_id))
+            cursor.execute(SQL_BUMP_DATA_VERSION, (current_student_id(),))
         conn.commit()
-        return cursor.rowcount > 0 # Returns True if a row was updated
+        return updated # Returns True if a row was updated
         
     except Error as e:
         print(f"Error marking task complete: {e}")
+        conn.rollback() # Never leave a pooled connection mid-transaction
         return False
-    finally:
-        close_connection(conn)
 
-# def get_due_reminders():
-#     """Retrieves and processes all reminders whose target_datetime is now or in the past."""
-#     conn = create_connection()
-#     if conn is None:
-#         return []
+# --- Progress report cache (used by agents/progress_agent.py) ---
 
-#     # 1. Get current time for comparison
-#     current_time = datetime.now()
-#     due_reminders_to_fire = []
-    
-#     # Select ALL reminders (we will filter in Python for reliability)
-#     sql_select_all = "SELECT id, reminder_text, target_datetime FROM reminders"
+def get_data_version() -> int:
+    """The current student's data version (0 before their first write)."""
+    conn = _student_connection()
+    if conn is None:
+        return 0
 
-#     try:
-#         cursor = conn.cursor()
-#         cursor.execute(sql_select_all)
-#         rows = cursor.fetchall()
-        
-#         # 2. Loop through all reminders and check for due status
-#         for row in rows:
-#             reminder_id, reminder_text, target_datetime_str = row
-            
-#             # Convert the stored string back into a Python datetime object
-#             # This is the most critical step for reliable comparison
-#             try:
-#                 target_time = datetime.strptime(target_datetime_str, "%Y-%m-%d %H:%M:%S")
-                
-#                 # Check if the target time is less than or equal to the current time
-#                 if target_time <= current_time:
-#                     due_reminders_to_fire.append({
-#                         'id': reminder_id, 
-#                         'reminder_text': reminder_text
-#                     })
-#             except ValueError:
-#                 # Handle cases where the datetime string format was wrong (e.g., from an old test)
-#                 print(f"[ERROR] Invalid datetime format found for Reminder ID {reminder_id}: {target_datetime_str}")
-                
-#         # 3. Process and delete due reminders
-#         if due_reminders_to_fire:
-#             due_ids = [str(r['id']) for r in due_reminders_to_fire]
-#             delete_sql = f"DELETE FROM reminders WHERE id IN ({','.join(due_ids)})"
-#             cursor.execute(delete_sql)
-#             conn.commit()
-            
-#         return due_reminders_to_fire
-
-#     except Error as e:
-#         print(f"Error in get_due_reminders: {e}")
-#         return []
-#     finally:
-#         close_connection(conn)
+    sql = "SELECT version FROM data_versions WHERE student_id = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(),))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    except Error as e:
+        print(f"Error retrieving data version: {e}")
+        return 0
+
+def get_cached_progress_report(task_id: int, data_version: int, time_bucket: str):
+    """The current student's stored report for `task_id` if built from this data version and time bucket, else None."""
+    conn = _student_connection()
+    if conn is None:
+        return None
+
+    sql = ''' SELECT report FROM progress_reports
+              WHERE student_id = ? AND task_id = ? AND data_version = ? AND time_bucket = ? '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(), task_id, data_version, time_bucket))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Error as e:
+        print(f"Error retrieving cached progress report: {e}")
+        return None
+
+def save_progress_report(task_id: int, data_version: int, time_bucket: str, report: str) -> bool:
+    """Stores the current student's latest report for `task_id` (replacing the previous one)."""
+    conn = _student_connection()
+    if conn is None:
+        return False
+
+    sql = ''' INSERT OR REPLACE INTO progress_reports(student_id, task_id, data_version, time_bucket, report)
+              VALUES(?, ?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (current_student_id(), task_id, data_version, time_bucket, report))
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving progress report: {e}")
+        conn.rollback()
+        return False
+
+# --- Reminders (used by tools/reminder_scheduler.py) ---
+# target_ts (UTC epoch seconds) is the indexed fire time; target_datetime keeps the
+# local 'YYYY-MM-DD HH:MM:SS' text for display. fired_at is set once a reminder is sent.
+# The scheduler serves every student, so pending reminders are read across all shards;
+# reminder IDs are only unique within one shard, hence (student_id, id) to identify one.
+
+SQL_REMINDER_COLUMNS = "id, reminder_text, target_datetime, target_ts, task_id, student_id"
+
+def insert_reminder(reminder_text: str, target: datetime, task_id: int = None) -> int:
+    """Inserts a new reminder for the current student at the local time `target`; returns its ID or -1."""
+    conn = _student_connection()
+    if conn is None:
+        return -1
+
+    sql = ''' INSERT INTO reminders(reminder_text, target_datetime, target_ts, task_id, student_id)
+              VALUES(?, ?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        # Rounded up, so a reminder never fires before its time
+        target_ts = math.ceil(target.timestamp())
+        cursor.execute(sql, (reminder_text, target.strftime("%Y-%m-%d %H:%M:%S"), target_ts, task_id,
+                             current_student_id()))
+        conn.commit()
+        return cursor.lastrowid
+    except Error as e:
+        print(f"Error inserting reminder: {e}")
+        conn.rollback()
+        return -1
+
+def get_pending_reminders(before_ts: int, limit: int = 1000) -> list:
+    """
+    Unfired reminders of all students due before `before_ts` (epoch seconds), earliest
+    first. A range scan on the partial idx_reminders_pending index of each shard, not a
+    full-table parse.
+    """
+    sql = f''' SELECT {SQL_REMINDER_COLUMNS} FROM reminders
+               WHERE fired_at IS NULL AND target_ts < ?
+               ORDER BY target_ts LIMIT ? '''
+
+    reminders = []
+    for db_file in all_student_database_files():
+        conn = get_connection(db_file)
+        if conn is None:
+            continue
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (before_ts, limit))
+            cols = [column[0] for column in cursor.description]
+            reminders += [dict(zip(cols, row)) for row in cursor.fetchall()]
+        except Error as e:
+            print(f"Error retrieving reminders: {e}")
+
+    # Each shard returned its earliest `limit`; the earliest `limit` overall are among them
+    reminders.sort(key=lambda r: r["target_ts"])
+    return reminders[:limit]
+
+def mark_reminder_fired(reminder_id: int, student_id: str = None) -> bool:
+    """
+    Claims a reminder (of `student_id`, default the current student) for sending.
+    Returns False if it was already fired (e.g. by another process), so each reminder
+    is delivered once.
+    """
+    conn = _student_connection(student_id)
+    if conn is None:
+        return False
+
+    sql = ''' UPDATE reminders SET fired_at = CURRENT_TIMESTAMP
+              WHERE id = ? AND student_id = ? AND fired_at IS NULL '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (reminder_id, student_id or current_student_id()))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print(f"Error marking reminder fired: {e}")
+        conn.rollback()
+        return False
+
+# --- Upload cache (used by tools/upload_cache.py) ---
+
+def get_cached_upload(content_hash: str):
+    """Returns the cached remote file record for a content hash, or None."""
+    conn = get_connection()
+    if conn is None:
+        return None
+
+    sql = "SELECT * FROM file_uploads WHERE content_hash = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (content_hash,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cols = [column[0] for column in cursor.description]
+        return dict(zip(cols, row))
+    except Error as e:
+        print(f"Error retrieving cached upload: {e}")
+        return None
+
+def save_cached_upload(content_hash: str, remote_name: str, remote_uri: str, mime_type: str,
+                       size_bytes: int, expires_at: str, last_used_at: str) -> bool:
+    """Records (or replaces) the remote file handle for a content hash."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = ''' INSERT OR REPLACE INTO file_uploads(content_hash, remote_name, remote_uri, mime_type,
+                                                  size_bytes, expires_at, last_used_at)
+              VALUES(?, ?, ?, ?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (content_hash, remote_name, remote_uri, mime_type, size_bytes, expires_at, last_used_at))
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving cached upload: {e}")
+        conn.rollback()
+        return False
+
+def touch_cached_upload(content_hash: str, last_used_at: str) -> bool:
+    """Updates the LRU timestamp of a cached upload."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = "UPDATE file_uploads SET last_used_at = ? WHERE content_hash = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (last_used_at, content_hash))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print(f"Error updating cached upload: {e}")
+        conn.rollback()
+        return False
+
+def delete_cached_upload(content_hash: str) -> bool:
+    """Removes a cached upload record (the remote file is deleted by the caller)."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = "DELETE FROM file_uploads WHERE content_hash = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (content_hash,))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print(f"Error deleting cached upload: {e}")
+        conn.rollback()
+        return False
+
+def get_evictable_uploads(expires_before: str, max_entries: int) -> list:
+    """
+    Returns cached uploads that should be evicted: every entry expiring before
+    `expires_before`, plus the least recently used entries beyond `max_entries`.
+    """
+    conn = get_connection()
+    if conn is None:
+        return []
+
+    sql = ''' SELECT * FROM file_uploads WHERE expires_at < ?
+              UNION
+              SELECT * FROM file_uploads WHERE content_hash NOT IN (
+                  SELECT content_hash FROM file_uploads ORDER BY last_used_at DESC LIMIT ?
+              ) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (expires_before, max_entries))
+        rows = cursor.fetchall()
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in rows]
+    except Error as e:
+        print(f"Error retrieving evictable uploads: {e}")
+        return []
+
+# --- Extraction result cache (used by tools/extraction_cache.py) ---
+
+def get_cached_extraction(cache_key: str, last_used_at: str):
+    """Returns the cached extraction JSON for a key (bumping its hit count), or None."""
+    conn = get_connection()
+    if conn is None:
+        return None
+
+    sql_select = "SELECT result_json FROM extraction_cache WHERE cache_key = ?"
+    sql_touch = ''' UPDATE extraction_cache
+                    SET hit_count = hit_count + 1, last_used_at = ?
+                    WHERE cache_key = ? '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql_select, (cache_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(sql_touch, (last_used_at, cache_key))
+        conn.commit()
+        return row[0]
+    except Error as e:
+        print(f"Error retrieving cached extraction: {e}")
+        conn.rollback()
+        return None
+
+def save_cached_extraction(cache_key: str, content_hash: str, model: str, schema_hash: str,
+                           result_json: str, last_used_at: str) -> bool:
+    """Stores an extraction result under its cache key."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = ''' INSERT OR REPLACE INTO extraction_cache(cache_key, content_hash, model, schema_hash,
+                                                      result_json, size_bytes, last_used_at)
+              VALUES(?, ?, ?, ?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (cache_key, content_hash, model, schema_hash, result_json,
+                             len(result_json.encode("utf-8")), last_used_at))
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving cached extraction: {e}")
+        conn.rollback()
+        return False
+
+def prune_extraction_cache(max_entries: int, max_bytes: int) -> int:
+    """
+    Evicts least recently used extraction results until the cache holds at most
+    `max_entries` rows and `max_bytes` of result JSON. Returns the number evicted.
+    """
+    conn = get_connection()
+    if conn is None:
+        return 0
+
+    # Keep the newest rows whose running size total stays within both bounds.
+    sql = ''' DELETE FROM extraction_cache WHERE cache_key NOT IN (
+                  SELECT cache_key FROM (
+                      SELECT cache_key,
+                             ROW_NUMBER() OVER (ORDER BY last_used_at DESC) AS rank,
+                             SUM(size_bytes) OVER (ORDER BY last_used_at DESC
+                                                   ROWS UNBOUNDED PRECEDING) AS running_bytes
+                      FROM extraction_cache
+                  ) WHERE rank <= ? AND running_bytes <= ?
+              ) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (max_entries, max_bytes))
+        conn.commit()
+        return cursor.rowcount
+    except Error as e:
+        print(f"Error pruning extraction cache: {e}")
+        conn.rollback()
+        return 0
+
+def get_extraction_cache_totals() -> dict:
+    """Returns entry count, stored bytes and lifetime hit count of the extraction cache."""
+    conn = get_connection()
+    if conn is None:
+        return {}
+
+    sql = ''' SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hit_count), 0)
+              FROM extraction_cache '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        entries, size_bytes, hits = cursor.fetchone()
+        return {"entries": entries, "size_bytes": size_bytes, "lifetime_hits": hits}
+    except Error as e:
+        print(f"Error reading extraction cache totals: {e}")
+        return {}
+
+# --- Chunk summary cache (used by tools/chunked_summary.py) ---
+
+def get_chunk_summaries(cache_keys: list, last_used_at: str) -> dict:
+    """Returns {cache_key: summary} for the keys that are cached, marking them as used."""
+    conn = get_connection()
+    if conn is None or not cache_keys:
+        return {}
+
+    # Batches of 500 keys stay under SQLite's bound-parameter limit
+    found = {}
+    try:
+        cursor = conn.cursor()
+        for i in range(0, len(cache_keys), 500):
+            batch = cache_keys[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            cursor.execute(f"SELECT cache_key, summary FROM chunk_summaries WHERE cache_key IN ({marks})", batch)
+            found.update(cursor.fetchall())
+        if found:
+            cursor.executemany("UPDATE chunk_summaries SET last_used_at = ? WHERE cache_key = ?",
+                               [(last_used_at, key) for key in found])
+            conn.commit()
+        return found
+    except Error as e:
+        print(f"Error retrieving chunk summaries: {e}")
+        conn.rollback()
+        return {}
+
+def save_chunk_summaries(entries: list, last_used_at: str) -> bool:
+    """Stores (cache_key, model, summary) tuples in one transaction."""
+    conn = get_connection()
+    if conn is None or not entries:
+        return False
+
+    sql = ''' INSERT OR REPLACE INTO chunk_summaries(cache_key, model, summary, last_used_at)
+              VALUES(?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(sql, [(key, model, summary, last_used_at) for key, model, summary in entries])
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving chunk summaries: {e}")
+        conn.rollback()
+        return False
+
+def prune_chunk_summaries(max_entries: int) -> int:
+    """Evicts least recently used chunk summaries beyond `max_entries`. Returns the number evicted."""
+    conn = get_connection()
+    if conn is None:
+        return 0
+
+    sql = ''' DELETE FROM chunk_summaries WHERE cache_key NOT IN (
+                  SELECT cache_key FROM chunk_summaries ORDER BY last_used_at DESC LIMIT ?
+              ) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (max_entries,))
+        conn.commit()
+        return cursor.rowcount
+    except Error as e:
+        print(f"Error pruning chunk summaries: {e}")
+        conn.rollback()
+        return 0
+
+# --- Context cache registry (used by tools/context_cache.py) ---
+
+def get_context_cache(cache_key: str):
+    """Returns the registry record of a cached prefix, or None."""
+    conn = get_connection()
+    if conn is None:
+        return None
+
+    sql = "SELECT * FROM context_caches WHERE cache_key = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (cache_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cols = [column[0] for column in cursor.description]
+        return dict(zip(cols, row))
+    except Error as e:
+        print(f"Error retrieving context cache: {e}")
+        return None
+
+def save_context_cache(cache_key: str, model: str, cache_name: str, token_count: int,
+                       expires_at: str, last_used_at: str) -> bool:
+    """Records (or replaces) the cached content of a prefix; cache_name None marks it uncacheable."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = ''' INSERT OR REPLACE INTO context_caches(cache_key, model, cache_name, token_count,
+                                                    expires_at, last_used_at)
+              VALUES(?, ?, ?, ?, ?, ?) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (cache_key, model, cache_name, token_count, expires_at, last_used_at))
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error saving context cache: {e}")
+        conn.rollback()
+        return False
+
+def touch_context_cache(cache_key: str, last_used_at: str, expires_at: str = None) -> bool:
+    """Updates the LRU timestamp of a cached prefix and, after a TTL refresh, its expiry."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = ''' UPDATE context_caches SET last_used_at = ?, expires_at = COALESCE(?, expires_at)
+              WHERE cache_key = ? '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (last_used_at, expires_at, cache_key))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print(f"Error updating context cache: {e}")
+        conn.rollback()
+        return False
+
+def delete_context_cache(cache_key: str) -> bool:
+    """Removes a cached prefix record (the remote cache is deleted by the caller)."""
+    conn = get_connection()
+    if conn is None:
+        return False
+
+    sql = "DELETE FROM context_caches WHERE cache_key = ?"
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (cache_key,))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print(f"Error deleting context cache: {e}")
+        conn.rollback()
+        return False
+
+def get_evictable_context_caches(expires_before: str, max_entries: int) -> list:
+    """
+    Returns cached prefixes that should be evicted: every entry expiring before
+    `expires_before`, plus the least recently used live caches beyond `max_entries`.
+    """
+    conn = get_connection()
+    if conn is None:
+        return []
+
+    sql = ''' SELECT * FROM context_caches WHERE expires_at < ?
+              UNION
+              SELECT * FROM context_caches WHERE cache_name IS NOT NULL AND cache_key NOT IN (
+                  SELECT cache_key FROM context_caches WHERE cache_name IS NOT NULL
+                  ORDER BY last_used_at DESC LIMIT ?
+              ) '''
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, (expires_before, max_entries))
+        rows = cursor.fetchall()
+        cols = [column[0] for column in cursor.description]
+        return [dict(zip(cols, row)) for row in rows]
+    except Error as e:
+        print(f"Error retrieving evictable context caches: {e}")
+        return []
+
+# --- Shared rate-limit buckets (used by tools/gemini_client.py) ---
+# Token buckets live in SQLite so every thread AND every worker process on this machine
+# draws from the same budget. All bucket changes run under BEGIN IMMEDIATE.
+
+def reserve_rate_limit_token(bucket: str, rate_per_s: float, capacity: float) -> float:
+    """
+    Takes one token from `bucket`, refilling it at `rate_per_s` up to `capacity`.
+    If the bucket is empty the token is still reserved (the balance goes negative), so
+    concurrent callers queue up fairly. Returns how many seconds the caller must wait.
+    """
+    conn = get_connection()
+    if conn is None:
+        return 0.0
+
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?", (bucket,)
+        ).fetchone()
+        tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate_per_s)
+        tokens -= 1
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limit_buckets(bucket, tokens, updated_at) VALUES(?, ?, ?)",
+            (bucket, tokens, now),
+        )
+        conn.commit()
+        return 0.0 if tokens >= 0 else -tokens / rate_per_s
+    except Error as e:
+        print(f"Error reserving rate-limit token: {e}")
+        conn.rollback()
+        return 0.0
+
+def drain_rate_limit_bucket(bucket: str, rate_per_s: float, pause_s: float) -> None:
+    """
+    Empties `bucket` so that no caller in any process gets a token for `pause_s` seconds.
+    Used when the API answers 429: the server has told us we are over quota.
+    """
+    conn = get_connection()
+    if conn is None:
+        return
+
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?", (bucket,)
+        ).fetchone()
+        current = 0.0 if row is None else row[0] + (now - row[1]) * rate_per_s
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limit_buckets(bucket, tokens, updated_at) VALUES(?, ?, ?)",
+            (bucket, min(current, -pause_s * rate_per_s), now),
+        )
+        conn.commit()
+    except Error as e:
+        print(f"Error draining rate-limit bucket: {e}")
+        conn.rollback()
@@ -71,18 +71,28 @@
 
 # main.py
 
-from google import genai
 from agents.orchestrator_agent import run_orchestrator 
+from agents.router_agent import route
+from tools.batch_ingest import ingest
+from tools.reminder_scheduler import get_reminder_scheduler, print_reminder
+from tools.gemini_client import stream_to
+from tools import tracing
+from database.memory_service import DEFAULT_STUDENT_ID, student_scope
 import os
-import threading,time
-# from database.memory_service import get_due_reminders
+import threading
+import time
+import httpx
 
-# --- Client Initialization (Used by the Orchestrator, good to keep here) ---
-client = genai.Client()
+# NOTE: No genai.Client() here. All agents share the lazily created client from
+# tools/gemini_client.py, so startup does not pay for building one.
 
-# --- NEW GLOBAL FLAG ---
-PAUSE_DAEMON_CHECK = False 
-# -----------------------
+STREAM_OUTPUT = True # Print model output in the CLI as it is generated
+PRINT_TRACE_SUMMARY = False # Print where each request's time went (see tools/tracing.py)
+STUDENT_ID = os.environ.get("STUDENT_ID", DEFAULT_STUDENT_ID) # Whose tasks the CLI works on
+SERVER_URL = os.environ.get("AGENT_SERVER_URL") # e.g. http://127.0.0.1:8765: the CLI becomes a thin client of server.py
+SERVER_TIMEOUT_S = 200 # a little above the server's own REQUEST_TIMEOUT_S
+INGEST_POLL_S = 2 # how often the thin client checks on a server-side ingest job
+REMINDER_POLL_S = 30 # how often the thin client asks the server for fired reminders
 
 # --- Utility Function ---
 def run_test(test_name: str, user_prompt: str, file_path: str = None):
@@ -104,11 +114,78 @@ def run_test(test_name: str, user_prompt: str, file_path: str = None):
 
 
 
+def handle_request(user_input: str, file_path: str = None, student_id: str = None) -> str:
+    """
+    Simple commands are answered by the local router; everything else by the orchestrator.
+    All database reads and writes are scoped to `student_id` (default: STUDENT_ID).
+    """
+    with student_scope(student_id or STUDENT_ID), \
+            tracing.trace("request", has_file=file_path is not None) as request_span:
+        routed = route(user_input, file_path)
+        if routed is not None:
+            request_span.set("routed", True)
+            return routed
+        print("\n[ORCHESTRATOR] Processing request...")
+        return run_orchestrator(user_input, file_path)
+
+
+# --- Thin client (AGENT_SERVER_URL set) ---
+# The work, the database and the reminder scheduler live in server.py; the CLI only
+# sends requests. A file named in a request is uploaded along with it.
+
+def _server_call(method: str, path: str, **kwargs) -> dict:
+    response = httpx.request(method, SERVER_URL.rstrip("/") + path, timeout=SERVER_TIMEOUT_S, **kwargs)
+    body = response.json()
+    if not response.is_success:
+        retry = response.headers.get("Retry-After")
+        hint = f" (retry in {retry} s)" if retry else ""
+        raise RuntimeError(f"Server answered {response.status_code}: {body.get('error')}{hint}")
+    for reminder in body.get("reminders", []):
+        print_reminder(reminder)
+    return body
+
+
+def remote_request(user_input: str, file_path: str = None, student_id: str = None) -> str:
+    """handle_request() on the server at SERVER_URL."""
+    fields = {"student_id": student_id or STUDENT_ID, "message": user_input}
+    if file_path is None:
+        return _server_call("POST", "/v1/request", json=fields)["response"]
+    with open(file_path, "rb") as f:
+        files = {"file": (os.path.basename(file_path), f)}
+        return _server_call("POST", "/v1/request", data=fields, files=files)["response"]
+
+
+def remote_ingest(path_or_glob: str, student_id: str = None) -> dict:
+    """Batch ingest of a folder inside the server's uploads/ directory (a server job, polled until done)."""
+    student_id = student_id or STUDENT_ID
+    job = _server_call("POST", "/v1/ingest", json={"student_id": student_id, "path": path_or_glob})
+    print(f"[CLI] Ingest job {job['job_id']} queued on the server.")
+    while job["status"] in ("queued", "running"):
+        time.sleep(INGEST_POLL_S)
+        job = _server_call("GET", f"/v1/ingest/{job['job_id']}", params={"student_id": student_id})
+    if job["status"] != "done":
+        raise RuntimeError(f"Ingest job failed on the server: {job.get('error')}")
+    report = job["report"]
+    print(f"[CLI] Saved {len(report['ingested'])} tasks, {len(report['failed'])} failed, {len(report['skipped'])} skipped.")
+    return report
+
+
+def _poll_reminders():
+    """Background thread of the thin client: shows reminders the server fired for us."""
+    while True:
+        time.sleep(REMINDER_POLL_S)
+        try:
+            _server_call("GET", "/v1/reminders", params={"student_id": STUDENT_ID})
+        except Exception as e:
+            print(f"\n[CLI] Could not fetch reminders: {e}")
+
+
 def run_interactive_cli():
     """
-    Starts an interactive command-line interface and the reminder daemon.
-    Includes logic to pause the reminder daemon when a short-term reminder 
-    is set, preventing instant alerts.
+    Starts an interactive command-line interface and the reminder scheduler.
+    Reminders fire from a background thread at their due time (see
+    tools/reminder_scheduler.py), so setting one never blocks this loop.
+    With AGENT_SERVER_URL set, requests go to server.py instead (see remote_request).
     """
     # print("="*60)
     # print("🧠 Student Agent CLI - Orchestrator Ready")
@@ -120,17 +197,15 @@ def run_interactive_cli():
     # print("  4. Type 'exit' or 'quit' to close the CLI.")
     # print("-" * 60)
     
-    # # --- START THE DAEMON THREAD ---
-    # daemon_thread = threading.Thread(target=reminder_daemon, daemon=True)
-    # daemon_thread.start()
+    # --- Start the reminder scheduler (also re-arms reminders saved in earlier runs) ---
+    if SERVER_URL:
+        print(f"[CLI] Sending requests to {SERVER_URL} as student '{STUDENT_ID}'.")
+        threading.Thread(target=_poll_reminders, name="reminder-poll", daemon=True).start()
+    else:
+        get_reminder_scheduler()
 
     # --- Main Interaction Loop ---
     while True:
-        # Define global flag logic here to ensure access
-        global PAUSE_DAEMON_CHECK 
-        should_pause = False
-        duration = 0
-        
         try:
             # Get user input
             user_input = input("\nAgent CLI > ")
@@ -140,23 +215,17 @@ def run_interactive_cli():
                 break
             if not user_input.strip():
                 continue
-            
-            # --- DYNAMIC PAUSE LOGIC ---
-            # Check if the user is setting a new, short-term reminder
-            if "reminder" in user_input.lower() and ("second" in user_input.lower() or "minute" in user_input.lower()):
-                
-                # Simple extraction of the duration number
-                for word in user_input.split():
-                    if word.isdigit():
-                        duration = int(word)
-                        break
-                
-                if duration > 0:
-                    PAUSE_DAEMON_CHECK = True # PAUSE THE CHECKER
-                    should_pause = True
-                    print(f"[ORCHESTRATOR] Daemon paused for {duration} seconds to ensure accurate timing.")
-
 
+            # --- Bulk import: "ingest uploads/" or "ingest uploads/*.pdf" ---
+            if user_input.lower().startswith("ingest "):
+                path_or_glob = user_input.split(maxsplit=1)[1].strip()
+                if SERVER_URL:
+                    remote_ingest(path_or_glob)
+                else:
+                    with student_scope(STUDENT_ID):
+                        ingest(path_or_glob)
+                continue
+            
             # --- File Path Extraction (as it was) ---
             file_path = None
             if "uploaded" in user_input.lower() or "file" in user_input.lower():
@@ -189,33 +258,39 @@ def run_interactive_cli():
                 print(f"[CLI] WARNING: File path could not be found based on input. Passing None to Orchestrator.")
                 # The Orchestrator will now receive None, which should lead to an error from the tool, but at least we know *why* here.
                             
-            # --- Call the Orchestrator ---
-            print("\n[ORCHESTRATOR] Processing request...")
-            final_output = run_orchestrator(user_input, file_path)
-            
-            # --- Resume Daemon if necessary (After Orchestrator completes) ---
-            if should_pause:
-                # Wait for the calculated duration plus a 5-second buffer for execution time
-                sleep_time = duration + 5
-                print(f"[ORCHESTRATOR] Resuming daemon in {sleep_time} seconds...")
-                time.sleep(sleep_time) 
-                PAUSE_DAEMON_CHECK = False
-                print("\n[ORCHESTRATOR] Daemon resumed.")
+            # --- Call the Router, or the Orchestrator ---
+            # Long generations (final answer, worksheets, reports) are printed as the
+            # tokens arrive instead of after the whole completion.
+            streamed = []
+            def print_chunk(text):
+                streamed.append(text)
+                print(text, end="", flush=True)
+
+            if SERVER_URL:
+                # The server answers once the request is done (no streaming over HTTP yet)
+                final_output = remote_request(user_input, file_path)
+            elif STREAM_OUTPUT:
+                with stream_to(print_chunk):
+                    final_output = handle_request(user_input, file_path)
+            else:
+                final_output = handle_request(user_input, file_path)
             
             # --- Display Final Result ---
-            print("\n" + "="*60)
-            print("✨ AGENT RESPONSE")
-            print("="*60)
-            print(final_output)
-            print("-" * 60)
+            # Skip the reprint when the answer was already streamed above
+            if streamed and final_output.strip() in "".join(streamed):
+                print("\n" + "-" * 60)
+            else:
+                print("\n" + "="*60)
+                print("✨ AGENT RESPONSE")
+                print("="*60)
+                print(final_output)
+                print("-" * 60)
+            if PRINT_TRACE_SUMMARY:
+                print(tracing.flame_summary())
             
         except Exception as e:
             print(f"\n[CRITICAL ERROR] An unexpected error occurred: {e}")
             print("Please try again.")
-            
-            # Ensure the daemon unpauses even on error
-            if should_pause:
-                PAUSE_DAEMON_CHECK = False
 
 
 
@@ -292,7 +367,7 @@ if __name__ == "__main__":
         else:
          print("Test run cancelled.")
 
-    # Ensure the database is initialized (if not already done via import)
+    # Ensure the database is initialized (importing memory_service no longer does this)
     try:
         from database.memory_service import initialize_database
         initialize_database()
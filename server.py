@@ -0,0 +1,383 @@
+# server.py
+#
+# Concurrent request server: a local HTTP JSON API in front of the agent, so many
+# students can use it at once instead of taking turns at one blocking input() loop.
+# Requests are admitted into a bounded worker pool; when every worker is busy and the
+# admission queue is full the server answers 503 (with Retry-After) right away, and a
+# request that does not finish within REQUEST_TIMEOUT_S is answered with 504. Each
+# request runs under its student's scope (database rows, reminders) and its own trace.
+# Batch ingests are jobs on a separate, smaller pool: the POST answers 202 with a job
+# id at once and the job's status is polled, so a long ingest neither times out nor
+# takes chat workers. The CLI in main.py becomes a thin client of this server when
+# AGENT_SERVER_URL is set.
+#
+# The HTTP layer is waitress, whose fixed thread pool (HTTP_THREADS) and connection
+# limit bound the threads that parse requests and wait on the pools; --dev runs
+# Flask's development server (one thread per connection) instead. create_app() builds
+# the WSGI app for any other server.
+#
+# Usage:  python server.py                          (http://127.0.0.1:8765)
+#         python server.py --port 9000 --workers 16 --queue 64
+#
+# API:    POST /v1/request   {"student_id": "s1234", "message": "...", "file_path": "CN_PAPER.pdf"}
+#                            or multipart form (student_id, message) with the file in "file"
+#         POST /v1/ingest    {"student_id": "s1234", "path": "uploads/term2/"}   -> 202 {"job_id": ...}
+#         GET  /v1/ingest/<job_id>?student_id=s1234   (status; the report once finished)
+#         GET  /v1/reminders?student_id=s1234   (reminders fired since the last call)
+#         GET  /v1/health
+
+import argparse
+import collections
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import Flask, jsonify, request
+from werkzeug.utils import secure_filename
+
+from database.memory_service import initialize_database, student_scope
+from main import handle_request
+from tools.batch_ingest import ingest
+from tools.reminder_scheduler import get_reminder_scheduler, print_reminder
+
+HOST = os.environ.get("AGENT_SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("AGENT_SERVER_PORT", "8765"))
+WORKERS = 8                 # requests executing at once (model calls are also paced by the rate limiter)
+MAX_QUEUED = 32             # admitted requests waiting for a worker; beyond that -> 503
+MAX_PER_STUDENT = 2         # in-flight requests per student, so one student cannot fill the pool -> 429
+REQUEST_TIMEOUT_S = 180     # admission to answer; slower requests get 504
+RETRY_AFTER_S = 5
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+UPLOAD_DIR = "uploads"
+INCOMING_DIR = os.path.join(UPLOAD_DIR, "incoming")   # files sent with a request, stored by content hash
+OUTBOX_SIZE = 50            # undelivered reminders kept per student
+INGEST_WORKERS = 2          # ingest jobs running at once (each fans out on tools.batch_ingest's pool)
+MAX_INGEST_JOBS = 8         # unfinished ingest jobs (running + queued); beyond that -> 503
+MAX_INGEST_PER_STUDENT = 1  # unfinished ingest jobs per student -> 429
+FINISHED_JOBS_KEPT = 200    # finished ingest jobs whose status can still be fetched
+HTTP_THREADS_SPARE = 8      # waitress threads beyond workers + queue (health, reminders, polls)
+CONNECTION_LIMIT = 200      # open connections waitress accepts before refusing more
+STUDENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+
+class Rejected(Exception):
+    """A request the pool refused to admit; carries the HTTP status to answer with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AdmissionPool:
+    """
+    ThreadPoolExecutor with an admission limit. At most `workers` requests run and at
+    most `max_queued` more wait; submit() raises Rejected instead of queueing beyond that.
+
+    A request that times out while still queued is cancelled. One that is already
+    running cannot be interrupted (it is a thread), so it keeps its slot until it
+    finishes; that is deliberate, since the slot count is what protects the process.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_queued: int = MAX_QUEUED, max_per_student: int = MAX_PER_STUDENT):
+        self.workers = workers
+        self.capacity = workers + max_queued
+        self.max_per_student = max_per_student
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="server-worker")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._per_student = collections.Counter()
+        self._stats = collections.Counter()
+
+    def submit(self, student_id: str, func, *args):
+        """Runs func(*args) under the student's scope on a worker; returns its Future."""
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self._stats["rejected_busy"] += 1
+                raise Rejected(503, "Server is busy, try again shortly.")
+            if self._per_student[student_id] >= self.max_per_student:
+                self._stats["rejected_student"] += 1
+                raise Rejected(429, f"Student '{student_id}' already has {self.max_per_student} requests in progress.")
+            self._admitted += 1
+            self._per_student[student_id] += 1
+            self._stats["admitted"] += 1
+
+        future = self._executor.submit(self._run, student_id, func, args)
+        future.add_done_callback(lambda _: self._release(student_id))
+        return future
+
+    def _run(self, student_id: str, func, args):
+        with self._lock:
+            self._running += 1
+        try:
+            with student_scope(student_id):
+                return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, student_id: str) -> None:
+        with self._lock:
+            self._admitted -= 1
+            self._per_student[student_id] -= 1
+            if self._per_student[student_id] <= 0:
+                del self._per_student[student_id]
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "running": self._running,
+                "queued": self._admitted - self._running,
+                **self._stats,
+            }
+
+
+class IngestJobs:
+    """
+    Batch ingests run as background jobs on their own AdmissionPool, tracked by id.
+    submit() raises Rejected like the request pool; finished jobs are kept (oldest
+    dropped first) so their report can be fetched after the POST has returned.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, max_jobs: int = MAX_INGEST_JOBS,
+                 max_per_student: int = MAX_INGEST_PER_STUDENT, keep: int = FINISHED_JOBS_KEPT):
+        self.pool = AdmissionPool(workers, max(0, max_jobs - workers), max_per_student)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs = collections.OrderedDict()
+
+    def submit(self, student_id: str, path: str) -> dict:
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "student_id": student_id, "path": path, "status": "queued",
+               "submitted_at": time.time()}
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            future = self.pool.submit(student_id, self._run, job_id, path)
+        except Rejected:
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return dict(job)
+
+    def _run(self, job_id: str, path: str) -> dict:
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+        return ingest(path)
+
+    def _finish(self, job_id: str, future) -> None:
+        error = future.exception()
+        with self._lock:
+            job = self._jobs[job_id]
+            job["finished_at"] = time.time()
+            if error is None:
+                job["status"] = "done"
+                job["report"] = future.result()
+                self.pool.count("completed")
+            else:
+                job["status"] = "failed"
+                job["error"] = str(error)
+                self.pool.count("failed")
+                print(f"[SERVER] Ingest job {job_id} for {job['student_id']} failed: {error}")
+            finished = [key for key, j in self._jobs.items() if "finished_at" in j]
+            for key in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[key]
+
+    def get(self, job_id: str, student_id: str):
+        """The job's status dict, or None if unknown (or another student's)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job and job["student_id"] == student_id else None
+
+
+class ReminderOutbox:
+    """Reminders fired by the scheduler, held per student until their client collects them."""
+
+    def __init__(self, size: int = OUTBOX_SIZE):
+        self._lock = threading.Lock()
+        self._boxes = collections.defaultdict(lambda: collections.deque(maxlen=size))
+
+    def deliver(self, reminder: dict) -> None:
+        print_reminder(reminder)  # still shown in the server console
+        with self._lock:
+            self._boxes[reminder["student_id"]].append(reminder)
+
+    def collect(self, student_id: str) -> list:
+        with self._lock:
+            box = self._boxes.pop(student_id, None)
+        return list(box or [])
+
+
+# --- Request parsing ---
+
+def _error(status: int, message: str, headers: dict = None):
+    return jsonify({"error": message}), status, headers or {}
+
+
+def _student_id(payload: dict) -> str:
+    student_id = str(payload.get("student_id") or "").strip()
+    if not STUDENT_ID_PATTERN.match(student_id):
+        raise Rejected(400, "A 'student_id' (letters, digits, '_', '.', '@', '-'; max 64) is required.")
+    return student_id
+
+
+def _upload_path(path: str) -> str:
+    """Resolves `path` (or uploads/<path>) to an existing path inside UPLOAD_DIR."""
+    root = os.path.realpath(UPLOAD_DIR)
+    for candidate in (path, os.path.join(UPLOAD_DIR, path)):
+        resolved = os.path.realpath(candidate)
+        if (resolved == root or resolved.startswith(root + os.sep)) and os.path.exists(resolved):
+            return os.path.relpath(resolved)
+    raise Rejected(400, f"'{path}' was not found in {UPLOAD_DIR}/.")
+
+
+def _save_upload(storage) -> str:
+    """Stores an uploaded file under INCOMING_DIR, named by content hash (re-sends are free)."""
+    data = storage.read()
+    name = secure_filename(storage.filename or "") or "upload"
+    file_path = os.path.join(INCOMING_DIR, f"{hashlib.sha256(data).hexdigest()[:16]}_{name}")
+    if not os.path.exists(file_path):
+        os.makedirs(INCOMING_DIR, exist_ok=True)
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    return file_path
+
+
+def _request_payload() -> tuple:
+    """(payload, file_path) from a JSON body or a multipart form with an optional 'file'."""
+    if request.files.get("file") is not None:
+        return request.form.to_dict(), _save_upload(request.files["file"])
+    if request.form:
+        payload = request.form.to_dict()
+    else:
+        payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise Rejected(400, "Expected a JSON object or a multipart form.")
+    file_path = payload.get("file_path")
+    return payload, _upload_path(str(file_path)) if file_path else None
+
+
+def _run(pool: AdmissionPool, student_id: str, func, *args):
+    """Admits func(*args) and waits for it, up to REQUEST_TIMEOUT_S."""
+    future = pool.submit(student_id, func, *args)
+    try:
+        return future.result(timeout=REQUEST_TIMEOUT_S)
+    except FutureTimeout:
+        future.cancel()  # only succeeds while still queued
+        pool.count("timed_out")
+        raise Rejected(504, f"The request did not finish within {REQUEST_TIMEOUT_S} s.")
+
+
+# --- App ---
+
+def create_app(pool: AdmissionPool = None, outbox: ReminderOutbox = None, jobs: IngestJobs = None) -> Flask:
+    pool = pool or AdmissionPool()
+    outbox = outbox or ReminderOutbox()
+    jobs = jobs or IngestJobs()
+    app = Flask(__name__)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
+    @app.errorhandler(Rejected)
+    def rejected(e):
+        headers = {"Retry-After": str(RETRY_AFTER_S)} if e.status in (429, 503) else None
+        return _error(e.status, str(e), headers)
+
+    @app.post("/v1/request")
+    def post_request():
+        payload, file_path = _request_payload()
+        student_id = _student_id(payload)
+        message = str(payload.get("message") or "").strip()
+        if not message:
+            raise Rejected(400, "A non-empty 'message' is required.")
+
+        started = time.perf_counter()
+        try:
+            answer = _run(pool, student_id, handle_request, message, file_path, student_id)
+        except Rejected:
+            raise
+        except Exception as e:
+            pool.count("failed")
+            print(f"[SERVER] Request for {student_id} failed: {e}")
+            return _error(500, f"An unexpected error occurred: {e}")
+        pool.count("completed")
+        return jsonify({
+            "student_id": student_id,
+            "response": answer,
+            "file_path": file_path,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "reminders": outbox.collect(student_id),
+        })
+
+    @app.post("/v1/ingest")
+    def post_ingest():
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not payload.get("path"):
+            raise Rejected(400, "Expected a JSON object with 'student_id' and 'path'.")
+        student_id = _student_id(payload)
+        path = str(payload["path"])
+        if not any(ch in path for ch in "*?["):
+            path = _upload_path(path)
+        elif not os.path.realpath(path).startswith(os.path.realpath(UPLOAD_DIR) + os.sep):
+            raise Rejected(400, f"Globs must stay inside {UPLOAD_DIR}/.")
+        job = jobs.submit(student_id, path)
+        return jsonify(job), 202, {"Location": f"/v1/ingest/{job['job_id']}"}
+
+    @app.get("/v1/ingest/<job_id>")
+    def get_ingest(job_id):
+        student_id = _student_id(request.args)
+        job = jobs.get(job_id, student_id)
+        if job is None:
+            raise Rejected(404, f"No ingest job '{job_id}' for student '{student_id}'.")
+        return jsonify(job)
+
+    @app.get("/v1/reminders")
+    def get_reminders():
+        student_id = _student_id(request.args)
+        return jsonify({"student_id": student_id, "reminders": outbox.collect(student_id)})
+
+    @app.get("/v1/health")
+    def health():
+        return jsonify({"status": "ok", **pool.snapshot(), "ingest": jobs.pool.snapshot()})
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the study agent as a concurrent HTTP JSON API.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="requests executing at once")
+    parser.add_argument("--queue", type=int, default=MAX_QUEUED, help="admitted requests waiting for a worker")
+    parser.add_argument("--dev", action="store_true", help="Flask development server instead of waitress")
+    args = parser.parse_args()
+
+    initialize_database()
+    outbox = ReminderOutbox()
+    # One scheduler for every student; fired reminders wait in the outbox for the client
+    get_reminder_scheduler(deliver=outbox.deliver)
+    app = create_app(AdmissionPool(args.workers, args.queue), outbox)
+
+    print(f"[SERVER] Listening on http://{args.host}:{args.port} "
+          f"({args.workers} workers, {args.queue} queued, {REQUEST_TIMEOUT_S} s timeout)")
+    if args.dev:
+        app.run(host=args.host, port=args.port, threaded=True)
+    else:
+        from waitress import serve
+
+        # Enough HTTP threads for every admitted request to wait on its future, so
+        # rejections (503/429) are answered at once instead of queueing in waitress
+        serve(app, host=args.host, port=args.port, threads=args.workers + args.queue + HTTP_THREADS_SPARE,
+              connection_limit=CONNECTION_LIMIT)
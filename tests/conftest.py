@@ -0,0 +1,36 @@
+# tests/conftest.py
+#
+# Shared fixtures. Every test that touches SQLite gets its own database file
+# (memory_service.DATABASE_FILE is redirected into pytest's tmp_path), and model calls
+# go to the offline benchmarks/fake_genai.FakeGeminiClient, so the suite needs no API
+# key or network.
+
+import pytest
+
+# Importing agents.progress_agent before the orchestrator is a circular import; load
+# the orchestrator (which pulls in every agent) first.
+import agents.orchestrator_agent  # noqa: F401
+from benchmarks.fake_genai import FakeGeminiClient
+from database import memory_service
+from tools import gemini_client
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database file with the current schema; returns its path."""
+    memory_service.close_all_connections()
+    monkeypatch.setattr(memory_service, "DATABASE_FILE", str(tmp_path / "test.db"))
+    memory_service.initialize_database()
+    yield memory_service.DATABASE_FILE
+    memory_service.close_all_connections()
+
+
+@pytest.fixture
+def fake_client(database, monkeypatch):
+    """FakeGeminiClient installed as the shared client; set .tool_script per test."""
+    # The shared rate limiter would otherwise pace the test at the real quota
+    monkeypatch.setattr(gemini_client, "MODEL_LIMITS", {})
+    monkeypatch.setattr(gemini_client, "DEFAULT_REQUESTS_PER_MINUTE", 60000)
+    fake = FakeGeminiClient()
+    monkeypatch.setattr(gemini_client, "_client", fake)
+    yield fake
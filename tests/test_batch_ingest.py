@@ -0,0 +1,77 @@
+# tests/test_batch_ingest.py
+
+import threading
+import time
+
+import pytest
+
+from database import memory_service
+from tools import batch_ingest
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for name in ("a.txt", "b.txt", "c.md", "notes.docx"):
+        (tmp_path / name).write_text(f"Assignment {name}: due 2030-01-10 23:59")
+    return tmp_path
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Replaces the model extraction; records which files were extracted."""
+    calls = []
+
+    def fake_extract(file_path):
+        calls.append(file_path)
+        if file_path.endswith("c.md"):
+            return {"error": "could not parse"}
+        return {"subject": file_path.rsplit("/", 1)[-1], "task_type": "Essay",
+                "deadline": "2030-01-10 23:59", "priority": "High"}
+
+    monkeypatch.setattr(batch_ingest, "extract_assignment_details", fake_extract)
+    return calls
+
+
+def test_new_files_are_saved_and_failures_reported(database, folder, extracted):
+    report = batch_ingest.ingest(str(folder))
+
+    assert sorted(item["subject"] for item in report["ingested"]) == ["a.txt", "b.txt"]
+    assert [item["file"].rsplit("/", 1)[-1] for item in report["failed"]] == ["c.md"]
+    assert len(extracted) == 3   # .docx is not a supported type
+    saved = {task["subject"] for task in memory_service.get_all_active_tasks()}
+    assert saved == {"a.txt", "b.txt"}
+
+
+def test_unchanged_files_are_skipped_on_the_next_run(database, folder, extracted):
+    batch_ingest.ingest(str(folder))
+    extracted.clear()
+    (folder / "b.txt").write_text("Assignment b.txt, now due later")
+
+    report = batch_ingest.ingest(str(folder))
+
+    assert [p.rsplit("/", 1)[-1] for p in report["skipped"]] == ["a.txt"]
+    # The changed file and the one that failed last time are tried again
+    assert sorted(p.rsplit("/", 1)[-1] for p in extracted) == ["b.txt", "c.md"]
+
+
+def test_in_flight_extractions_are_bounded_by_max_workers(database, tmp_path, monkeypatch):
+    for index in range(8):
+        (tmp_path / f"{index}.txt").write_text(f"file {index}")
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def slow_extract(file_path):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return {"subject": file_path, "deadline": "2030-01-10 23:59"}
+
+    monkeypatch.setattr(batch_ingest, "extract_assignment_details", slow_extract)
+
+    report = batch_ingest.ingest(str(tmp_path), max_workers=2)
+
+    assert len(report["ingested"]) == 8
+    assert state["peak"] <= 2
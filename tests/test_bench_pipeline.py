@@ -0,0 +1,51 @@
+# tests/test_bench_pipeline.py
+
+import pytest
+from google.genai.errors import ClientError
+
+from agents import orchestrator_agent
+from benchmarks import bench_pipeline
+from benchmarks.fake_genai import FakeGeminiClient
+from database import memory_service
+from tools import gemini_client
+
+
+@pytest.fixture
+def restore_globals(monkeypatch):
+    """bench_pipeline.run() installs its own client, rate limits, database file and DB timer."""
+    monkeypatch.setattr(gemini_client, "_client", gemini_client._client)
+    monkeypatch.setattr(gemini_client, "MODEL_LIMITS", gemini_client.MODEL_LIMITS)
+    monkeypatch.setattr(gemini_client, "DEFAULT_REQUESTS_PER_MINUTE", gemini_client.DEFAULT_REQUESTS_PER_MINUTE)
+    monkeypatch.setattr(memory_service, "DATABASE_FILE", memory_service.DATABASE_FILE)
+    monkeypatch.setattr(memory_service, "get_connection", memory_service.get_connection)
+    yield
+    memory_service.close_all_connections()
+
+
+def test_every_scenario_runs_offline_without_failures(restore_globals, capsys):
+    results = bench_pipeline.run(requests=2, latency_s=0.0, jitter_s=0.0, rate_limit_probability=0.0)
+
+    assert [r["name"] for r in results] == [
+        "run_orchestrator", "progress_report (cold)", "progress_report (warm)", "create_and_save_schedule"]
+    assert all(r["failures"] == 0 for r in results)
+    # Tool turn + final answer, plus the progress agent's own call
+    assert results[0]["round_trips"] == 3
+    # A warm report is served from the progress_reports cache without a model call
+    assert results[1]["round_trips"] == 1 and results[2]["round_trips"] == 0
+    assert "Fake client totals" in capsys.readouterr().out
+
+
+def test_orchestrator_follows_the_tool_script(fake_client):
+    fake_client.tool_script = [[("retrieve_active_tasks", {})], "Nothing is due."]
+
+    assert orchestrator_agent.run_orchestrator("What is due?", None) == "Nothing is due."
+    assert fake_client.stats["model_calls"] == 2
+
+
+def test_injected_rate_limits_carry_a_retry_hint():
+    fake = FakeGeminiClient(rate_limit_probability=1.0)
+    with pytest.raises(ClientError) as excinfo:
+        fake.models.generate_content(model="gemini-2.0-flash", contents="hi")
+    assert excinfo.value.code == 429
+    assert "RetryInfo" in str(excinfo.value.details)
+    assert fake.stats["rate_limited"] == 1
@@ -0,0 +1,90 @@
+# tests/test_chunked_summary.py
+
+import random
+
+from tools import chunked_summary
+from tools.chunked_summary import CHUNK_MAX_CHARS, CHUNK_MAX_PAGES, split_chunks, summarize_pages
+
+WORDS = "network packet router subnet latency protocol header routing switch frame".split()
+
+
+def _document(page_count, seed=1, numbered=True, offset=0):
+    rng = random.Random(seed)
+    pages = []
+    for index in range(page_count):
+        body = " ".join(rng.choice(WORDS) for _ in range(350))
+        text = f"Section {index}\n{body}" + (f"\n{index + 1 + offset}" if numbered else "")
+        pages.append((index, text, False))
+    return pages
+
+
+def _keys(pages):
+    return [chunk["key"] for chunk in split_chunks(pages)]
+
+
+def test_chunks_cover_every_page_in_order_within_the_limits():
+    pages = _document(200)
+
+    chunks = split_chunks(pages)
+
+    assert chunks[0]["first"] == 0 and chunks[-1]["last"] == 199
+    assert all(a["last"] + 1 == b["first"] for a, b in zip(chunks, chunks[1:]))
+    assert all(len(c["text"]) <= CHUNK_MAX_CHARS + 20 * CHUNK_MAX_PAGES for c in chunks)
+    assert all(c["last"] - c["first"] < CHUNK_MAX_PAGES for c in chunks)
+
+
+def test_an_inserted_page_only_changes_the_chunks_next_to_it():
+    pages = _document(200)
+    inserted = pages[:100] + [(0, "A brand new page about " + " ".join(WORDS * 30), False)] + pages[100:]
+    inserted = [(i, text, vision) for i, (_, text, vision) in enumerate(inserted)]
+
+    before, after = set(_keys(pages)), set(_keys(inserted))
+
+    assert len(before - after) <= 2
+    assert len(after) - len(before & after) <= 2
+
+
+def test_page_numbers_do_not_change_the_cache_keys():
+    assert _keys(_document(80)) == _keys(_document(80, offset=10)) == _keys(_document(80, numbered=False))
+
+
+def test_chunk_summaries_are_reused_on_the_next_run(fake_client):
+    pages = _document(300)
+    chunk_count = len(split_chunks(pages))
+
+    first = summarize_pages("long.pdf", pages, len(pages))
+    cold_calls = fake_client.stats["model_calls"]
+    summarize_pages("long.pdf", pages, len(pages))
+    warm_calls = fake_client.stats["model_calls"] - cold_calls
+
+    assert first == fake_client.text_response
+    assert cold_calls > chunk_count           # every chunk, the reduce levels and the final call
+    assert warm_calls == 1                    # only the final answer is generated again
+
+
+def test_an_edit_only_resummarizes_the_changed_chunk(fake_client):
+    pages = _document(300)
+    summarize_pages("long.pdf", pages, len(pages))
+    before = fake_client.stats["model_calls"]
+
+    edited = list(pages)
+    edited[150] = (150, edited[150][1].replace("Section", "Revised section"), False)
+    summarize_pages("long.pdf", edited, len(edited))
+
+    # The fake returns the same text for every chunk, so the reduce step hits the cache too
+    assert fake_client.stats["model_calls"] - before == 2
+
+
+def test_a_failed_chunk_does_not_sink_the_summary(fake_client, monkeypatch):
+    real = chunked_summary.generate_content
+    calls = {"map": 0}
+
+    def flaky(*, model, contents, **kwargs):
+        if model == chunked_summary.MAP_MODEL and calls["map"] == 0:
+            calls["map"] += 1
+            raise ValueError("blocked")
+        return real(model=model, contents=contents, **kwargs)
+
+    monkeypatch.setattr(chunked_summary, "generate_content", flaky)
+
+    assert summarize_pages("long.pdf", _document(100), 100) == fake_client.text_response
@@ -0,0 +1,119 @@
+# tests/test_context_cache.py
+
+import asyncio
+
+from agents import progress_agent
+from database import memory_service
+from tools import context_cache
+from tools.context_cache import CachedPrefix
+from tools.pdf_reader_tool import pdf_reader_tool
+
+MODEL = "gemini-2.0-flash"
+BIG_INSTRUCTION = "Answer as a patient networking tutor. " + "x" * 20000   # ~5k tokens, above the 4096 minimum
+TEXT_PDF = "uploads/Assignment_01.pdf"
+
+
+def test_a_large_prefix_is_cached_once_and_reused(fake_client):
+    prefix = CachedPrefix(MODEL, system_instruction=BIG_INSTRUCTION)
+
+    first = prefix.generate(["What is a subnet mask?"])
+    second = prefix.generate(["And a default gateway?"])
+
+    assert fake_client.stats["cache_creates"] == 1
+    assert first.usage_metadata.cached_content_token_count > 0
+    assert second.usage_metadata.cached_content_token_count > 0
+    # Only the question is billed as fresh input; the instruction comes from the cache
+    usage = second.usage_metadata
+    assert usage.prompt_token_count - usage.cached_content_token_count < 20
+
+
+def test_the_async_path_uses_the_same_cache(fake_client):
+    prefix = CachedPrefix(MODEL, system_instruction=BIG_INSTRUCTION)
+    prefix.generate(["What is a subnet mask?"])
+
+    response = asyncio.run(prefix.generate_async(["And a default gateway?"]))
+
+    assert fake_client.stats["cache_creates"] == 1
+    assert response.usage_metadata.cached_content_token_count > 0
+
+
+def test_a_small_prefix_is_sent_inline_without_asking_the_api(fake_client, monkeypatch):
+    creates = []
+    monkeypatch.setattr(fake_client.caches, "create", lambda **kwargs: creates.append(kwargs))
+    prefix = CachedPrefix(MODEL, system_instruction="Answer briefly.")
+
+    response = prefix.generate(["What is a subnet mask?"])
+
+    assert prefix.cacheable is False
+    assert creates == []
+    assert response.usage_metadata.cached_content_token_count is None
+
+
+def test_a_refused_prefix_is_not_offered_again(fake_client, monkeypatch):
+    fake_client.min_cache_tokens = None   # a model without context caching
+    attempts = []
+    create = fake_client.caches.create
+
+    def counting_create(**kwargs):
+        attempts.append(kwargs)
+        return create(**kwargs)
+
+    monkeypatch.setattr(fake_client.caches, "create", counting_create)
+    prefix = CachedPrefix(MODEL, system_instruction=BIG_INSTRUCTION)
+
+    prefix.generate(["one"])
+    prefix.generate(["two"])
+
+    assert len(attempts) == 1
+    assert fake_client.stats["model_calls"] == 2
+
+
+def test_a_cache_gone_on_the_server_falls_back_inline_and_is_recreated(fake_client):
+    prefix = CachedPrefix(MODEL, system_instruction=BIG_INSTRUCTION)
+    prefix.generate(["one"])
+    fake_client.caches_store.clear()   # expired or deleted server-side
+
+    response = prefix.generate(["two"])
+
+    assert response.text == fake_client.text_response
+    assert response.usage_metadata.cached_content_token_count is None
+    assert memory_service.get_context_cache(prefix.cache_key) is None
+    prefix.generate(["three"])
+    assert fake_client.stats["cache_creates"] == 2
+
+
+def test_least_recently_used_caches_are_evicted(fake_client):
+    for index in range(3):
+        CachedPrefix(MODEL, system_instruction=f"{index} {BIG_INSTRUCTION}").generate(["hi"])
+
+    assert context_cache.evict_context_caches(fake_client, max_entries=1) == 2
+    assert len(fake_client.caches_store) == 1
+
+
+def test_follow_up_questions_reuse_the_cached_document(fake_client, monkeypatch):
+    monkeypatch.setitem(context_cache.MIN_CACHE_TOKENS, "gemini-2.5-pro", 100)
+    fake_client.min_cache_tokens = 100
+
+    pdf_reader_tool(TEXT_PDF)
+    pdf_reader_tool(TEXT_PDF, "When is the report due?")
+
+    assert fake_client.stats["cache_creates"] == 1
+    assert fake_client.stats["cached_calls"] == 2
+
+
+def test_the_progress_agent_sends_its_instruction_once_per_call(fake_client, monkeypatch):
+    memory_service.insert_task({"subject": "Computer Networks", "deadline": "2030-01-15 23:59", "priority": "High"})
+    calls = []
+    respond = fake_client._respond
+
+    def recording_respond(model, contents, config):
+        calls.append((contents, config))
+        return respond(model, contents, config)
+
+    monkeypatch.setattr(fake_client, "_respond", recording_respond)
+
+    progress_agent.generate_progress_report()
+
+    [(contents, config)] = calls
+    assert "Progress and Resource Agent" in config["system_instruction"]
+    assert "Progress and Resource Agent" not in str(contents)
@@ -0,0 +1,72 @@
+# tests/test_extraction_cache.py
+
+import pytest
+
+from database import memory_service
+from tools import extraction_cache, task_extractor_tool
+from tools.task_extractor_tool import EXTRACTION_MODEL, EXTRACTION_VERSION, extract_assignment_details
+from tools.upload_cache import file_sha256
+
+RESULT = {"deadline": "2030-01-15 23:59", "task_type": "Essay", "subject": "History", "priority": "Low"}
+
+
+@pytest.fixture
+def handout(tmp_path):
+    path = tmp_path / "handout.txt"
+    path.write_text("Essay on the causes of the First World War, due 15 January 2030.")
+    return str(path)
+
+
+def _no_model(*args):
+    raise AssertionError("the model must not be called on a cache hit")
+
+
+def test_results_are_keyed_by_content_model_and_schema(database):
+    extraction_cache.put("abc", "model-a", "v1", RESULT)
+
+    assert extraction_cache.get("abc", "model-a", "v1") == RESULT
+    assert extraction_cache.get("abc", "model-b", "v1") is None
+    assert extraction_cache.get("abc", "model-a", "v2") is None
+    assert extraction_cache.schema_hash({"a": 1}, "p") != extraction_cache.schema_hash({"a": 1}, "q")
+
+
+def test_prune_keeps_the_cache_bounded(database):
+    for i in range(5):
+        extraction_cache.put(f"hash{i}", "model", "v1", RESULT)
+
+    assert memory_service.prune_extraction_cache(max_entries=2, max_bytes=10 ** 6) == 3
+    assert memory_service.get_extraction_cache_totals()["entries"] == 2
+
+
+def test_repeat_extraction_is_served_without_the_model(database, handout, monkeypatch):
+    extraction_cache.put(file_sha256(handout), EXTRACTION_MODEL, EXTRACTION_VERSION, RESULT)
+    monkeypatch.setattr(task_extractor_tool, "_extract_with_model", _no_model)
+    hits = extraction_cache.get_stats()["hits"]
+
+    assert extract_assignment_details(handout) == RESULT
+    assert extraction_cache.get_stats()["hits"] == hits + 1
+
+
+def test_failures_are_recorded_but_never_cached(database, handout, monkeypatch):
+    monkeypatch.setattr(task_extractor_tool, "_extract_with_model",
+                        lambda file_path, content_hash: {"error": "API/Extraction failed: 500"})
+    failures = extraction_cache.get_stats()["failures"]
+
+    assert "error" in extract_assignment_details(handout)
+
+    stats = extraction_cache.get_stats()
+    assert stats["failures"] == failures + 1
+    assert stats["last_failure"]["file_path"] == handout
+    assert stats["last_failure"]["error"] == "API/Extraction failed: 500"
+    assert extraction_cache.get(file_sha256(handout), EXTRACTION_MODEL, EXTRACTION_VERSION) is None
+
+
+def test_document_preparation_errors_name_the_step(fake_client, handout, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk on fire")
+    monkeypatch.setattr(task_extractor_tool, "document_contents", fail)
+
+    result = extract_assignment_details(handout)
+
+    assert result == {"error": "Failed to read/prepare document: disk on fire"}
+    assert extraction_cache.get_stats()["last_failure"]["error"] == result["error"]
@@ -0,0 +1,204 @@
+# tests/test_gemini_client.py
+
+import os
+import subprocess
+import sys
+import threading
+
+import httpx
+import pytest
+from google.genai.errors import ClientError, ServerError
+
+from database import memory_service
+from tools import gemini_client
+
+
+def test_client_is_created_once_and_shared(monkeypatch):
+    created = []
+    monkeypatch.setattr(gemini_client, "_client", None)
+    monkeypatch.setattr(gemini_client.genai, "Client", lambda: created.append(object()) or created[-1])
+
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(gemini_client.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(client is created[0] for client in seen)
+
+
+def test_set_client_replaces_the_shared_client(monkeypatch):
+    monkeypatch.setattr(gemini_client, "_client", None)
+    stand_in = object()
+    gemini_client.set_client(stand_in)
+    assert gemini_client.get_client() is stand_in
+
+
+def test_importing_the_agents_needs_no_key_and_creates_no_database(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("GEMINI_API_KEY", "GOOGLE_API_KEY")}
+    env["PYTHONPATH"] = os.getcwd()
+    script = (
+        "import database.memory_service, tools.pdf_reader_tool, tools.task_extractor_tool\n"
+        "from tools import gemini_client\n"
+        "assert gemini_client._client is None\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+# --- Shared rate limiter and retry policy ---
+
+def _api_error(code, retry_delay=None):
+    error = {"code": code, "message": "failed", "status": "ERROR"}
+    if retry_delay:
+        error["details"] = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay}]
+    return ClientError(code, {"error": error}) if code < 500 else ServerError(code, {"error": error})
+
+
+class FlakyModels:
+    """generate_content that raises the given errors first, then succeeds."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "response"
+
+
+@pytest.fixture
+def flaky(fake_client, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(gemini_client.time, "sleep", sleeps.append)
+
+    def install(*errors):
+        fake_client.models = FlakyModels(errors)
+        return fake_client.models, sleeps
+    return install
+
+
+def test_the_bucket_allows_a_burst_then_spaces_requests(database):
+    waits = [memory_service.reserve_rate_limit_token("test", rate_per_s=2.0, capacity=3) for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0.4 < waits[3] <= 0.5
+    assert 0.9 < waits[4] <= 1.0
+
+
+def test_a_drained_bucket_makes_every_caller_wait(database):
+    memory_service.reserve_rate_limit_token("test", rate_per_s=1.0, capacity=10)
+    memory_service.drain_rate_limit_bucket("test", rate_per_s=1.0, pause_s=5)
+
+    assert memory_service.reserve_rate_limit_token("test", rate_per_s=1.0, capacity=10) > 4
+
+
+@pytest.mark.parametrize("error", [
+    _api_error(429), _api_error(503), httpx.ConnectError("reset"), TimeoutError("slow"),
+])
+def test_transient_failures_are_retried(flaky, error):
+    models, sleeps = flaky(error, error)
+
+    assert gemini_client.generate_content(model="gemini-2.0-flash", contents="hi") == "response"
+    assert models.calls == 3
+    assert len(sleeps) >= 2
+
+
+@pytest.mark.parametrize("error", [_api_error(400), ValueError("bad schema")])
+def test_permanent_failures_are_raised_at_once(flaky, error):
+    models, sleeps = flaky(error)
+
+    with pytest.raises(type(error)):
+        gemini_client.generate_content(model="gemini-2.0-flash", contents="hi")
+    assert models.calls == 1
+    assert sleeps == []
+
+
+def test_retries_give_up_after_max_retries(flaky):
+    models, _ = flaky(*[_api_error(503)] * gemini_client.MAX_RETRIES)
+
+    with pytest.raises(ServerError):
+        gemini_client.generate_content(model="gemini-2.0-flash", contents="hi")
+    assert models.calls == gemini_client.MAX_RETRIES
+
+
+def test_the_server_retry_hint_is_honoured(flaky):
+    _, sleeps = flaky(_api_error(429, retry_delay="7s"))
+
+    gemini_client.generate_content(model="gemini-2.0-flash", contents="hi")
+
+    assert 7 <= sleeps[0] <= 7 + gemini_client.BASE_BACKOFF_S
+    assert gemini_client.retry_after_seconds(_api_error(429, retry_delay="2.5s")) == 2.5
+    assert gemini_client.retry_after_seconds(httpx.ReadTimeout("slow")) is None
+
+
+# --- Error classification and circuit breaking ---
+
+@pytest.mark.parametrize("error, expected", [
+    (_api_error(429), gemini_client.TRANSIENT),
+    (_api_error(500), gemini_client.TRANSIENT),
+    (httpx.ReadTimeout("slow"), gemini_client.TRANSIENT),
+    (gemini_client.CircuitOpenError("m", 5), gemini_client.TRANSIENT),
+    (_api_error(400), gemini_client.PERMANENT),
+    (_api_error(403), gemini_client.PERMANENT),
+    (ValueError("empty schedule"), gemini_client.PERMANENT),
+])
+def test_errors_are_classified_like_the_retry_policy(error, expected):
+    assert gemini_client.classify_error(error) == expected
+    assert gemini_client.is_retryable(error) == (expected == gemini_client.TRANSIENT
+                                                 and not isinstance(error, gemini_client.CircuitOpenError))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gemini_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _fail(error):
+    def call():
+        raise error
+    return call
+
+
+def test_the_circuit_opens_after_consecutive_transient_failures(clock):
+    breaker = gemini_client.CircuitBreaker("model", failure_threshold=3, cooldown_s=30)
+    for _ in range(3):
+        with pytest.raises(ServerError):
+            breaker.call(_fail(_api_error(503)))
+
+    with pytest.raises(gemini_client.CircuitOpenError) as excinfo:
+        breaker.call(lambda: "never called")
+    assert excinfo.value.retry_after_s == 30
+
+
+def test_permanent_failures_do_not_open_the_circuit(clock):
+    breaker = gemini_client.CircuitBreaker("model", failure_threshold=2)
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            breaker.call(_fail(_api_error(400)))
+
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+def test_one_probe_after_the_cooldown_decides_the_state(clock):
+    breaker = gemini_client.CircuitBreaker("model", failure_threshold=1, cooldown_s=30)
+    with pytest.raises(ServerError):
+        breaker.call(_fail(_api_error(503)))
+
+    clock[0] += 31
+    breaker.before_call()                      # this caller is the half-open probe
+    with pytest.raises(gemini_client.CircuitOpenError):
+        breaker.before_call()                  # everyone else still fails fast
+    breaker.record_failure(_api_error(503))    # probe failed: open for another cooldown
+    with pytest.raises(gemini_client.CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+    clock[0] += 31
+    assert breaker.call(lambda: "recovered") == "recovered"
+    assert breaker.call(lambda: "closed") == "closed"
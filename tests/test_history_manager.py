@@ -0,0 +1,74 @@
+# tests/test_history_manager.py
+
+import json
+
+from google.genai import types
+
+from agents.history_manager import (
+    MAX_TOOL_OUTPUT_CHARS,
+    ConversationHistory,
+    compact_tool_output,
+)
+
+
+def _model_turn(name):
+    return types.Content(role="model", parts=[types.Part.from_function_call(name=name, args={})])
+
+
+def _result(content):
+    return content.parts[0].function_response.response["result"]
+
+
+def _add_turn(history, name, output):
+    history.add_model_turn(_model_turn(name))
+    history.add_tool_results([(name, output, None)])
+    return history.contents[-1]
+
+
+def test_newest_results_are_sent_in_full_and_compacted_later():
+    history = ConversationHistory("Summarize my notes.", token_budget=100_000)
+    summary = "s" * (MAX_TOOL_OUTPUT_CHARS * 3)
+
+    first = _add_turn(history, "summarize_document_tool", summary)
+    assert _result(first) == summary
+
+    _add_turn(history, "get_progress_report_tool", "report")
+    compacted = _result(history.contents[2])
+    assert len(compacted) < len(summary)
+    assert "chars truncated" in compacted
+
+
+def test_an_oversized_newest_result_is_capped_to_the_budget():
+    history = ConversationHistory("Make me a worksheet.", token_budget=2000)
+
+    latest = _add_turn(history, "generate_practice_worksheet", "w" * 50_000)
+
+    assert history.token_count <= history.token_budget
+    assert "chars truncated" in _result(latest)
+    # The running estimate matches the entries actually sent
+    assert history.token_count == sum(
+        len(c.model_dump_json(exclude_none=True)) // 4 + 1 for c in history.contents)
+
+
+def test_old_results_are_stubbed_then_dropped_over_budget():
+    history = ConversationHistory("Plan my week.", token_budget=900)
+    for step in range(4):
+        _add_turn(history, f"tool_{step}", "x" * 1500)
+
+    contents = history.contents
+    assert history.token_count <= history.token_budget
+    assert contents[0].parts[0].text == "Plan my week."
+    # The newest pair is intact and still ends with the function responses
+    assert contents[-2].parts[0].function_call.name == "tool_3"
+    assert contents[-1].parts[0].function_response.name == "tool_3"
+    older = [_result(c) for c in contents[2:-2:2]]
+    assert all(r.startswith("[older output omitted") for r in older)
+
+
+def test_task_listings_are_reduced_to_references():
+    tasks = [{"id": 1, "subject": "Math", "deadline": "2030-01-01", "priority": "High",
+              "description_snippet": "long text " * 50, "status": "Pending"}]
+
+    compacted = compact_tool_output("retrieve_active_tasks", json.dumps(tasks))
+
+    assert compacted == [{"id": 1, "subject": "Math", "deadline": "2030-01-01", "priority": "High"}]
@@ -0,0 +1,251 @@
+# tests/test_memory_service.py
+
+import sqlite3
+import threading
+
+import pytest
+
+from database import memory_service
+from database.memory_service import bind_student, student_scope
+
+TASK = {
+    "subject": "Computer Networks",
+    "task_type": "Problem Set",
+    "description_snippet": "Subnetting and routing exercises",
+    "deadline": "2030-01-15 23:59",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+}
+
+
+# The tables as the first release created them, before schema migrations existed
+BASELINE_SCHEMA = [
+    """ CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            subject TEXT NOT NULL,
+            task_type TEXT,
+            description_snippet TEXT,
+            deadline TEXT NOT NULL,
+            priority TEXT,
+            word_count_or_length TEXT,
+            is_completed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ); """,
+    """ CREATE TABLE IF NOT EXISTS schedules (
+            id INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            schedule_text TEXT NOT NULL,
+            date_generated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES tasks (id)
+        ); """,
+    """ CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY,
+            reminder_text TEXT NOT NULL,
+            target_datetime TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ); """,
+]
+
+
+def _user_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _tables(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _connection_from_new_thread():
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(memory_service.get_connection()))
+    worker.start()
+    worker.join()
+    return seen[0]
+
+
+# --- Connection pool ---
+
+def test_a_thread_reuses_its_connection(database):
+    assert memory_service.get_connection() is memory_service.get_connection()
+
+
+def test_threads_get_their_own_connections(database):
+    assert _connection_from_new_thread() is not memory_service.get_connection()
+
+
+def test_connections_of_exited_threads_are_closed(database):
+    memory_service.get_connection()
+    open_before = memory_service._connection_manager.open_connection_count
+
+    conns = [_connection_from_new_thread() for _ in range(10)]
+
+    assert memory_service._connection_manager.open_connection_count == open_before
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[0].execute("SELECT 1")
+
+
+def test_close_all_connections_hands_out_fresh_ones(database):
+    old = memory_service.get_connection()
+    memory_service.close_all_connections()
+
+    new = memory_service.get_connection()
+
+    assert new is not old
+    assert new.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_functions_keep_working_on_pooled_connections(database):
+    task_id = memory_service.insert_task(dict(TASK))
+
+    assert [t["id"] for t in memory_service.get_all_active_tasks()] == [task_id]
+    assert memory_service.mark_task_complete(task_id) is True
+    assert memory_service.get_all_active_tasks() == []
+
+
+# --- Schema migrations ---
+
+def test_migrates_an_empty_database(tmp_path):
+    conn = sqlite3.connect(tmp_path / "empty.db")
+
+    assert memory_service.create_tables(conn) is True
+
+    assert _user_version(conn) == memory_service.SCHEMA_VERSION
+    assert {"tasks", "schedules", "reminders", "schedule_items", "context_caches",
+            "data_versions", "progress_reports"} <= _tables(conn)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_migrates_a_baseline_database_and_keeps_its_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "baseline.db")
+    raw = sqlite3.connect(path)
+    for statement in BASELINE_SCHEMA:
+        raw.execute(statement)
+    raw.execute("INSERT INTO tasks(subject, deadline, priority) VALUES ('Operating Systems', '2030-02-01 09:00', 'Low')")
+    raw.execute("INSERT INTO schedules(task_id, schedule_text) VALUES (1, 'Day 1: read chapter 3')")
+    raw.commit()
+    raw.close()
+    memory_service.close_all_connections()
+    monkeypatch.setattr(memory_service, "DATABASE_FILE", path)
+
+    memory_service.initialize_database()
+
+    assert _user_version(memory_service.get_connection()) == memory_service.SCHEMA_VERSION
+    [task] = memory_service.get_all_active_tasks()
+    assert task["subject"] == "Operating Systems"
+    assert memory_service.get_schedule_by_task_id(task["id"]) == "Day 1: read chapter 3"
+    memory_service.close_all_connections()
+
+
+def test_migrations_are_not_applied_twice(database, capsys):
+    conn = memory_service.get_connection()
+    capsys.readouterr()
+
+    assert memory_service.create_tables(conn) is True
+
+    assert "Applied schema migration" not in capsys.readouterr().out
+
+
+def test_failed_migration_is_rolled_back_and_retried(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path / "broken.db")
+    memory_service.create_tables(conn)
+    good = memory_service.SCHEMA_VERSION
+    monkeypatch.setattr(memory_service, "SCHEMA_MIGRATIONS",
+                        memory_service.SCHEMA_MIGRATIONS + [["CREATE TABLE extra (id INTEGER)", "NOT SQL"]])
+    monkeypatch.setattr(memory_service, "SCHEMA_VERSION", good + 1)
+
+    assert memory_service.create_tables(conn) is False
+    assert _user_version(conn) == good
+    assert "extra" not in _tables(conn)
+
+    memory_service.SCHEMA_MIGRATIONS[-1] = ["CREATE TABLE extra (id INTEGER)"]
+    assert memory_service.create_tables(conn) is True
+    assert _user_version(conn) == good + 1
+
+
+def test_active_task_listing_uses_an_index_without_sorting(database):
+    for day in range(1, 30):
+        memory_service.insert_task(dict(TASK, deadline=f"2030-01-{day:02d} 12:00"))
+    conn = memory_service.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    memory_service.get_all_active_tasks()
+    conn.set_trace_callback(None)
+
+    [listing] = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    plan = " ".join(str(row[-1]) for row in conn.execute(f"EXPLAIN QUERY PLAN {listing}"))
+    assert "USING INDEX" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_connection_manager_retries_a_failed_migration(tmp_path, monkeypatch):
+    memory_service.close_all_connections()
+    monkeypatch.setattr(memory_service, "DATABASE_FILE", str(tmp_path / "lazy.db"))
+    good = memory_service.SCHEMA_VERSION
+    monkeypatch.setattr(memory_service, "SCHEMA_MIGRATIONS",
+                        memory_service.SCHEMA_MIGRATIONS + [["NOT SQL"]])
+    monkeypatch.setattr(memory_service, "SCHEMA_VERSION", good + 1)
+
+    assert _user_version(memory_service.get_connection()) < good + 1
+    memory_service.close_all_connections()
+
+    memory_service.SCHEMA_MIGRATIONS[-1] = ["CREATE TABLE extra (id INTEGER)"]
+    conn = memory_service.get_connection()
+    assert _user_version(conn) == good + 1
+    assert "extra" in _tables(conn)
+    memory_service.close_all_connections()
+
+
+# --- Student scoping ---
+
+def test_students_only_see_their_own_tasks(database):
+    with student_scope("alice"):
+        alice_task = memory_service.insert_task(dict(TASK, subject="Alice's essay"))
+    with student_scope("bob"):
+        bob_task = memory_service.insert_task(dict(TASK, subject="Bob's lab"))
+
+    with student_scope("alice"):
+        assert [t["subject"] for t in memory_service.get_all_active_tasks()] == ["Alice's essay"]
+        assert memory_service.get_task_by_id(bob_task) is None
+        assert memory_service.mark_task_complete(bob_task) is False
+    with student_scope("bob"):
+        assert [t["subject"] for t in memory_service.get_all_active_tasks()] == ["Bob's lab"]
+        assert memory_service.get_task_by_id(alice_task) is None
+        assert memory_service.get_task_by_id(bob_task) is not None
+    # Outside any scope the CLI's default student has no tasks
+    assert memory_service.get_all_active_tasks() == []
+
+
+def test_scope_is_restored_after_the_block(database):
+    with student_scope("alice"):
+        with student_scope("bob"):
+            assert memory_service.current_student_id() == "bob"
+        assert memory_service.current_student_id() == "alice"
+    assert memory_service.current_student_id() == memory_service.DEFAULT_STUDENT_ID
+
+
+def test_bind_student_carries_the_scope_into_other_threads(database):
+    seen = {}
+
+    def record(key):
+        seen[key] = memory_service.current_student_id()
+
+    with student_scope("alice"):
+        plain = threading.Thread(target=record, args=("plain",))
+        bound = threading.Thread(target=bind_student(record), args=("bound",))
+        plain.start(), bound.start()
+        plain.join(), bound.join()
+
+    assert seen == {"plain": memory_service.DEFAULT_STUDENT_ID, "bound": "alice"}
+
+
+def test_sharded_students_are_isolated(database, monkeypatch):
+    monkeypatch.setattr(memory_service, "SHARD_COUNT", 4)
+    students = [f"student{i}" for i in range(8)]
+    for student in students:
+        with student_scope(student):
+            memory_service.insert_task(dict(TASK, subject=f"{student} task"))
+
+    assert len({memory_service.student_database_file(s) for s in students}) > 1
+    for student in students:
+        with student_scope(student):
+            assert [t["subject"] for t in memory_service.get_all_active_tasks()] == [f"{student} task"]
@@ -0,0 +1,125 @@
+# tests/test_orchestrator_async.py
+
+import asyncio
+import json
+import time
+
+import pytest
+from google.genai import types
+from google.genai.errors import ClientError
+
+from agents import orchestrator_agent
+from database import memory_service
+from database.memory_service import student_scope
+from tools import gemini_client, orchestrator_tools
+
+
+def _response(*parts):
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=list(parts)),
+        finish_reason=types.FinishReason.STOP,
+    )])
+
+
+class ScriptedModels:
+    """Async generate_content that replays a list of responses (or raises exceptions)."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+
+    async def generate_content(self, **kwargs):
+        self.requests.append(kwargs)
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+class ScriptedClient:
+    def __init__(self, script):
+        self.models = ScriptedModels(script)
+        self.aio = self
+
+
+def test_tool_results_are_sent_back_before_the_final_answer(fake_client, monkeypatch):
+    monkeypatch.setattr(orchestrator_tools, "echo_tool", lambda text: f"echo:{text}", raising=False)
+    client = ScriptedClient([
+        _response(types.Part.from_function_call(name="echo_tool", args={"text": "hi"})),
+        _response(types.Part.from_text(text="All done.")),
+    ])
+    monkeypatch.setattr(gemini_client, "_client", client)
+
+    answer = asyncio.run(orchestrator_agent.run_orchestrator_async("say hi", "doc.pdf"))
+
+    assert answer == "All done."
+    second_turn = client.models.requests[1]["contents"]
+    function_response = second_turn[-1].parts[0].function_response
+    assert function_response.name == "echo_tool"
+    assert function_response.response == {"result": "echo:hi"}
+
+
+def test_rate_limits_are_retried_without_blocking_the_loop(fake_client, monkeypatch):
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+
+    def blocking_sleep(seconds):
+        raise AssertionError("time.sleep must not be used by the async engine")
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(time, "sleep", blocking_sleep)
+    rate_limited = ClientError(429, {"error": {
+        "code": 429, "message": "quota", "status": "RESOURCE_EXHAUSTED",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "3s"}],
+    }})
+    client = ScriptedClient([rate_limited, rate_limited, _response(types.Part.from_text(text="ok"))])
+    monkeypatch.setattr(gemini_client, "_client", client)
+
+    assert asyncio.run(orchestrator_agent.run_orchestrator_async("hello", "doc.pdf")) == "ok"
+    # Each retry waits the server's hint plus jitter (and any bucket wait after the drain)
+    assert len(client.models.requests) == 3
+    assert sum(waits) >= 6
+
+
+def test_other_client_errors_are_not_retried(fake_client, monkeypatch):
+    bad_request = ClientError(400, {"error": {"code": 400, "message": "bad", "status": "INVALID_ARGUMENT"}})
+    client = ScriptedClient([bad_request])
+    monkeypatch.setattr(gemini_client, "_client", client)
+
+    with pytest.raises(ClientError):
+        asyncio.run(orchestrator_agent.run_orchestrator_async("hello", "doc.pdf"))
+    assert len(client.models.requests) == 1
+
+
+def _tool_results(contents) -> list:
+    """The function responses the orchestrator sent back to the model."""
+    return [part.function_response.response["result"]
+            for content in contents for part in content.parts or []
+            if part.function_response is not None]
+
+
+def test_concurrent_sessions_keep_their_students_apart(fake_client, monkeypatch):
+    fake_client.tool_script = [[("retrieve_active_tasks", {})], "Done."]
+    for student in ("alice", "bob"):
+        with student_scope(student):
+            memory_service.insert_task({"subject": f"{student} task", "deadline": "2030-01-15 23:59"})
+
+    sent = []
+    respond = fake_client._respond
+    def recording_respond(model, contents, config):
+        sent.extend(_tool_results(contents))
+        return respond(model, contents, config)
+    monkeypatch.setattr(fake_client, "_respond", recording_respond)
+
+    async def session(student):
+        with student_scope(student):
+            return await orchestrator_agent.run_orchestrator_async("List my tasks.", None)
+
+    async def main():
+        return await asyncio.gather(session("alice"), session("bob"))
+
+    assert asyncio.run(main()) == ["Done.", "Done."]
+    subjects = sorted(task["subject"] for result in sent for task in json.loads(result))
+    assert subjects == ["alice task", "bob task"]
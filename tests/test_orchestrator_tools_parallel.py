@@ -0,0 +1,47 @@
+# tests/test_orchestrator_tools_parallel.py
+
+import threading
+import time
+
+import pytest
+from google.genai import types
+
+from agents import orchestrator_agent
+from tools import orchestrator_tools
+
+
+def _call(name, **args):
+    return types.FunctionCall(name=name, args=args)
+
+
+def test_all_calls_of_a_turn_run_concurrently_in_call_order(monkeypatch):
+    started = threading.Barrier(2, timeout=2)   # both tools must be running at once
+
+    def slow_tool(label: str) -> str:
+        started.wait()
+        time.sleep(0.05)
+        return f"{label} done"
+
+    monkeypatch.setattr(orchestrator_tools, "slow_tool", slow_tool, raising=False)
+
+    results = orchestrator_agent._execute_function_calls([_call("slow_tool", label="first"),
+                                                           _call("slow_tool", label="second")])
+
+    assert results == [("slow_tool", "first done", None), ("slow_tool", "second done", None)]
+
+
+def test_unknown_tool_is_reported_as_an_error():
+    [(name, output, error)] = orchestrator_agent._execute_function_calls([_call("no_such_tool")])
+
+    assert (name, output) == ("no_such_tool", None)
+    assert error == "Error: Tool 'no_such_tool' not found."
+
+
+def test_failed_extraction_ends_the_run(monkeypatch):
+    monkeypatch.setattr(orchestrator_tools, "extract_assignment_data_tool",
+                        lambda file_path: {"error": "File not found at: x.pdf"})
+
+    [(_, _, error)] = orchestrator_agent._execute_function_calls(
+        [_call("extract_assignment_data_tool", file_path="x.pdf")])
+
+    assert error == "ERROR: Assignment data extraction failed: File not found at: x.pdf"
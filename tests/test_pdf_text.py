@@ -0,0 +1,74 @@
+# tests/test_pdf_text.py
+
+import io
+
+import pytest
+from google.genai import types
+
+from tools import pdf_text
+
+pypdf = pytest.importorskip("pypdf")
+
+TEXT_PDF = "uploads/Assignment_01.pdf"      # born-digital, 4 pages of text
+MIXED_PDF = "uploads/CN_PAPER.pdf"          # page 2 is a figure
+SCANNED_PDF = "uploads/software.pdf"        # a single scanned page
+IMAGE = "uploads/pic1.jpg"
+
+
+def test_text_pages_do_not_need_vision():
+    prose = "The report is due on 12 March and must be submitted through the portal. " * 5
+
+    assert pdf_text.page_needs_vision(prose, has_images=False) is False
+    assert pdf_text.page_needs_vision("Figure 3", has_images=True) is True
+    assert pdf_text.page_needs_vision("", has_images=False) is True
+    assert pdf_text.page_needs_vision("�\x07" * 300, has_images=False) is True
+
+
+def test_the_first_page_and_the_most_relevant_pages_fit_the_budget():
+    full = pdf_text.analyse_pdf(TEXT_PDF, pdf_text.ASSIGNMENT_KEYWORDS)
+    small = pdf_text.analyse_pdf(TEXT_PDF, pdf_text.ASSIGNMENT_KEYWORDS, max_chars=1500)
+
+    assert full["pages"] == [0, 1, 2, 3] and full["vision_pages"] == []
+    assert small["pages"][0] == 0
+    assert len(small["pages"]) < full["page_count"]
+    assert small["text"].startswith("[Page 1]")
+
+
+def test_a_document_that_must_be_read_whole_is_not_cut():
+    assert pdf_text.analyse_pdf(TEXT_PDF, max_chars=1500, allow_partial=False) is None
+    assert pdf_text.analyse_pdf(TEXT_PDF, max_chars=100_000, allow_partial=False)["pages"] == [0, 1, 2, 3]
+
+
+def test_a_text_pdf_is_sent_as_text_without_an_upload(fake_client):
+    [content] = pdf_text.document_contents(fake_client, TEXT_PDF, keywords=pdf_text.ASSIGNMENT_KEYWORDS)
+
+    assert content.startswith("--- DOCUMENT TEXT (Assignment_01.pdf) ---\n[Page 1]")
+    assert fake_client.stats["uploads"] == 0
+
+
+def test_only_the_selected_pages_are_sent_inline_when_one_needs_vision(fake_client, monkeypatch):
+    monkeypatch.setattr(pdf_text, "analyse_pdf", lambda *args, **kwargs: {
+        "pages": [1], "text": "", "vision_pages": [1], "page_count": 2})
+
+    [part] = pdf_text.document_contents(fake_client, MIXED_PDF)
+
+    assert isinstance(part, types.Part)
+    assert part.inline_data.mime_type == "application/pdf"
+    assert len(pypdf.PdfReader(io.BytesIO(part.inline_data.data)).pages) == 1
+    assert fake_client.stats["uploads"] == 0
+
+
+@pytest.mark.parametrize("file_path", [SCANNED_PDF, IMAGE])
+def test_scans_and_images_are_uploaded(fake_client, file_path):
+    [uploaded] = pdf_text.document_contents(fake_client, file_path)
+
+    assert isinstance(uploaded, types.File)
+    assert fake_client.stats["uploads"] == 1
+
+
+def test_without_pypdf_every_file_is_uploaded(fake_client, monkeypatch):
+    monkeypatch.setattr(pdf_text, "PdfReader", None)
+
+    [uploaded] = pdf_text.document_contents(fake_client, TEXT_PDF)
+
+    assert isinstance(uploaded, types.File)
@@ -0,0 +1,90 @@
+# tests/test_progress_agent.py
+
+from datetime import datetime
+
+import pytest
+
+from agents import progress_agent
+from database import memory_service
+from database.memory_service import student_scope
+
+TASK = {"subject": "Computer Networks", "deadline": "2030-01-15 23:59", "priority": "High"}
+STEPS = [{"day": "2030-01-10", "step": "Outline", "duration_minutes": 60}]
+
+
+def _report_calls(fake_client, task_id=None) -> int:
+    """Model calls made by one generate_progress_report()."""
+    before = fake_client.stats["model_calls"]
+    assert progress_agent.generate_progress_report(task_id) == fake_client.text_response
+    return fake_client.stats["model_calls"] - before
+
+
+def test_an_unchanged_report_is_served_from_the_cache(fake_client):
+    memory_service.insert_task(TASK)
+
+    assert _report_calls(fake_client) == 1
+    assert _report_calls(fake_client) == 0
+
+
+def _add_task(task_id):
+    memory_service.insert_task(dict(TASK, subject="History"))
+
+
+def _add_schedule(task_id):
+    memory_service.insert_schedule(task_id, "| plan |", STEPS)
+
+
+def _complete_task(task_id):
+    memory_service.mark_task_complete(task_id)
+
+
+@pytest.mark.parametrize("change", [_add_task, _add_schedule, _complete_task])
+def test_a_write_invalidates_the_cached_report(fake_client, change):
+    task_id = memory_service.insert_task(TASK)
+    memory_service.insert_task(dict(TASK, subject="Operating Systems"))
+    _report_calls(fake_client)
+    version = memory_service.get_data_version()
+
+    change(task_id)
+
+    assert memory_service.get_data_version() > version
+    assert _report_calls(fake_client) == 1
+
+
+def test_a_failed_write_does_not_invalidate(fake_client):
+    memory_service.insert_task(TASK)
+    _report_calls(fake_client)
+
+    assert memory_service.mark_task_complete(10_000) is False
+
+    assert _report_calls(fake_client) == 0
+
+
+def test_task_reports_are_cached_separately(fake_client):
+    task_id = memory_service.insert_task(TASK)
+    _report_calls(fake_client)
+
+    assert _report_calls(fake_client, task_id) == 1
+    assert _report_calls(fake_client, task_id) == 0
+
+
+def test_students_never_get_each_others_reports(fake_client):
+    for student in ("alice", "bob"):
+        with student_scope(student):
+            memory_service.insert_task(dict(TASK, subject=f"{student} task"))
+
+    with student_scope("alice"):
+        assert _report_calls(fake_client) == 1
+    with student_scope("bob"):
+        assert _report_calls(fake_client) == 1
+        memory_service.insert_task(TASK)
+    with student_scope("alice"):
+        assert _report_calls(fake_client) == 0
+
+
+def test_reports_expire_with_their_block_of_the_day():
+    bucket = progress_agent._time_bucket
+
+    assert bucket(datetime(2030, 1, 10, 9, 0)) == bucket(datetime(2030, 1, 10, 11, 59))
+    assert bucket(datetime(2030, 1, 10, 11, 59)) != bucket(datetime(2030, 1, 10, 12, 0))
+    assert bucket(datetime(2030, 1, 10, 9, 0)) != bucket(datetime(2030, 1, 11, 9, 0))
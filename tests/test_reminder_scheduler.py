@@ -0,0 +1,94 @@
+# tests/test_reminder_scheduler.py
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import memory_service
+from tools import orchestrator_tools, reminder_scheduler
+from tools.reminder_scheduler import ReminderScheduler
+
+
+class Inbox:
+    """Delivery callback that records reminders and lets a test wait for them."""
+
+    def __init__(self):
+        self.delivered = []
+        self._event = threading.Event()
+
+    def __call__(self, reminder):
+        self.delivered.append(reminder)
+        self._event.set()
+
+    def wait(self, timeout=5.0):
+        return self._event.wait(timeout)
+
+
+@pytest.fixture
+def schedulers(database):
+    started = []
+
+    def make(inbox):
+        scheduler = ReminderScheduler(deliver=inbox)
+        started.append(scheduler)
+        return scheduler
+    yield make
+    for scheduler in started:
+        scheduler.stop()
+
+
+def test_a_due_reminder_is_delivered_once_and_marked_fired(schedulers):
+    inbox = Inbox()
+    scheduler = schedulers(inbox)
+    scheduler.start()
+
+    reminder_id = scheduler.add("Submit the essay", datetime.now() + timedelta(seconds=0.2), task_id=3)
+
+    assert inbox.wait()
+    assert [(r["id"], r["reminder_text"], r["task_id"]) for r in inbox.delivered] == [(reminder_id, "Submit the essay", 3)]
+    assert memory_service.get_pending_reminders(int(datetime.now().timestamp()) + 3600, 10) == []
+    assert scheduler.pending_count() == 0
+
+
+def test_future_reminders_wait_and_sooner_ones_jump_the_queue(schedulers):
+    inbox = Inbox()
+    scheduler = schedulers(inbox)
+    scheduler.start()
+
+    scheduler.add("Much later", datetime.now() + timedelta(hours=1))
+    scheduler.add("Soon", datetime.now() + timedelta(seconds=0.2))
+
+    assert inbox.wait()
+    assert [r["reminder_text"] for r in inbox.delivered] == ["Soon"]
+    assert scheduler.pending_count() == 1
+
+
+def test_reminders_saved_before_a_restart_are_reloaded(schedulers):
+    memory_service.insert_reminder("Left over", datetime.now() - timedelta(minutes=1))
+    inbox = Inbox()
+
+    schedulers(inbox).start()
+
+    assert inbox.wait()
+    assert [r["reminder_text"] for r in inbox.delivered] == ["Left over"]
+
+
+def test_a_reminder_is_claimed_by_only_one_process(database):
+    reminder_id = memory_service.insert_reminder("Once", datetime.now())
+
+    assert memory_service.mark_reminder_fired(reminder_id) is True
+    assert memory_service.mark_reminder_fired(reminder_id) is False
+
+
+def test_set_reminder_tool_validates_its_arguments(database, monkeypatch):
+    inbox = Inbox()
+    scheduler = ReminderScheduler(deliver=inbox)   # not started: nothing is delivered
+    monkeypatch.setattr(reminder_scheduler, "_scheduler", scheduler)
+
+    assert orchestrator_tools.set_reminder_tool("Read", remind_at="tomorrow").startswith("ERROR: remind_at")
+    assert orchestrator_tools.set_reminder_tool("Read").startswith("ERROR: Provide")
+    result = orchestrator_tools.set_reminder_tool("Read chapter 4", remind_at="2030-01-10 18:30")
+
+    assert result.startswith("SUCCESS: Reminder ")
+    assert result.endswith("set for 2030-01-10 18:30:00: Read chapter 4")
@@ -0,0 +1,49 @@
+# tests/test_router_agent.py
+
+import pytest
+
+from agents.router_agent import classify, route
+from database import memory_service
+
+
+@pytest.mark.parametrize("user_input, expected", [
+    ("I finished Task ID 4", ("complete_task", 4)),
+    ("mark task 7 as done", ("complete_task", 7)),
+    ("Task #12 is complete.", ("complete_task", 12)),
+    ("Show me my assignments", ("list_tasks", None)),
+    ("what are my active tasks?", ("list_tasks", None)),
+    ("give me a progress report for task 3", ("progress_report", 3)),
+    ("How am I doing", ("progress_report", None)),
+])
+def test_simple_commands_take_the_fast_path(user_input, expected):
+    assert classify(user_input) == expected
+
+
+@pytest.mark.parametrize("user_input", [
+    "",
+    "tell me a joke",
+    "I finished task 4 and schedule task 5",     # compound
+    "complete task 9 then remind me",             # compound
+    "I haven't finished task 4",                  # negation
+    "summarize the pdf",                          # needs a file
+])
+def test_anything_else_goes_to_the_orchestrator(user_input):
+    assert classify(user_input) is None
+
+
+def test_route_answers_locally_without_a_model_call(fake_client):
+    task_id = memory_service.insert_task({"subject": "Math", "task_type": "Essay",
+                                          "deadline": "2030-01-10 23:59", "priority": "High"})
+
+    listing = route("show my tasks")
+    done = route(f"I finished task {task_id}")
+
+    assert listing.startswith("You have 1 active assignment:")
+    assert f"- Task ID {task_id}: Math (Essay) - due 2030-01-10 23:59, High priority" in listing
+    assert done == f"SUCCESS: Task ID {task_id} has been marked as complete and moved to history."
+    assert route("show my tasks") == "You have no active assignments. Enjoy your free time!"
+    assert fake_client.stats["model_calls"] == 0
+
+
+def test_requests_with_a_file_always_go_to_the_orchestrator(fake_client):
+    assert route("show my tasks", file_path="uploads/syllabus.pdf") is None
@@ -0,0 +1,124 @@
+# tests/test_schedule_engine.py
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from agents import schedule_engine
+from agents.schedule_engine import IntervalTree, build_schedule, estimate_effort_hours
+
+NOW = datetime(2030, 3, 4, 9, 0)   # a Monday
+
+
+def _task(days, task_type="Essay", priority="Medium", subject="Task", task_id=None, length=""):
+    return {
+        "id": task_id,
+        "subject": subject,
+        "task_type": task_type,
+        "priority": priority,
+        "deadline": (NOW + timedelta(days=days)).strftime("%Y-%m-%d %H:%M"),
+        "word_count_or_length": length,
+    }
+
+
+# --- Interval tree ---
+
+def test_interval_tree_matches_a_linear_scan():
+    rng = random.Random(7)
+    intervals = []
+    for index in range(300):
+        start = rng.randint(0, 500)
+        intervals.append((start, start + rng.randint(0, 40), index))
+    tree = IntervalTree(intervals)
+
+    for _ in range(200):
+        lo = rng.randint(-10, 520)
+        hi = lo + rng.randint(0, 30)
+        expected = {i for start, end, i in intervals if start <= hi and end >= lo}
+        found = tree.overlapping(lo, hi)
+        assert sorted(found) == sorted(expected)
+
+
+def test_interval_tree_edges():
+    tree = IntervalTree([(1, 3, "a"), (3, 5, "b"), (7, 7, "c")])
+
+    assert sorted(tree.overlapping(3, 3)) == ["a", "b"]   # closed intervals touch at 3
+    assert tree.overlapping(6, 6) == []
+    assert tree.overlapping(7, 7) == ["c"]
+    assert IntervalTree([]).overlapping(0, 100) == []
+
+
+# --- Effort and work days ---
+
+def test_effort_scales_with_type_priority_and_length():
+    assert estimate_effort_hours({"task_type": "Essay", "priority": "Medium"}) == 10.0
+    assert estimate_effort_hours({"task_type": "Essay", "priority": "High"}) == 12.5
+    assert estimate_effort_hours({"task_type": "Unknown"}) == schedule_engine.DEFAULT_EFFORT_HOURS
+    long_essay = {"task_type": "Essay", "priority": "Low", "word_count_or_length": "6,000 words"}
+    assert estimate_effort_hours(long_essay) == round((6000 / 300 + 2) * 0.75, 1)
+
+
+def test_work_days_end_a_buffer_day_before_the_deadline():
+    days = schedule_engine.work_days(NOW + timedelta(days=10), NOW.date())
+
+    assert len(days) == schedule_engine.PLANNING_DAYS
+    assert days[-1] == (NOW + timedelta(days=9)).date()
+
+
+def test_work_days_squeeze_into_a_close_deadline():
+    assert schedule_engine.work_days(NOW + timedelta(hours=5), NOW.date()) == [NOW.date()]
+    assert schedule_engine.work_days(NOW + timedelta(days=2), NOW.date()) == [
+        NOW.date(), (NOW + timedelta(days=1)).date()]
+
+
+# --- Plans ---
+
+def test_a_free_week_spreads_the_effort_and_keeps_a_review_day():
+    plan = build_schedule(_task(10), [], now=NOW)
+
+    assert len(plan["days"]) == schedule_engine.PLANNING_DAYS
+    assert sum(day["hours"] for day in plan["days"]) == pytest.approx(plan["effort_hours"], abs=0.3)
+    assert plan["days"][-1]["focus"] == "Final review and submission check"
+    assert plan["days"][-1]["hours"] == round(plan["effort_hours"] * schedule_engine.REVIEW_SHARE, 1)
+    assert plan["conflicts"] == [] and plan["warnings"] == []
+
+
+def test_busy_days_get_less_of_the_work_and_deadlines_inside_are_conflicts():
+    other = _task(7, "Exam", "High", subject="Physics", task_id=2)
+
+    plan = build_schedule(_task(10), [other], now=NOW)
+
+    busy = [day for day in plan["days"] if "Physics" in day["overlaps"]]
+    free = [day for day in plan["days"][:-1] if not day["overlaps"]]
+    assert busy and free
+    assert max(day["hours"] for day in busy if day is not plan["days"][-1]) < min(day["hours"] for day in free)
+    assert [t["id"] for t in plan["conflicts"]] == [2]
+
+
+def test_a_crowded_window_starts_earlier():
+    others = [_task(9, "Project", "High", subject=f"P{i}", task_id=i) for i in range(3)]
+
+    plan = build_schedule(_task(10), others, now=NOW)
+
+    assert len(plan["days"]) > schedule_engine.PLANNING_DAYS
+    assert plan["days"][0]["date"] >= NOW.date().isoformat()
+
+
+def test_close_past_and_missing_deadlines_are_flagged():
+    assert "too close for a buffer day" in build_schedule(_task(0.2), [], now=NOW)["warnings"][0]
+    assert "already passed" in build_schedule(_task(-1), [], now=NOW)["warnings"][0]
+    missing = dict(_task(5), deadline="")
+    assert "No valid deadline" in build_schedule(missing, [], now=NOW)["warnings"][0]
+
+
+def test_the_markdown_table_has_one_row_per_day():
+    task = _task(10, subject="History")
+    plan = build_schedule(task, [_task(7, subject="Physics", task_id=9)], now=NOW)
+
+    text = schedule_engine.render_markdown(task, plan)
+    rows = [line for line in text.splitlines() if line.startswith("| ") and not line.startswith("| Day")]
+
+    assert text.startswith("### Study plan: History (Essay)")
+    assert len(rows) == len(plan["days"])
+    assert "- Task 9: Physics" in text
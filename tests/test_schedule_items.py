@@ -0,0 +1,91 @@
+# tests/test_schedule_items.py
+
+from agents import task_context
+from database import memory_service
+from tools import orchestrator_tools
+
+TASK = {
+    "subject": "Computer Networks",
+    "task_type": "Problem Set",
+    "description_snippet": "Subnetting and routing exercises",
+    "deadline": "2030-01-15 23:59",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+}
+
+STEPS = [
+    {"day": "2030-01-10", "step": "Outline", "duration_minutes": 60},
+    {"day": "2030-01-11", "step": "Solve the problems", "duration_minutes": 120, "start": "18:00"},
+    {"day": "2030-01-12", "step": "Final review", "duration_minutes": 30},
+]
+
+
+def _planned_task(subject="Computer Networks"):
+    task_id = memory_service.insert_task(dict(TASK, subject=subject))
+    assert memory_service.insert_schedule(task_id, "| plan |", STEPS)
+    return task_id
+
+
+def _statuses(task_id):
+    return [item["status"] for item in memory_service.get_schedule_items(task_id)]
+
+
+def test_steps_are_stored_with_the_schedule(database):
+    task_id = _planned_task()
+
+    items = memory_service.get_schedule_items(task_id)
+
+    assert [(i["day"], i["step"], i["status"]) for i in items] == [
+        ("2030-01-10", "Outline", "pending"),
+        ("2030-01-11", "Solve the problems", "pending"),
+        ("2030-01-12", "Final review", "pending"),
+    ]
+    assert [i["day"] for i in memory_service.get_schedule_items(task_id, from_day="2030-01-11")] == [
+        "2030-01-11", "2030-01-12"]
+
+
+def test_a_new_plan_replaces_only_the_pending_steps(database):
+    task_id = _planned_task()
+    first = memory_service.get_schedule_items(task_id)[0]["id"]
+    memory_service.set_schedule_item_status(first, "done")
+
+    memory_service.insert_schedule(task_id, "| new plan |", [{"day": "2030-01-13", "step": "Redo", "duration_minutes": 45}])
+
+    assert [(i["step"], i["status"]) for i in memory_service.get_schedule_items(task_id)] == [
+        ("Outline", "done"), ("Redo", "pending")]
+    assert memory_service.get_schedule_by_task_id(task_id) == "| new plan |"
+
+
+def test_the_day_slice_covers_every_active_task(database):
+    networks = _planned_task()
+    history = _planned_task("History")
+    memory_service.mark_task_complete(history)
+
+    text, count = task_context.build_schedule_context(day="2030-01-11")
+
+    assert count == 1
+    assert text.splitlines()[0] == "|".join(task_context.SCHEDULE_ITEM_COLUMNS)
+    assert text.splitlines()[1].split("|")[1:3] == [str(networks), "Computer Networks"]
+
+
+def test_completing_a_task_marks_its_pending_steps_done(database):
+    task_id = _planned_task()
+    other = _planned_task("History")
+
+    assert memory_service.mark_task_complete(task_id)
+
+    assert _statuses(task_id) == ["done", "done", "done"]
+    assert _statuses(other) == ["pending", "pending", "pending"]
+    assert memory_service.mark_task_complete(10_000) is False
+
+
+def test_study_step_tools_list_and_tick_off_steps(database):
+    task_id = _planned_task()
+
+    listing = orchestrator_tools.list_study_steps_tool(task_id=task_id, day="2030-01-01")
+    step_id = int(listing.splitlines()[1].split("|")[0])
+
+    assert orchestrator_tools.complete_study_step_tool(step_id) == f"SUCCESS: Study step {step_id} has been marked as done."
+    assert _statuses(task_id) == ["done", "pending", "pending"]
+    assert orchestrator_tools.complete_study_step_tool(99_999).startswith("ERROR")
+    assert orchestrator_tools.list_study_steps_tool(day="2029-01-01") == "No planned study steps found."
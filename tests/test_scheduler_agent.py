@@ -0,0 +1,103 @@
+# tests/test_scheduler_agent.py
+
+import json
+
+import pytest
+from google.genai.errors import ClientError, ServerError
+
+from agents import scheduler_agent
+from database import memory_service
+from tools import gemini_client
+
+TASK = {
+    "subject": "Computer Networks",
+    "task_type": "Problem Set",
+    "description_snippet": "Subnetting and routing exercises",
+    "deadline": "2030-01-15 23:59",
+    "priority": "High",
+    "word_count_or_length": "10 problems",
+}
+
+
+class FailingModels:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def scheduler(fake_client, monkeypatch):
+    monkeypatch.setattr(gemini_client, "_breakers", {})
+    monkeypatch.setattr(gemini_client.time, "sleep", lambda seconds: None)
+    return fake_client
+
+
+def test_a_schedule_is_computed_locally_and_saved(scheduler):
+    task_id = memory_service.insert_task(dict(TASK))
+
+    summary = scheduler_agent.create_and_save_schedule(task_id, dict(TASK))
+
+    assert summary.startswith(f"Schedule generated and saved successfully for Task ID {task_id}")
+    assert "### Study plan: Computer Networks" in memory_service.get_schedule_by_task_id(task_id)
+    assert memory_service.get_schedule_items(task_id)
+    assert scheduler.stats["model_calls"] == 0
+
+
+def test_the_stored_task_wins_over_orchestrator_details(scheduler):
+    task_id = memory_service.insert_task(dict(TASK))
+
+    summary = scheduler_agent.create_and_save_schedule(task_id, dict(TASK, subject="Wrong", deadline="soon"))
+
+    assert "(Subject: Computer Networks)" in summary
+    assert "Deadline: 2030-01-15 23:59" in summary
+
+
+def test_polish_adds_prose_above_the_table(scheduler):
+    task_id = memory_service.insert_task(dict(TASK))
+    scheduler.text_response = "You can do this."
+
+    scheduler_agent.create_and_save_schedule(task_id, dict(TASK), polish=True)
+
+    saved = memory_service.get_schedule_by_task_id(task_id)
+    assert saved.startswith("You can do this.\n\n### Study plan")
+
+
+def test_a_failed_polish_still_saves_the_table(scheduler):
+    task_id = memory_service.insert_task(dict(TASK))
+    scheduler.models = FailingModels(ClientError(400, {"error": {"code": 400, "message": "bad", "status": "INVALID_ARGUMENT"}}))
+
+    summary = scheduler_agent.create_and_save_schedule(task_id, dict(TASK), polish=True)
+
+    assert summary.startswith("Schedule generated and saved successfully")
+    assert memory_service.get_schedule_by_task_id(task_id).startswith("### Study plan")
+
+
+def test_repeated_polish_outages_open_the_circuit(scheduler):
+    task_id = memory_service.insert_task(dict(TASK))
+    scheduler.models = FailingModels(ServerError(503, {"error": {"code": 503, "message": "down", "status": "UNAVAILABLE"}}))
+    threshold = gemini_client.get_circuit_breaker(scheduler_agent.POLISH_MODEL).failure_threshold
+
+    for _ in range(threshold):
+        scheduler_agent.create_and_save_schedule(task_id, dict(TASK), polish=True)
+    calls = scheduler.models.calls
+
+    summary = scheduler_agent.create_and_save_schedule(task_id, dict(TASK), polish=True)
+
+    assert summary.startswith("Schedule generated and saved successfully")
+    assert scheduler.models.calls == calls   # the model was not called again
+
+
+def test_an_engine_failure_is_returned_instead_of_exiting(scheduler, monkeypatch):
+    def broken(*args, **kwargs):
+        raise ValueError("bad plan")
+    monkeypatch.setattr(scheduler_agent, "build_schedule", broken)
+
+    result = json.loads(scheduler_agent.create_and_save_schedule(1, dict(TASK)))
+
+    assert result["error"] == "Schedule generation failed for Task ID 1: bad plan"
+    assert result["error_type"] == gemini_client.PERMANENT
+    assert result["retryable"] is False
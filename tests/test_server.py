@@ -0,0 +1,130 @@
+# tests/test_server.py
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import server
+from database import memory_service
+from tools import reminder_scheduler
+
+TEXT_PDF = "uploads/Assignment_01.pdf"
+
+
+@pytest.fixture
+def gate():
+    """An event the fake handlers block on; released at teardown so no worker is left hanging."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _blocked(gate):
+    def wait(*args):
+        assert gate.wait(5)
+        return "done"
+    return wait
+
+
+def test_the_pool_refuses_work_beyond_its_capacity(gate):
+    pool = server.AdmissionPool(workers=1, max_queued=1, max_per_student=2)
+    first = pool.submit("alice", _blocked(gate))
+    second = pool.submit("bob", _blocked(gate))
+
+    with pytest.raises(server.Rejected) as rejected:
+        pool.submit("carol", _blocked(gate))
+
+    assert rejected.value.status == 503
+    gate.set()
+    assert first.result(5) == second.result(5) == "done"
+    assert pool.submit("carol", lambda: "late").result(5) == "late"
+    assert pool.snapshot()["rejected_busy"] == 1
+
+
+def test_one_student_cannot_take_every_slot(gate):
+    pool = server.AdmissionPool(workers=4, max_queued=4, max_per_student=1)
+    pool.submit("alice", _blocked(gate))
+
+    with pytest.raises(server.Rejected) as rejected:
+        pool.submit("alice", _blocked(gate))
+
+    assert rejected.value.status == 429
+    assert pool.submit("bob", lambda: "ok").result(5) == "ok"
+
+
+def test_work_runs_under_the_students_scope():
+    pool = server.AdmissionPool(workers=2, max_queued=0)
+
+    assert pool.submit("alice", memory_service.current_student_id).result(5) == "alice"
+
+
+def test_a_slow_request_answers_504(gate, monkeypatch):
+    monkeypatch.setattr(server, "REQUEST_TIMEOUT_S", 0.1)
+    monkeypatch.setattr(server, "handle_request", _blocked(gate))
+    app = server.create_app(server.AdmissionPool(workers=1, max_queued=0))
+
+    response = app.test_client().post("/v1/request", json={"student_id": "alice", "message": "Plan my week"})
+
+    assert response.status_code == 504
+    assert "did not finish" in response.get_json()["error"]
+
+
+def test_a_full_pool_answers_503_with_retry_after(gate, monkeypatch):
+    monkeypatch.setattr(server, "handle_request", _blocked(gate))
+    pool = server.AdmissionPool(workers=1, max_queued=0)
+    pool.submit("bob", _blocked(gate))
+    app = server.create_app(pool)
+
+    response = app.test_client().post("/v1/request", json={"student_id": "alice", "message": "Plan my week"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(server.RETRY_AFTER_S)
+
+
+def test_requests_are_validated(database):
+    client = server.create_app().test_client()
+
+    assert client.post("/v1/request", json={"message": "hi"}).status_code == 400
+    assert client.post("/v1/request", json={"student_id": "alice"}).status_code == 400
+    assert client.post("/v1/request", json={"student_id": "alice", "message": "hi",
+                                            "file_path": "../main.py"}).status_code == 400
+
+
+def test_an_ingest_runs_as_a_job_the_client_polls(database, monkeypatch):
+    monkeypatch.setattr(server, "ingest", lambda path: {"path": path, "ingested": 1})
+    client = server.create_app().test_client()
+
+    accepted = client.post("/v1/ingest", json={"student_id": "alice", "path": TEXT_PDF})
+    job_id = accepted.get_json()["job_id"]
+    deadline = time.monotonic() + 5
+    while (job := client.get(f"/v1/ingest/{job_id}?student_id=alice").get_json())["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert accepted.status_code == 202
+    assert accepted.headers["Location"] == f"/v1/ingest/{job_id}"
+    assert job["report"] == {"path": TEXT_PDF, "ingested": 1}
+    assert client.get(f"/v1/ingest/{job_id}?student_id=bob").status_code == 404
+
+
+def test_reminders_due_at_startup_reach_the_outbox(database, monkeypatch):
+    monkeypatch.setattr(reminder_scheduler, "_scheduler", None)
+    with memory_service.student_scope("alice"):
+        memory_service.insert_reminder("Submit the lab", datetime.now())
+    outbox = server.ReminderOutbox()
+    delivered = threading.Event()
+
+    def deliver(reminder):
+        outbox.deliver(reminder)
+        delivered.set()
+
+    scheduler = reminder_scheduler.get_reminder_scheduler(deliver=deliver)
+    try:
+        assert delivered.wait(5)
+    finally:
+        scheduler.stop()
+
+    assert [r["reminder_text"] for r in outbox.collect("alice")] == ["Submit the lab"]
+    assert outbox.collect("alice") == []
@@ -0,0 +1,76 @@
+# tests/test_streaming.py
+
+import contextvars
+import threading
+
+from google.genai.errors import ServerError
+
+from benchmarks.fake_genai import STREAM_CHUNK_CHARS
+from tools import gemini_client
+
+LONG_TEXT = "Practice question about subnetting. " * 20
+
+
+def test_chunks_reach_the_sink_and_merge_into_one_response(fake_client):
+    fake_client.text_response = LONG_TEXT
+    chunks = []
+
+    with gemini_client.stream_to(chunks.append):
+        response = gemini_client.generate_content(model="gemini-2.0-flash", contents="hi", stream=True)
+
+    assert len(chunks) == -(-len(LONG_TEXT) // STREAM_CHUNK_CHARS)
+    assert "".join(chunks) == LONG_TEXT
+    assert response.text == LONG_TEXT
+    assert len(response.candidates[0].content.parts) == 1
+    assert response.usage_metadata.total_token_count > 0
+
+
+def test_nothing_streams_without_a_sink_or_without_opting_in(fake_client):
+    chunks = []
+
+    plain = gemini_client.generate_content(model="gemini-2.0-flash", contents="hi", stream=True)
+    with gemini_client.stream_to(chunks.append):
+        opted_out = gemini_client.generate_content(model="gemini-2.0-flash", contents="hi")
+
+    assert plain.text == opted_out.text == fake_client.text_response
+    assert chunks == []
+
+
+def test_the_sink_follows_the_context_not_the_thread(fake_client):
+    chunks = []
+
+    def call():
+        gemini_client.generate_content(model="gemini-2.0-flash", contents="hi", stream=True)
+
+    with gemini_client.stream_to(chunks.append):
+        plain_thread = threading.Thread(target=call)
+        plain_thread.start()
+        plain_thread.join()
+        assert chunks == []
+
+        copied = contextvars.copy_context()
+        context_thread = threading.Thread(target=copied.run, args=(call,))
+        context_thread.start()
+        context_thread.join()
+
+    assert "".join(chunks) == fake_client.text_response
+
+
+def test_a_stream_is_retried_until_the_first_chunk(fake_client, monkeypatch):
+    monkeypatch.setattr(gemini_client.time, "sleep", lambda seconds: None)
+    real_stream = fake_client.models.generate_content_stream
+    failures = [ServerError(503, {"error": {"code": 503, "message": "busy", "status": "UNAVAILABLE"}})]
+
+    def flaky_stream(**kwargs):
+        if failures:
+            raise failures.pop()
+        yield from real_stream(**kwargs)
+
+    monkeypatch.setattr(fake_client.models, "generate_content_stream", flaky_stream)
+    chunks = []
+
+    with gemini_client.stream_to(chunks.append):
+        response = gemini_client.generate_content(model="gemini-2.0-flash", contents="hi", stream=True)
+
+    assert response.text == fake_client.text_response
+    assert "".join(chunks) == fake_client.text_response
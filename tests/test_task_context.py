@@ -0,0 +1,70 @@
+# tests/test_task_context.py
+
+from datetime import datetime, timedelta
+
+from agents import task_context
+from database import memory_service
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+
+def _task(subject, days, priority="Medium"):
+    return memory_service.insert_task({
+        "subject": subject,
+        "task_type": "Essay",
+        "description_snippet": "A long description the prompts do not need",
+        "deadline": (NOW + timedelta(days=days)).strftime("%Y-%m-%d %H:%M"),
+        "priority": priority,
+        "word_count_or_length": "1500 words",
+    })
+
+
+def test_only_tasks_inside_the_window_are_selected(database):
+    overdue = _task("History", -2)
+    soon = _task("Math", 3)
+    _task("Physics", 30)
+
+    tasks, omitted = task_context.select_tasks(window_end=NOW + timedelta(days=14))
+
+    assert [t["id"] for t in tasks] == [overdue, soon]
+    assert omitted == 0
+
+
+def test_the_cap_keeps_higher_priority_tasks_in_deadline_order(database):
+    low = _task("Art", 1, "Low")
+    high_late = _task("Math", 5, "High")
+    medium = _task("Biology", 2, "Medium")
+    high_early = _task("Physics", 4, "High")
+
+    tasks, omitted = task_context.select_tasks(window_end=NOW + timedelta(days=14), max_tasks=3)
+
+    assert [t["id"] for t in tasks] == [medium, high_early, high_late]
+    assert omitted == 1
+    assert low not in [t["id"] for t in tasks]
+
+
+def test_the_task_being_scheduled_is_excluded(database):
+    scheduled = _task("Math", 1)
+    other = _task("Physics", 2)
+
+    tasks, _ = task_context.select_tasks(exclude_task_id=str(scheduled))
+
+    assert [t["id"] for t in tasks] == [other]
+
+
+def test_the_table_has_only_the_prompt_columns(database):
+    _task("Math", 1, "High")
+
+    text, count = task_context.build_task_context(window_end=NOW + timedelta(days=2))
+    header, row = text.splitlines()
+
+    assert count == 1
+    assert header == "id|subject|task_type|deadline|priority"
+    assert row.endswith("|Math|Essay|2030-01-02 09:00|High")
+    assert "description" not in text
+
+
+def test_an_empty_window_and_omitted_rows_are_spelled_out():
+    assert task_context.format_task_table([]) == "(none)"
+    table = task_context.format_task_table([{"id": 1, "subject": "Math"}], omitted=4)
+    assert table.endswith("(+4 lower-priority tasks in this window not shown)")
@@ -0,0 +1,73 @@
+# tests/test_tracing.py
+
+import asyncio
+import json
+import threading
+
+from google.genai.errors import ServerError
+
+from agents.orchestrator_agent import run_orchestrator_async
+from tools import gemini_client, tracing
+
+
+def test_orchestrator_trace_has_model_tool_and_db_spans(fake_client, tmp_path):
+    fake_client.tool_script = [[("retrieve_active_tasks", {})], "Done."]
+
+    asyncio.run(run_orchestrator_async("List my tasks.", None))
+
+    root = tracing.last_trace()
+    assert root.name == "orchestrator"
+    names = [s.name for s in root.walk()]
+    assert names.count("model") == 2
+    assert "tool:retrieve_active_tasks" in names
+    assert "db" in names
+    model_spans = [s for s in root.walk() if s.name == "model"]
+    assert all(s.attrs.get("prompt_tokens", 0) > 0 for s in model_spans)
+
+    path = tmp_path / "trace.jsonl"
+    tracing.export_jsonl(root, str(path))
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0]["parent_id"] is None and records[0]["name"] == "orchestrator"
+    assert {r["trace_id"] for r in records} == {root.trace_id}
+    assert "tool:retrieve_active_tasks" in tracing.flame_summary(root)
+
+
+def test_span_is_a_no_op_outside_a_trace():
+    with tracing.span("db") as span_obj:
+        span_obj.set("rows", 3)
+    assert tracing.current().add("hits") is None
+
+
+def test_retries_and_backoff_are_recorded_on_the_model_span(fake_client, monkeypatch):
+    monkeypatch.setattr(gemini_client.time, "sleep", lambda seconds: None)
+    real = fake_client.models.generate_content
+    failures = [ServerError(503, {"error": {"code": 503, "message": "busy", "status": "UNAVAILABLE"}})]
+
+    def flaky(**kwargs):
+        if failures:
+            raise failures.pop()
+        return real(**kwargs)
+
+    monkeypatch.setattr(fake_client.models, "generate_content", flaky)
+
+    with tracing.trace("request") as root:
+        gemini_client.generate_content(model="gemini-2.0-flash", contents="hi")
+
+    [model_span] = [s for s in root.walk() if s.name == "model"]
+    assert model_span.attrs["retries"] == 1
+    assert model_span.attrs["backoff_ms"] > 0
+    assert model_span.attrs["output_tokens"] > 0
+
+
+def test_bind_keeps_worker_thread_spans_in_the_trace():
+    def work():
+        with tracing.span("worker"):
+            pass
+
+    with tracing.trace("request") as root:
+        for target in (work, tracing.bind(work)):
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+
+    assert [s.name for s in root.walk()] == ["request", "worker"]
@@ -0,0 +1,75 @@
+# tests/test_upload_cache.py
+
+import hashlib
+import itertools
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+from tools import upload_cache
+
+
+class StubFiles:
+    """Records uploads and deletes; uploads expire `ttl` from now."""
+
+    def __init__(self, ttl=timedelta(hours=48)):
+        self.ttl = ttl
+        self.uploaded, self.deleted = [], []
+        self._ids = itertools.count(1)
+
+    def upload(self, *, file, config=None):
+        name = f"files/{next(self._ids)}"
+        self.uploaded.append(file)
+        return types.File(name=name, uri=f"https://example.invalid/{name}", mime_type="application/pdf",
+                          expiration_time=datetime.now(timezone.utc) + self.ttl)
+
+    def delete(self, *, name, config=None):
+        self.deleted.append(name)
+
+
+class StubClient:
+    def __init__(self, **kwargs):
+        self.files = StubFiles(**kwargs)
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_file_hash_is_the_sha256_of_the_contents(tmp_path):
+    data = b"x" * (upload_cache.HASH_CHUNK_SIZE + 17)
+    assert upload_cache.file_sha256(_write(tmp_path, "big.pdf", data)) == hashlib.sha256(data).hexdigest()
+
+
+def test_same_content_is_uploaded_once(database, tmp_path):
+    client = StubClient()
+    first = upload_cache.get_or_upload(client, _write(tmp_path, "a.pdf", b"handout"))
+    # Another name, same bytes (a second student's copy): served from the cache
+    second = upload_cache.get_or_upload(client, _write(tmp_path, "copy.pdf", b"handout"))
+
+    assert len(client.files.uploaded) == 1
+    assert second.name == first.name and second.uri == first.uri
+
+
+def test_upload_close_to_expiry_is_replaced(database, tmp_path):
+    client = StubClient(ttl=upload_cache.EXPIRY_SAFETY_MARGIN / 2)
+    path = _write(tmp_path, "a.pdf", b"handout")
+
+    upload_cache.get_or_upload(client, path)
+    upload_cache.get_or_upload(client, path)
+
+    assert len(client.files.uploaded) == 2
+
+
+def test_least_recently_used_uploads_are_evicted(database, tmp_path):
+    client = StubClient()
+    for i in range(3):
+        upload_cache.get_or_upload(client, _write(tmp_path, f"{i}.pdf", bytes([i])))
+
+    evicted = upload_cache.evict_uploads(client, max_entries=1)
+
+    assert evicted == 2
+    assert len(set(client.files.deleted)) == 2
+    assert upload_cache.evict_uploads(client, max_entries=1) == 0
@@ -0,0 +1,119 @@
+# tools/batch_ingest.py
+#
+# Bulk import of assignment files (e.g. a whole term's syllabi dropped into uploads/).
+# Files are hashed, unchanged ones are skipped, the rest are extracted concurrently with
+# bounded parallelism, and all resulting tasks are saved in ONE executemany transaction.
+#
+# Usage:  python -m tools.batch_ingest uploads/              (a directory)
+#         python -m tools.batch_ingest "uploads/*.pdf"        (a glob)
+#         python -m tools.batch_ingest uploads/ --workers 8
+#         python -m tools.batch_ingest uploads/ --student s1234   (tasks owned by that student)
+
+import argparse
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database.memory_service import (
+    DEFAULT_STUDENT_ID, get_ingested_hashes, insert_ingested_tasks, student_scope
+)
+from tools.task_extractor_tool import extract_assignment_details
+from tools.upload_cache import file_sha256
+
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".webp", ".txt", ".md"}
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16              # size of the shared extraction pool; caps --workers
+
+
+# One long-lived pool for every ingest() call (the server runs one per request), so
+# worker threads and their pooled SQLite connections are reused, not re-created.
+_ingest_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="batch-ingest")
+
+
+def find_files(path_or_glob: str) -> list:
+    """Expands a directory (non-recursive) or glob into supported files, sorted."""
+    if os.path.isdir(path_or_glob):
+        candidates = [os.path.join(path_or_glob, name) for name in os.listdir(path_or_glob)]
+    else:
+        candidates = glob.glob(path_or_glob, recursive=True)
+    return sorted(
+        p for p in candidates
+        if os.path.isfile(p) and os.path.splitext(p)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def ingest(path_or_glob: str, max_workers: int = DEFAULT_WORKERS) -> dict:
+    """
+    Extracts and saves every new or changed file under `path_or_glob` for the current
+    student (see memory_service.student_scope). Extraction results are cached across
+    students; only the tasks are per student.
+
+    Returns:
+        A report dict: {"ingested": [{"file", "task_id", "subject", "deadline"}],
+        "skipped": [paths unchanged since the last run], "failed": [{"file", "error"}]}.
+    """
+    files = find_files(path_or_glob)
+    already_ingested = get_ingested_hashes()
+
+    pending, skipped = [], []
+    for file_path in files:
+        content_hash = file_sha256(file_path)
+        key = os.path.abspath(file_path)
+        if already_ingested.get(key) == content_hash:
+            skipped.append(file_path)
+        else:
+            pending.append((file_path, key, content_hash))
+
+    print(f"[BATCH INGEST] {len(files)} files found: {len(pending)} new/changed, {len(skipped)} unchanged.")
+
+    # Model calls are paced by the shared rate limiter in tools.gemini_client, so the
+    # workers only bound how many extractions of this call are in flight at once.
+    # Submitting is throttled here, so waiting never holds a shared pool thread.
+    slots = threading.BoundedSemaphore(max(1, min(max_workers, MAX_WORKERS)))
+    futures = []
+    for file_path, _, _ in pending:
+        slots.acquire()
+        future = _ingest_executor.submit(extract_assignment_details, file_path)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    results = [future.result() for future in futures]
+
+    entries, ingested_files, failed = [], [], []
+    for (file_path, key, content_hash), task_data in zip(pending, results):
+        if "error" in task_data:
+            failed.append({"file": file_path, "error": task_data["error"]})
+        else:
+            entries.append((key, content_hash, task_data))
+            ingested_files.append(file_path)
+
+    task_ids = insert_ingested_tasks(entries)
+    if entries and not task_ids:
+        failed += [{"file": f, "error": "Failed to save task to memory."} for f in ingested_files]
+        ingested_files, entries = [], []
+
+    report = {
+        "ingested": [
+            {"file": f, "task_id": task_id, "subject": data.get("subject"), "deadline": data.get("deadline")}
+            for f, task_id, (_, _, data) in zip(ingested_files, task_ids, entries)
+        ],
+        "skipped": skipped,
+        "failed": failed,
+    }
+    print(f"[BATCH INGEST] Saved {len(report['ingested'])} tasks, {len(failed)} failed, {len(skipped)} skipped.")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import assignment files into the task database.")
+    parser.add_argument("path", help="directory (e.g. uploads/) or glob (e.g. 'uploads/*.pdf')")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent extractions")
+    parser.add_argument("--student", default=DEFAULT_STUDENT_ID, help="student ID that owns the imported tasks")
+    args = parser.parse_args()
+
+    with student_scope(args.student):
+        result = ingest(args.path, max_workers=args.workers)
+    for item in result["ingested"]:
+        print(f"  + Task ID {item['task_id']}: {item['subject']} (due {item['deadline']}) <- {item['file']}")
+    for item in result["failed"]:
+        print(f"  ! {item['file']}: {item['error']}")
@@ -0,0 +1,224 @@
+# tools/chunked_summary.py
+#
+# Map-reduce summarization for documents too long for one request (course readers,
+# lecture packs). The pages are split into chunks, every chunk is summarized
+# concurrently on a cheaper model (map), groups of chunk summaries are merged
+# level by level (reduce) and one final call writes the answer.
+#
+# Every map and intermediate reduce result is cached in SQLite by the hash of its input,
+# model and prompt. Chunk boundaries depend on page content, not page numbers, so
+# inserting or editing a few pages only re-summarizes the chunks around them.
+
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from google.genai import types
+
+from database import memory_service
+from tools import tracing
+from tools.gemini_client import generate_content
+from tools.pdf_text import MAX_INLINE_PDF_BYTES, page_subset_pdf
+
+MAP_MODEL = "gemini-2.5-flash"      # many small calls: fast and cheap
+FINAL_MODEL = "gemini-2.5-pro"      # one call over the merged summaries
+
+MAX_SUMMARY_PAGES = 1000            # pages read for a chunked summary
+CHUNK_MIN_CHARS = 8000              # a chunk may only end at a boundary page after this much text
+CHUNK_MAX_CHARS = 30000             # ...and always ends before exceeding this
+CHUNK_MAX_PAGES = 25
+VISION_PAGE_CHARS = 1500            # size a page without a text layer counts as
+BOUNDARY_MODULUS = 4                # about one page in four is a boundary page
+REDUCE_FANOUT = 8                   # summaries merged per reduce call
+MAP_WORKERS = 8                     # in-flight model calls; the rate limiter paces them
+
+MAX_CACHE_ENTRIES = 20000
+PRUNE_EVERY_N_SAVES = 20
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Header/footer lines that only carry the page number shift on every inserted page
+PAGE_NUMBER_LINE = re.compile(r"^\s*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\s*$", re.IGNORECASE)
+
+MAP_PROMPT = (
+    "These are consecutive pages of a longer document. Summarize them in at most 200 words. "
+    "Keep definitions, key results, dates and any assignment requirements. No introduction."
+)
+REDUCE_PROMPT = (
+    "These are summaries of consecutive sections of one document, in order. Merge them into "
+    "one summary of at most 300 words that keeps the most important points in document order."
+)
+FINAL_PROMPT = (
+    "These are summaries of consecutive sections of one document, in order. "
+    "Summarize this document and tell me the main conclusion."
+)
+
+_executor = ThreadPoolExecutor(max_workers=MAP_WORKERS, thread_name_prefix="chunk-summary")
+_saves_lock = threading.Lock()
+_saves = {"count": 0}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+
+def _page_key(text: str) -> str:
+    """Page text without a page-number first/last line: what boundaries and cache keys use."""
+    lines = text.strip().splitlines()
+    if lines and PAGE_NUMBER_LINE.match(lines[0]):
+        lines = lines[1:]
+    if lines and PAGE_NUMBER_LINE.match(lines[-1]):
+        lines = lines[:-1]
+    return "\n".join(lines)
+
+
+def _is_boundary(text: str) -> bool:
+    digest = hashlib.sha256(_page_key(text).encode("utf-8")).digest()
+    return digest[0] % BOUNDARY_MODULUS == 0
+
+
+def split_chunks(pages: list) -> list:
+    """
+    Groups read_pages() output into chunks of consecutive pages.
+
+    Returns:
+        [{"first": index, "last": index, "text": page-labelled text, "key": cache key material,
+          "vision_pages": [indexes]}]
+    """
+    chunks, current, size = [], [], 0
+
+    def close():
+        chunks.append({
+            "first": current[0][0],
+            "last": current[-1][0],
+            "text": "\n\n".join(f"[Page {i + 1}]\n{text.strip()}" for i, text, _ in current),
+            "key": "\f".join(_page_key(text) for _, text, _ in current),
+            "vision_pages": [i for i, _, needs_vision in current if needs_vision],
+        })
+
+    for page in pages:
+        index, text, needs_vision = page
+        page_size = max(len(text), VISION_PAGE_CHARS if needs_vision else 0)
+        if current and (size + page_size > CHUNK_MAX_CHARS or len(current) >= CHUNK_MAX_PAGES):
+            close()
+            current, size = [], 0
+        current.append(page)
+        size += page_size
+        if size >= CHUNK_MIN_CHARS and _is_boundary(text):
+            close()
+            current, size = [], 0
+    if current:
+        close()
+    return chunks
+
+
+def _cache_key(model: str, prompt: str, *material) -> str:
+    digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8"))
+    for item in material:
+        digest.update(b"\0")
+        digest.update(item if isinstance(item, bytes) else item.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _map_request(file_path: str, chunk: dict) -> tuple:
+    """(cache_key, contents) for one chunk; pages without text go along as an inline PDF."""
+    contents, material = [chunk["text"]], [chunk["key"]]
+    if chunk["vision_pages"]:
+        subset = page_subset_pdf(file_path, chunk["vision_pages"])
+        if len(subset) <= MAX_INLINE_PDF_BYTES:
+            contents.insert(0, types.Part.from_bytes(data=subset, mime_type="application/pdf"))
+            material.append(subset)
+        else:
+            print(f"[CHUNKED SUMMARY] Pages {chunk['first'] + 1}-{chunk['last'] + 1} are too large "
+                  f"to send inline; summarizing their text only.")
+    return _cache_key(MAP_MODEL, MAP_PROMPT, *material), contents + [MAP_PROMPT]
+
+
+def _summarize(requests: list, stage: str) -> list:
+    """
+    Runs (cache_key, contents) requests on MAP_MODEL, cached ones from SQLite and the
+    rest concurrently. Returns one summary (or None on failure) per request, in order.
+    """
+    cached = memory_service.get_chunk_summaries([key for key, _ in requests], _now())
+    missing = [(i, contents) for i, (key, contents) in enumerate(requests) if key not in cached]
+    print(f"[CHUNKED SUMMARY] {stage}: {len(requests)} parts, {len(requests) - len(missing)} cached, "
+          f"{len(missing)} to summarize on {MAP_MODEL}.")
+    tracing.current().add(f"{stage}_cache_hits", len(requests) - len(missing))
+
+    def run(contents):
+        try:
+            return generate_content(model=MAP_MODEL, contents=contents).text
+        except Exception as e:
+            print(f"[CHUNKED SUMMARY] A {stage} call failed: {e}")
+            return None
+
+    fresh = dict(zip([i for i, _ in missing], _executor.map(tracing.bind(run), [contents for _, contents in missing])))
+
+    new_entries = [(requests[i][0], MAP_MODEL, text) for i, text in fresh.items() if text]
+    if new_entries:
+        memory_service.save_chunk_summaries(new_entries, _now())
+        with _saves_lock:
+            _saves["count"] += 1
+            should_prune = _saves["count"] % PRUNE_EVERY_N_SAVES == 0
+        if should_prune:
+            memory_service.prune_chunk_summaries(MAX_CACHE_ENTRIES)
+
+    return [cached.get(key) or fresh.get(i) for i, (key, _) in enumerate(requests)]
+
+
+def _labelled(sections: list) -> str:
+    return "\n\n".join(f"[Pages {first + 1}-{last + 1}]\n{text}" for first, last, text in sections)
+
+
+def _reduce(sections: list) -> list:
+    """Merges (first, last, text) sections REDUCE_FANOUT at a time until few enough remain."""
+    while len(sections) > REDUCE_FANOUT:
+        groups = [sections[i:i + REDUCE_FANOUT] for i in range(0, len(sections), REDUCE_FANOUT)]
+        requests = []
+        for group in groups:
+            # Keyed on the summaries alone, so shifted page numbers still hit the cache
+            key = _cache_key(MAP_MODEL, REDUCE_PROMPT, *[text for _, _, text in group])
+            requests.append((key, [_labelled(group), REDUCE_PROMPT]))
+        merged = _summarize(requests, "reduce")
+        sections = [
+            (group[0][0], group[-1][1], text or _labelled(group))   # on failure keep the parts
+            for group, text in zip(groups, merged)
+        ]
+    return sections
+
+
+def summarize_pages(file_path: str, pages: list, page_count: int) -> str:
+    """
+    Summarizes a long PDF from its read_pages() output (see tools/pdf_text.py).
+
+    Returns:
+        The final summary text (streamed to the CLI if a stream sink is installed).
+    """
+    chunks = split_chunks(pages)
+    print(f"[CHUNKED SUMMARY] {len(pages)} pages in {len(chunks)} chunks.")
+
+    # --- Map ---
+    with tracing.span("summary_map", chunks=len(chunks)):
+        summaries = _summarize([_map_request(file_path, chunk) for chunk in chunks], "map")
+    if not any(summaries):
+        raise RuntimeError(f"Could not summarize any part of {file_path}.")
+    sections = [
+        (chunk["first"], chunk["last"], text or "(This part could not be summarized.)")
+        for chunk, text in zip(chunks, summaries)
+    ]
+
+    # --- Reduce, level by level, until one final call can take everything ---
+    with tracing.span("summary_reduce"):
+        sections = _reduce(sections)
+
+    note = ""
+    if page_count > len(pages):
+        note = f"(Only the first {len(pages)} of {page_count} pages were read.)\n\n"
+    response = generate_content(
+        model=FINAL_MODEL,
+        contents=[note + _labelled(sections), FINAL_PROMPT],
+        stream=True
+    )
+    return response.text
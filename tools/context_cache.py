@@ -0,0 +1,281 @@
+# tools/context_cache.py
+#
+# Explicit Gemini context caching for request prefixes that repeat verbatim, such as a
+# document that several questions are asked about (tools/pdf_reader_tool.py). A prefix
+# is created once as a cached content (client.caches) and later requests only send what
+# follows it, which cuts input-token cost and time to first token. The orchestrator's
+# instruction and tool declarations (~1.3k tokens) are below the caching minimum of
+# its model, so they are sent inline as before.
+#
+# Cache handles are kept in the `context_caches` table (shared by threads and
+# processes, like the upload cache), their TTL is extended when a hit finds them close
+# to expiry, and the least recently used ones are deleted beyond MAX_CONTEXT_CACHES
+# (cached tokens are billed per hour of storage). Caching is best effort: a prefix
+# below the model's minimum size is sent inline without asking the API, a refused
+# create is remembered for UNAVAILABLE_TTL, and a request whose cache vanished on the
+# server is retried once with the prefix inline.
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+from google.genai.errors import APIError
+
+from database import memory_service
+from tools import tracing
+from tools.gemini_client import generate_content, generate_content_async, get_client
+
+ENABLED = os.environ.get("AGENT_CONTEXT_CACHE", "1") != "0"
+CACHE_TTL = timedelta(hours=1)
+REFRESH_MARGIN = timedelta(minutes=10)       # hits expiring sooner than this get a fresh TTL
+EXPIRY_SAFETY_MARGIN = timedelta(minutes=1)  # never hand out a cache about to expire mid-request
+UNAVAILABLE_TTL = timedelta(hours=6)         # how long a refused prefix is sent inline before retrying
+MAX_CONTEXT_CACHES = 50
+CHARS_PER_TOKEN = 4                          # cheap local estimate, as in agents/history_manager.py
+
+# Smallest prefix each model will cache (tokens). Smaller prefixes are not worth a
+# create call; the API stays the authority (a refusal is remembered, see above).
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-pro": 4096,
+    "gemini-2.5-flash": 1024,
+    "gemini-2.0-flash": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+
+# A request naming a cached content the server no longer has fails with one of these
+CACHE_MISS_STATUS_CODES = {400, 403, 404}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# One lock per prefix so concurrent requests never create the same cache twice.
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _lock_for(cache_key: str) -> threading.Lock:
+    with _key_locks_guard:
+        return _key_locks.setdefault(cache_key, threading.Lock())
+
+
+def tool_declarations(tools: list) -> list:
+    """
+    Python functions as a types.Tool list. A cached content stores declarations, not
+    callables, so tool functions are converted the way the SDK would.
+    """
+    declarations = [types.FunctionDeclaration.from_callable_with_api_option(callable=f, use_json_schema=True)
+                    for f in tools if callable(f)]
+    others = [t for t in tools if not callable(t)]
+    return ([types.Tool(function_declarations=declarations)] if declarations else []) + others
+
+
+def _text_of(item):
+    """The text of a prefix item, or None for files and inline media."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, types.Part) and item.text is not None:
+        return item.text
+    return None
+
+
+class CachedPrefix:
+    """
+    A stable request prefix: system instruction, tools and leading contents (e.g. a
+    document). generate() sends it from a context cache when there is one and inline
+    otherwise; the request-specific `contents` always follow it.
+
+    Args:
+        model: The model the prefix is cached for (caches are per model).
+        system_instruction: Static system instruction. Anything that changes per request
+            (current time, file path) belongs in the request contents instead.
+        tools: Python functions and/or types.Tool objects.
+        contents: Leading contents, e.g. the output of tools.pdf_text.document_contents().
+        key_material: Identifies non-text contents (a file's content hash); prefixes
+            with files or inline media are only cached when it is given.
+        config: Other GenerateContentConfig fields (automatic_function_calling, ...).
+    """
+
+    def __init__(self, model: str, *, system_instruction: str = None, tools: list = None,
+                 contents: list = None, key_material=(), config: dict = None):
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = list(tools or [])
+        self.contents = list(contents or [])
+        self.config_fields = dict(config or {})
+
+        self._declarations = tool_declarations(self.tools)
+        texts = [_text_of(item) for item in self.contents]
+        has_media = any(text is None for text in texts)
+        tools_json = json.dumps([t.model_dump(mode="json", exclude_none=True) for t in self._declarations],
+                                sort_keys=True)
+        self.estimated_tokens = (len(system_instruction or "") + len(tools_json)
+                                 + sum(len(text) for text in texts if text)) // CHARS_PER_TOKEN
+
+        # Media of unknown size may well pass the minimum; text-only prefixes are checked here
+        min_tokens = MIN_CACHE_TOKENS.get(model, DEFAULT_MIN_CACHE_TOKENS)
+        self.cacheable = ENABLED and (has_media or self.estimated_tokens >= min_tokens) \
+            and (not has_media or bool(key_material))
+
+        digest = hashlib.sha256()
+        for material in (model, system_instruction or "", tools_json, *texts, *map(str, key_material)):
+            digest.update(str(material).encode("utf-8"))
+            digest.update(b"\0")
+        self.cache_key = digest.hexdigest()
+
+    # --- Request building ---
+
+    def _inline_config(self) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(system_instruction=self.system_instruction,
+                                           tools=self.tools or None, **self.config_fields)
+
+    def _cached_config(self, cache_name: str) -> types.GenerateContentConfig:
+        # system_instruction, tools and tool_config must not be repeated next to a cache
+        return types.GenerateContentConfig(cached_content=cache_name, **self.config_fields)
+
+    def generate(self, contents: list, stream: bool = False):
+        """generate_content() with this prefix in front of `contents`."""
+        cache_name = self.cache_name()
+        if cache_name:
+            try:
+                return generate_content(model=self.model, contents=contents,
+                                        config=self._cached_config(cache_name), stream=stream)
+            except APIError as e:
+                if e.code not in CACHE_MISS_STATUS_CODES:
+                    raise
+                self._forget(cache_name, e)
+        return generate_content(model=self.model, contents=self.contents + list(contents),
+                                config=self._inline_config(), stream=stream)
+
+    async def generate_async(self, contents: list):
+        """Async counterpart of generate(); the registry lookup runs off the event loop."""
+        cache_name = await asyncio.to_thread(self.cache_name)
+        if cache_name:
+            try:
+                return await generate_content_async(model=self.model, contents=contents,
+                                                    config=self._cached_config(cache_name))
+            except APIError as e:
+                if e.code not in CACHE_MISS_STATUS_CODES:
+                    raise
+                await asyncio.to_thread(self._forget, cache_name, e)
+        return await generate_content_async(model=self.model, contents=self.contents + list(contents),
+                                            config=self._inline_config())
+
+    # --- Registry ---
+
+    def cache_name(self):
+        """Name of a live cached content for this prefix (creating it if needed), or None."""
+        if not self.cacheable:
+            return None
+        with tracing.span("context_cache", model=self.model) as cache_span:
+            try:
+                return self._cache_name(cache_span)
+            except Exception as e:
+                # Caching is an optimisation; never let it fail the request
+                print(f"[CONTEXT CACHE] Unavailable for {self.model}, sending the prefix inline: {e}")
+                return None
+
+    def _cache_name(self, cache_span):
+        now = _utcnow()
+        with _lock_for(self.cache_key):
+            cached = memory_service.get_context_cache(self.cache_key)
+            if cached:
+                expires_at = datetime.strptime(cached["expires_at"], TIME_FORMAT)
+                if cached["cache_name"] is None:
+                    if expires_at > now:
+                        cache_span.set("uncacheable", True)
+                        return None
+                elif expires_at - EXPIRY_SAFETY_MARGIN > now:
+                    cache_span.set("cache_hit", True)
+                    refreshed = None
+                    if expires_at - REFRESH_MARGIN <= now:
+                        refreshed = self._refresh(cached["cache_name"], now)
+                    memory_service.touch_context_cache(self.cache_key, now.strftime(TIME_FORMAT), refreshed)
+                    return cached["cache_name"]
+
+            cache_span.set("cache_hit", False)
+            try:
+                created = get_client().caches.create(model=self.model, config=types.CreateCachedContentConfig(
+                    system_instruction=self.system_instruction,
+                    tools=self._declarations or None,
+                    contents=self.contents or None,
+                    ttl=f"{int(CACHE_TTL.total_seconds())}s",
+                    display_name=f"student-agent-{self.cache_key[:12]}",
+                ))
+            except APIError as e:
+                if e.code not in CACHE_MISS_STATUS_CODES:
+                    raise
+                # Too small for this model, or a model without caching: stop asking for a while
+                print(f"[CONTEXT CACHE] {self.model} refused to cache this prefix ({e.code}); sending it inline.")
+                memory_service.save_context_cache(self.cache_key, self.model, None, self.estimated_tokens,
+                                                  (now + UNAVAILABLE_TTL).strftime(TIME_FORMAT),
+                                                  now.strftime(TIME_FORMAT))
+                return None
+
+            expires_at = created.expire_time
+            if expires_at is not None:
+                expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+            else:
+                expires_at = now + CACHE_TTL
+            usage = created.usage_metadata
+            token_count = usage.total_token_count if usage and usage.total_token_count else self.estimated_tokens
+            memory_service.save_context_cache(self.cache_key, self.model, created.name, token_count,
+                                              expires_at.strftime(TIME_FORMAT), now.strftime(TIME_FORMAT))
+            print(f"[CONTEXT CACHE] Cached {token_count} prefix tokens for {self.model} as {created.name}.")
+            cache_span.set("cached_prefix_tokens", token_count)
+
+        # Only a new cache can push the registry over its bound, so evict here, not on hits.
+        evict_context_caches(get_client())
+        return created.name
+
+    def _refresh(self, cache_name: str, now: datetime):
+        """Extends a cache's TTL; returns the new expiry (registry format) or None if that failed."""
+        try:
+            updated = get_client().caches.update(name=cache_name, config=types.UpdateCachedContentConfig(
+                ttl=f"{int(CACHE_TTL.total_seconds())}s"))
+        except APIError as e:
+            print(f"[CONTEXT CACHE] Could not extend {cache_name}: {e}")
+            return None
+        expires_at = updated.expire_time
+        if expires_at is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            expires_at = now + CACHE_TTL
+        return expires_at.strftime(TIME_FORMAT)
+
+    def _forget(self, cache_name: str, error: APIError) -> None:
+        print(f"[CONTEXT CACHE] {cache_name} is gone on the server ({error.code}); retrying with the prefix inline.")
+        tracing.current().add("context_cache_misses")
+        with _lock_for(self.cache_key):
+            cached = memory_service.get_context_cache(self.cache_key)
+            if cached and cached["cache_name"] == cache_name:
+                memory_service.delete_context_cache(self.cache_key)
+
+
+def evict_context_caches(client, max_entries: int = MAX_CONTEXT_CACHES) -> int:
+    """
+    Drops expired registry entries and the least recently used caches beyond
+    `max_entries`, deleting their remote cached contents. Returns the number evicted.
+    """
+    expires_before = (_utcnow() + EXPIRY_SAFETY_MARGIN).strftime(TIME_FORMAT)
+    evicted = 0
+
+    for entry in memory_service.get_evictable_context_caches(expires_before, max_entries):
+        if entry["cache_name"]:
+            try:
+                client.caches.delete(name=entry["cache_name"])
+            except Exception as e:
+                # Expired caches are already gone on the server; nothing else to do.
+                print(f"[CONTEXT CACHE] Could not delete {entry['cache_name']}: {e}")
+        if memory_service.delete_context_cache(entry["cache_key"]):
+            evicted += 1
+
+    if evicted:
+        print(f"[CONTEXT CACHE] Evicted {evicted} cached prefix(es).")
+    return evicted
@@ -0,0 +1,89 @@
+# tools/extraction_cache.py
+#
+# Persistent memoization of extract_assignment_details() results.
+# Many students upload the same course handout, so a result is keyed by the file's
+# content hash, the model name and a hash of the JSON schema + extraction prompt.
+# Changing the prompt or schema therefore invalidates old entries automatically.
+
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+
+from database import memory_service
+from tools import tracing
+
+MAX_CACHE_ENTRIES = 5000
+MAX_CACHE_BYTES = 50 * 1024 * 1024    # 50 MB of result JSON
+PRUNE_EVERY_N_WRITES = 50             # pruning is a full-table pass, so batch it
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "failures": 0}
+_last_failure = None
+
+
+def schema_hash(json_schema: dict, extraction_prompt: str) -> str:
+    """Stable hash of everything about the request besides the document and model."""
+    payload = json.dumps({"schema": json_schema, "prompt": extraction_prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(content_hash: str, model: str, version_hash: str) -> str:
+    return f"{content_hash}:{model}:{version_hash}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+
+def get(content_hash: str, model: str, version_hash: str):
+    """Returns the cached extraction dict, or None on a miss."""
+    result_json = memory_service.get_cached_extraction(
+        make_cache_key(content_hash, model, version_hash), _now()
+    )
+    with _stats_lock:
+        _stats["hits" if result_json is not None else "misses"] += 1
+    tracing.current().add("extraction_cache_hits" if result_json is not None else "extraction_cache_misses")
+    return json.loads(result_json) if result_json is not None else None
+
+
+def put(content_hash: str, model: str, version_hash: str, result: dict) -> None:
+    """Stores a successful extraction result (errors must never be cached)."""
+    memory_service.save_cached_extraction(
+        make_cache_key(content_hash, model, version_hash),
+        content_hash,
+        model,
+        version_hash,
+        json.dumps(result),
+        _now(),
+    )
+    with _stats_lock:
+        _stats["writes"] += 1
+        should_prune = _stats["writes"] % PRUNE_EVERY_N_WRITES == 0
+    if should_prune:
+        memory_service.prune_extraction_cache(MAX_CACHE_ENTRIES, MAX_CACHE_BYTES)
+
+
+def record_failure(file_path: str, content_hash: str, error: str) -> None:
+    """
+    Notes a failed extraction. Failures are never cached as results (the next call
+    retries), but the latest one is kept so get_stats() shows why a file did not extract.
+    """
+    global _last_failure
+    print(f"[EXTRACTION CACHE] Extraction of {file_path} failed and was not cached: {error}")
+    with _stats_lock:
+        _stats["failures"] += 1
+        _last_failure = {"file_path": file_path, "content_hash": content_hash, "error": error, "at": _now()}
+
+
+def get_stats() -> dict:
+    """Hit/miss/failure counters for this process plus totals persisted in the database."""
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["last_failure"] = _last_failure
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats.update(memory_service.get_extraction_cache_totals())
+    return stats
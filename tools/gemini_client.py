@@ -0,0 +1,389 @@
+# tools/gemini_client.py
+#
+# Process-wide provider for the Gemini client, plus the single rate-limited, retrying
+# entry point for model calls (generate_content / generate_content_async), error
+# classification, per-model circuit breakers and optional response streaming.
+# Every agent and tool used to build its own genai.Client() at import time; now they
+# all share one lazily created client (and therefore one HTTP connection pool), and
+# nothing touches the API or credentials until the first real request.
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+from google import genai
+from google.genai import types
+from google.genai.errors import APIError
+
+from database import memory_service
+from tools import tracing
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the shared genai.Client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client()
+    return _client
+
+
+def set_client(client) -> None:
+    """Replaces the shared client (e.g. with an offline stand-in for benchmarks)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+# =========================================================
+# === Rate-limited, retrying model calls ===
+# =========================================================
+# Every generate_content call in the project goes through generate_content() below:
+#   1. a token bucket per model, shared by all threads and processes (stored in SQLite),
+#   2. a per-model cap on in-flight requests in this process,
+#   3. retries with jittered exponential backoff that honours the server's retry hint.
+# A 429 also drains the shared bucket, so every worker backs off, not just the caller.
+
+MAX_RETRIES = 5
+BASE_BACKOFF_S = 1.0
+MAX_BACKOFF_S = 32.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 10
+DEFAULT_MAX_CONCURRENT = 8
+# Per-model overrides: (requests per minute, max in-flight requests per process)
+MODEL_LIMITS = {
+    "gemini-2.5-pro": (30, 4),
+    "gemini-2.0-pro": (30, 4),
+}
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+# asyncio primitives belong to one event loop: one dict per loop, dropped with the loop
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def _limits(model: str) -> tuple:
+    return MODEL_LIMITS.get(model, (DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_MAX_CONCURRENT))
+
+
+def _semaphore(model: str) -> threading.BoundedSemaphore:
+    with _semaphores_lock:
+        if model not in _semaphores:
+            _semaphores[model] = threading.BoundedSemaphore(_limits(model)[1])
+        return _semaphores[model]
+
+
+def _async_semaphore(model: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        loop_semaphores = _async_semaphores.setdefault(loop, {})
+        if model not in loop_semaphores:
+            loop_semaphores[model] = asyncio.Semaphore(_limits(model)[1])
+        return loop_semaphores[model]
+
+
+def _bucket_wait(model: str) -> float:
+    requests_per_minute, _ = _limits(model)
+    return memory_service.reserve_rate_limit_token(
+        f"generate:{model}", requests_per_minute / 60.0, DEFAULT_BURST
+    )
+
+
+def retry_after_seconds(error: Exception):
+    """Extracts the server's retry hint (google.rpc.RetryInfo or a Retry-After header)."""
+    if not isinstance(error, APIError):
+        return None
+    details = error.details if isinstance(error.details, dict) else {}
+    for detail in details.get("error", {}).get("details", []) or []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers and headers.get("retry-after"):
+        try:
+            return float(headers.get("retry-after"))
+        except ValueError:
+            pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Overload (429), server errors (5xx), timeouts and dropped connections are worth retrying."""
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _describe(error: Exception) -> str:
+    return str(error.code) if isinstance(error, APIError) else type(error).__name__
+
+
+def _backoff_delay(model: str, error: Exception, attempt: int) -> float:
+    """Delay before the next attempt; a 429 also drains the shared bucket for everyone."""
+    hint = retry_after_seconds(error)
+    if hint is not None:
+        delay = hint + random.uniform(0, BASE_BACKOFF_S)
+    else:
+        # "Full jitter": spreads retries of many clients evenly instead of in waves
+        delay = random.uniform(0, min(MAX_BACKOFF_S, BASE_BACKOFF_S * 2 ** (attempt + 1)))
+
+    if getattr(error, "code", None) == 429:
+        requests_per_minute, _ = _limits(model)
+        memory_service.drain_rate_limit_bucket(f"generate:{model}", requests_per_minute / 60.0, delay)
+    return delay
+
+
+def generate_content(*, model: str, contents, config=None, stream: bool = False):
+    """
+    Rate-limited, retrying replacement for get_client().models.generate_content.
+
+    With stream=True and a sink installed by stream_to(), the response text is also
+    streamed to the sink as it is generated (see "Streaming" below).
+    """
+    sink = _stream_sink.get() if stream else None
+    with tracing.span("model", model=model, streamed=sink is not None) as model_span:
+        if sink is not None:
+            response = _stream_into_response(sink, model, contents, config)
+        else:
+            response = _generate_with_retries(model, contents, config)
+        tracing.record_usage(model_span, response)
+        return response
+
+
+def _record_wait(key: str, seconds: float) -> None:
+    """Adds rate-limit or backoff waiting to the current trace span."""
+    tracing.current().add(key, round(seconds * 1000, 1))
+
+
+def _generate_with_retries(model: str, contents, config):
+    for attempt in range(MAX_RETRIES):
+        wait = _bucket_wait(model)
+        if wait > 0:
+            _record_wait("rate_limit_wait_ms", wait)
+            time.sleep(wait)
+        try:
+            with _semaphore(model):
+                return get_client().models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                raise
+            delay = _backoff_delay(model, e, attempt)
+            print(f"[GEMINI] {model} failed ({_describe(e)}). Retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES}).")
+            tracing.current().add("retries")
+            _record_wait("backoff_ms", delay)
+            time.sleep(delay)
+
+
+async def generate_content_async(*, model: str, contents, config=None):
+    """Async counterpart of generate_content(), using client.aio and non-blocking waits."""
+    with tracing.span("model", model=model) as model_span:
+        for attempt in range(MAX_RETRIES):
+            # The shared bucket is a SQLite write (BEGIN IMMEDIATE); keep it off the event loop
+            wait = await asyncio.to_thread(_bucket_wait, model)
+            if wait > 0:
+                _record_wait("rate_limit_wait_ms", wait)
+                await asyncio.sleep(wait)
+            try:
+                async with _async_semaphore(model):
+                    response = await get_client().aio.models.generate_content(model=model, contents=contents, config=config)
+                tracing.record_usage(model_span, response)
+                return response
+            except Exception as e:
+                if not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                    raise
+                delay = await asyncio.to_thread(_backoff_delay, model, e, attempt)
+                print(f"[GEMINI] {model} failed ({_describe(e)}). Retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES}).")
+                model_span.add("retries")
+                _record_wait("backoff_ms", delay)
+                await asyncio.sleep(delay)
+
+
+# =========================================================
+# === Error classification and circuit breaking ===
+# =========================================================
+# Callers that must not crash (e.g. the scheduler tool) classify failures and report
+# them as results instead. A circuit breaker per model stops hammering a model that
+# keeps failing: after FAILURE_THRESHOLD consecutive transient failures, calls fail
+# fast for COOLDOWN_S, then a single probe call decides whether to close it again.
+
+TRANSIENT = "transient"   # worth retrying later: 429/5xx, timeouts, network errors, open circuit
+PERMANENT = "permanent"   # retrying the same request will not help: bad request, auth, bad output
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after_s: float):
+        super().__init__(f"Circuit for '{name}' is open; retry in {retry_after_s:.0f}s.")
+        self.retry_after_s = retry_after_s
+
+
+def classify_error(error: Exception) -> str:
+    """Returns TRANSIENT or PERMANENT for an exception raised by a model call."""
+    # Same rule as the retry policy: whatever generate_content() would retry is transient
+    if isinstance(error, CircuitOpenError) or is_retryable(error):
+        return TRANSIENT
+    return PERMANENT
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive transient failures;
+    open -> half-open after `cooldown_s`, letting one probe call through;
+    the probe's outcome closes the circuit or re-opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the call should fail fast."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.cooldown_s - time.monotonic()
+            if remaining > 0 or self._probe_in_flight:
+                raise CircuitOpenError(self.name, max(remaining, 1.0))
+            self._probe_in_flight = True   # half-open: this caller is the probe
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception) -> None:
+        """Only transient failures count; a bad request says nothing about the model's health."""
+        with self._lock:
+            self._probe_in_flight = False
+            if classify_error(error) != TRANSIENT:
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"[GEMINI] Circuit for '{self.name}' opened after {self._failures} failures.")
+                self._opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) under the breaker."""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Returns the process-wide breaker for `name` (typically a model name)."""
+    with _semaphores_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+# =========================================================
+# === Streaming ===
+# =========================================================
+# Long generations (worksheets, reports, final answers) can be shown while they are
+# produced. A caller such as the CLI installs a sink with stream_to(callback); any
+# generate_content(..., stream=True) made in that context then uses the streaming API,
+# hands each text chunk to the callback as it arrives, and still returns one assembled
+# response, so the calling code does not change. Without a sink nothing is streamed.
+# The sink lives in a ContextVar, so it follows the request, not the thread: work handed
+# to a thread pool only streams if it is run with contextvars.copy_context().
+
+_stream_sink = contextvars.ContextVar("gemini_stream_sink", default=None)
+
+
+@contextmanager
+def stream_to(callback):
+    """Streams the text of stream=True calls made inside this block to `callback(text)`."""
+    token = _stream_sink.set(callback)
+    try:
+        yield
+    finally:
+        _stream_sink.reset(token)
+
+
+def generate_content_stream(*, model: str, contents, config=None):
+    """
+    Rate-limited counterpart of get_client().models.generate_content_stream.
+    Retries like generate_content() until the first chunk arrives; an error after
+    that is raised, since the chunks already delivered cannot be taken back.
+    """
+    for attempt in range(MAX_RETRIES):
+        wait = _bucket_wait(model)
+        if wait > 0:
+            _record_wait("rate_limit_wait_ms", wait)
+            time.sleep(wait)
+        started = False
+        try:
+            with _semaphore(model):
+                for chunk in get_client().models.generate_content_stream(model=model, contents=contents, config=config):
+                    started = True
+                    yield chunk
+            return
+        except Exception as e:
+            if started or not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                raise
+            delay = _backoff_delay(model, e, attempt)
+            print(f"[GEMINI] {model} failed ({_describe(e)}). Retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES}).")
+            tracing.current().add("retries")
+            _record_wait("backoff_ms", delay)
+            time.sleep(delay)
+
+
+def _stream_into_response(sink, model: str, contents, config):
+    """Streams text parts to `sink` and merges all chunks into one GenerateContentResponse."""
+    parts, finish_reason, usage = [], None, None
+    started, first_chunk = time.perf_counter(), True
+    for chunk in generate_content_stream(model=model, contents=contents, config=config):
+        if first_chunk:
+            tracing.current().set("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+            first_chunk = False
+        usage = chunk.usage_metadata or usage
+        if not chunk.candidates:
+            continue
+        candidate = chunk.candidates[0]
+        finish_reason = candidate.finish_reason or finish_reason
+        for part in (candidate.content.parts if candidate.content else None) or []:
+            if part.text and not part.thought and part.function_call is None:
+                sink(part.text)
+                # Adjacent text chunks become one part, as in a non-streamed response
+                if parts and parts[-1].text and not parts[-1].thought and parts[-1].function_call is None:
+                    parts[-1] = types.Part(text=parts[-1].text + part.text)
+                    continue
+            parts.append(part)
+
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts), finish_reason=finish_reason)],
+        usage_metadata=usage,
+        model_version=model,
+    )
@@ -3,20 +3,22 @@
 # We need to import the actual functions from our existing files
 from tools.task_extractor_tool import task_extractor_tool
 from tools.pdf_reader_tool import pdf_reader_tool
-from database.memory_service import get_all_active_tasks,insert_task, mark_task_complete
+from database.memory_service import get_all_active_tasks,insert_task, mark_task_complete, set_schedule_item_status
+from agents.task_context import build_schedule_context
 from agents.scheduler_agent import create_and_save_schedule
 import json
 from agents.progress_agent import generate_progress_report
-from google import genai
+from tools.gemini_client import generate_content
+from tools.reminder_scheduler import get_reminder_scheduler
+from datetime import datetime, timedelta
 
-client = genai.Client()
-
-def summarize_document_tool(file_path: str) -> str:
+def summarize_document_tool(file_path: str, question: str = None) -> str:
     """
     Summarizes a document (PDF, etc.). Use this when the user asks for a summary
-    or reading comprehension. Returns the summary text.
+    or reading comprehension. Pass `question` to answer a specific question about
+    the document instead. Returns the summary text (or the answer).
     """
-    return pdf_reader_tool(file_path)
+    return pdf_reader_tool(file_path, question)
 
 def extract_assignment_data_tool(file_path: str) -> str:
     """
@@ -82,6 +84,49 @@ def complete_task_tool(task_id: int) -> str:
         return f"SUCCESS: Task ID {task_id} has been marked as complete and moved to history."
     else:
         return f"ERROR: Could not find or mark Task ID {task_id} as complete."
+
+def list_study_steps_tool(task_id: int = None, day: str = None) -> str:
+    """
+    Lists planned study steps with their step IDs and status ('pending' or 'done').
+    With task_id: that task's remaining steps from `day` on; without: every task's
+    steps for `day`. day is 'YYYY-MM-DD' (default today). Use this before
+    complete_study_step_tool to find the step ID.
+    """
+    steps, count = build_schedule_context(task_id=task_id, day=day)
+    return steps if count else "No planned study steps found."
+
+def complete_study_step_tool(step_id: int) -> str:
+    """
+    Marks one planned study step (an ID from list_study_steps_tool) as done.
+    Use this when the user says they finished a step or session, not the whole task.
+    """
+    if set_schedule_item_status(step_id, "done"):
+        return f"SUCCESS: Study step {step_id} has been marked as done."
+    else:
+        return f"ERROR: Could not find study step {step_id}."
+
+def set_reminder_tool(reminder_text: str, minutes_from_now: float = None, remind_at: str = None,
+                      task_id: int = None) -> str:
+    """
+    Schedules a reminder that pops up in the console at the given time.
+    Use this when the user says 'remind me ...'. Give EITHER minutes_from_now
+    (e.g. 0.5 for 30 seconds, 90 for an hour and a half) OR remind_at as
+    'YYYY-MM-DD HH:MM' local time. task_id links the reminder to a task (optional).
+    """
+    if minutes_from_now is not None:
+        target = datetime.now() + timedelta(minutes=float(minutes_from_now))
+    elif remind_at:
+        try:
+            target = datetime.strptime(remind_at.strip(), "%Y-%m-%d %H:%M")
+        except ValueError:
+            return "ERROR: remind_at must be in 'YYYY-MM-DD HH:MM' format."
+    else:
+        return "ERROR: Provide minutes_from_now or remind_at."
+
+    reminder_id = get_reminder_scheduler().add(reminder_text, target, task_id)
+    if reminder_id == -1:
+        return "ERROR: Failed to save the reminder."
+    return f"SUCCESS: Reminder {reminder_id} set for {target.strftime('%Y-%m-%d %H:%M:%S')}: {reminder_text}"
     
 # agents/orchestrator_tools.py (Add this function)
 
@@ -109,9 +154,10 @@ def generate_practice_worksheet(topic: str, num_problems: int) -> str:
     )
     
     try:
-        response = client.models.generate_content(
+        response = generate_content(
             model='gemini-2.0-flash',
             contents=prompt,
+            stream=True,  # worksheets are long; show them as they are written
         )
         
         # Simulate saving the content to a file
@@ -1,34 +1,59 @@
 
-from google import genai
+from tools.gemini_client import get_client, generate_content
+from tools.pdf_text import document_contents, read_pages
+from tools.chunked_summary import MAX_SUMMARY_PAGES, summarize_pages
+from tools.context_cache import CachedPrefix
+from tools.upload_cache import file_sha256
 
-client = genai.Client()
+SUMMARY_MAX_CHARS = 120000 # whole-document text budget (~30k tokens); longer PDFs are chunked
+CHUNKED_MIN_PAGES = 60     # scanned documents this long are chunked as well
 
-def pdf_reader_tool(file_path: str) -> str:
+SUMMARY_PROMPT = "Summarize this document and tell me the main conclusion."
+READER_MODEL = "gemini-2.5-pro"  # Use Pro for better document understanding
+QUESTION_WORD_MIN_CHARS = 4      # question words this long pick the pages of a long document
+
+def pdf_reader_tool(file_path: str, question: str = None) -> str:
     """
-    Uploads a PDF file to Google Generative AI and generates a summary.
-    
+    Summarizes a PDF with Google Generative AI, or answers a question about it.
+
     Args:
-        file_path: Path to the PDF file to upload
-        
+        file_path: Path to the PDF file
+        question: Optional question about the document (default: a summary)
+
     Returns:
-        The generated summary text
+        The generated summary text (or answer)
     """
-    print("Uploading PDF...")
-    pdf_file = client.files.upload(file=file_path)
-    print(f"File uploaded successfully: {pdf_file.name}")
-    
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",  # Use Pro for better document understanding
-        contents=[
-            pdf_file,
-            "Summarize this document and tell me the main conclusion.",
-        ]
-    )
-    
+    print("Preparing PDF...")
+    read = read_pages(file_path, MAX_SUMMARY_PAGES)
+    client = get_client()
+
+    # Long documents: map-reduce over page chunks (see tools/chunked_summary.py)
+    if read is not None:
+        pages, page_count = read
+        if page_count >= CHUNKED_MIN_PAGES or sum(len(text) for _, text, _ in pages) > SUMMARY_MAX_CHARS:
+            if not question:
+                return summarize_pages(file_path, pages, page_count)
+            # A question only needs the pages that mention it
+            keywords = tuple(w.strip("?,.!:;'\"").lower() for w in question.split()
+                             if len(w) >= QUESTION_WORD_MIN_CHARS)
+            document = document_contents(client, file_path, keywords=keywords,
+                                          max_chars=SUMMARY_MAX_CHARS, read=read)
+            return generate_content(model=READER_MODEL, contents=document + [question], stream=True).text
+
+    # A summary needs the whole document: its text if it has a usable text layer and fits
+    # the budget, otherwise the file itself (uploaded once, shared with the extractor).
+    content_hash = file_sha256(file_path)
+    document = document_contents(client, file_path, content_hash, max_chars=SUMMARY_MAX_CHARS,
+                                 allow_partial=False, read=read)
+
+    # Summaries and follow-up questions about the same file share one cached document
+    # prefix (see tools/context_cache.py); only the question is sent each time.
+    prefix = CachedPrefix(READER_MODEL, contents=document, key_material=(content_hash, SUMMARY_MAX_CHARS))
+    response = prefix.generate([question or SUMMARY_PROMPT], stream=True)
+
     result = response.text
-    
-    # Clean up the uploaded file
-    client.files.delete(name=pdf_file.name)
-    print(f"File deleted: {pdf_file.name}")
-    
-    return result
\ No newline at end of file
+
+    # The uploaded file is NOT deleted here: the upload cache owns its lifetime
+    # and removes it by TTL/LRU (see tools/upload_cache.evict_uploads).
+
+    return result
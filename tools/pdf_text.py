@@ -0,0 +1,183 @@
+# tools/pdf_text.py
+#
+# Local PDF pre-processing, so the model gets text instead of whole files.
+# Most handouts are born-digital: their text layer is read page by page with pypdf and
+# only the relevant pages' text goes into the prompt (no upload at all). Pages without
+# a usable text layer (scans, slides that are mostly pictures) still need vision; then
+# only the selected pages are sent, as a small inline PDF. Anything pypdf cannot read,
+# and every non-PDF file, falls back to the shared upload cache as before.
+
+import io
+import logging
+import os
+import re
+
+from google.genai import types
+
+from tools.upload_cache import get_or_upload
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # optional dependency: without it every file is uploaded
+    PdfReader = PdfWriter = None
+
+# pypdf logs every recoverable structure error in slightly broken files
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+MAX_SCAN_PAGES = 200               # pages read from one document
+MIN_TEXT_CHARS_PER_PAGE = 200      # less text than this: probably a scan or a picture
+IMAGE_PAGE_TEXT_CHARS = 400        # a page with images and little text needs vision
+MIN_PRINTABLE_RATIO = 0.85         # below this the text layer is garbled (bad font maps)
+MAX_INLINE_PDF_BYTES = 15 * 1024 * 1024   # inline request data limit is ~20 MB in total
+
+# Words that mark the pages an assignment extraction needs
+ASSIGNMENT_KEYWORDS = (
+    "due", "deadline", "submit", "submission", "assignment", "marks", "grade", "words",
+    "pages", "slides", "presentation", "essay", "report", "course", "module", "weight",
+)
+DATE_PATTERN = re.compile(
+    r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b"
+    r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b"
+    r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2}\b",
+    re.IGNORECASE,
+)
+
+
+def is_pdf(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() == ".pdf"
+
+
+def page_needs_vision(text: str, has_images: bool) -> bool:
+    """True if a page's text layer cannot stand in for the page itself."""
+    stripped = text.strip()
+    if len(stripped) < MIN_TEXT_CHARS_PER_PAGE:
+        return True
+    if has_images and len(stripped) < IMAGE_PAGE_TEXT_CHARS:
+        return True
+    printable = sum(1 for ch in stripped if ch.isalnum() or ch.isspace() or ch in ".,;:!?()-'\"/%&")
+    return printable / len(stripped) < MIN_PRINTABLE_RATIO
+
+
+def _has_images(page) -> bool:
+    # Only inspects the resource dictionary; decoding the images would be far slower
+    try:
+        xobjects = page.get("/Resources", {}).get("/XObject", {})
+        return any(xobjects[name].get("/Subtype") == "/Image" for name in xobjects)
+    except Exception:
+        return False
+
+
+def iter_pages(reader, max_pages: int = MAX_SCAN_PAGES):
+    """Yields (page_index, text, needs_vision) one page at a time."""
+    for index, page in enumerate(reader.pages):
+        if index >= max_pages:
+            return
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+        yield index, text, page_needs_vision(text, _has_images(page))
+
+
+def _relevance(text: str, keywords: tuple) -> int:
+    lowered = text.lower()
+    return sum(lowered.count(k) for k in keywords) + 3 * len(DATE_PATTERN.findall(text))
+
+
+def read_pages(file_path: str, max_pages: int = MAX_SCAN_PAGES):
+    """
+    Returns (pages, page_count) where pages is the list from iter_pages(), or None if
+    the file cannot be read locally (no pypdf, not a PDF, unreadable or encrypted).
+    """
+    if PdfReader is None or not is_pdf(file_path):
+        return None
+    try:
+        reader = PdfReader(file_path)
+        if reader.is_encrypted:
+            return None
+        return list(iter_pages(reader, max_pages)), len(reader.pages)
+    except Exception as e:
+        print(f"[PDF TEXT] Could not read {file_path} locally ({e}); uploading instead.")
+        return None
+
+
+def analyse_pdf(file_path: str, keywords: tuple = (), max_chars: int = 12000,
+                allow_partial: bool = True, read=None):
+    """
+    Reads the PDF locally and picks what to send to the model.
+
+    Args:
+        keywords: Words that make a page relevant. The first page is always kept; the
+            rest are kept in order of relevance until `max_chars` of text is reached.
+        allow_partial: If False, the whole document must fit in `max_chars`.
+        read: A read_pages() result the caller already has, to avoid parsing twice.
+
+    Returns:
+        None if the file should be uploaded as is (no pypdf, unreadable, encrypted or too
+        long), else {"pages": [selected indexes], "text": page-labelled text,
+        "vision_pages": [selected indexes that need vision], "page_count": int}.
+    """
+    read = read or read_pages(file_path)
+    if read is None:
+        return None
+    pages, page_count = read
+
+    if not pages or (page_count > len(pages) and not allow_partial):
+        return None
+    if not allow_partial and sum(len(text) for _, text, _ in pages) > max_chars:
+        return None
+
+    ranked = [pages[0]] + sorted(pages[1:], key=lambda p: _relevance(p[1], keywords), reverse=True)
+    selected, used = [], 0
+    for page in ranked:
+        if selected and used + len(page[1]) > max_chars:
+            continue
+        selected.append(page)
+        used += len(page[1])
+    selected.sort(key=lambda p: p[0])
+
+    return {
+        "pages": [index for index, _, _ in selected],
+        "text": "\n\n".join(f"[Page {index + 1}]\n{text.strip()}" for index, text, _ in selected),
+        "vision_pages": [index for index, _, needs_vision in selected if needs_vision],
+        "page_count": page_count,
+    }
+
+
+def page_subset_pdf(file_path: str, page_indexes: list) -> bytes:
+    """A new PDF (as bytes) holding only the given pages of `file_path`."""
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for index in page_indexes:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def document_contents(client, file_path: str, content_hash: str = None, keywords: tuple = (),
+                      max_chars: int = 12000, allow_partial: bool = True, read=None) -> list:
+    """
+    The smallest `contents` entries that represent the document for the model:
+    extracted text, an inline PDF of only the relevant pages, or the uploaded file.
+    """
+    analysis = analyse_pdf(file_path, keywords, max_chars, allow_partial, read)
+
+    if analysis is not None and not analysis["vision_pages"]:
+        print(f"[PDF TEXT] Sending text of {len(analysis['pages'])}/{analysis['page_count']} pages "
+              f"({len(analysis['text'])} chars) instead of the file.")
+        return [f"--- DOCUMENT TEXT ({os.path.basename(file_path)}) ---\n{analysis['text']}"]
+
+    if analysis is not None and len(analysis["pages"]) < analysis["page_count"]:
+        try:
+            subset = page_subset_pdf(file_path, analysis["pages"])
+        except Exception as e:
+            subset = None
+            print(f"[PDF TEXT] Could not split {file_path} ({e}); uploading instead.")
+        if subset is not None and len(subset) <= MAX_INLINE_PDF_BYTES:
+            print(f"[PDF TEXT] Pages {[i + 1 for i in analysis['vision_pages']]} need vision; "
+                  f"sending {len(analysis['pages'])}/{analysis['page_count']} pages inline.")
+            return [types.Part.from_bytes(data=subset, mime_type="application/pdf")]
+
+    # Not a PDF, unreadable, or every page is needed as an image: upload (cached)
+    return [get_or_upload(client, file_path, content_hash)]
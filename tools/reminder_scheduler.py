@@ -0,0 +1,162 @@
+# tools/reminder_scheduler.py
+#
+# Event-driven reminder delivery.
+# Upcoming reminders are kept in an in-memory min-heap keyed by fire time. One daemon
+# thread sleeps on a Condition until the earliest one is due (or a sooner reminder is
+# added), so there is no polling loop and the interactive CLI is never blocked.
+# Only reminders due within LOAD_HORIZON_S are held in memory; the heap is refilled
+# from the indexed `reminders` table when the horizon is reached.
+
+import heapq
+import math
+import threading
+import time
+from datetime import datetime
+
+from database.memory_service import (
+    DEFAULT_STUDENT_ID, current_student_id, insert_reminder, get_pending_reminders, mark_reminder_fired
+)
+
+LOAD_HORIZON_S = 6 * 3600     # reminders further out stay in the database until needed
+LOAD_BATCH = 1000             # max rows pulled into the heap per refill
+
+
+def print_reminder(reminder: dict) -> None:
+    """Default delivery: print to the console (the CLI prompt keeps working)."""
+    student = "" if reminder["student_id"] == DEFAULT_STUDENT_ID else f" for {reminder['student_id']}"
+    print(f"\n\n🔔 REMINDER{student} ({reminder['target_datetime']}): {reminder['reminder_text']}\n")
+
+
+class ReminderScheduler:
+    """
+    Min-heap of (target_ts, (student_id, reminder_id), reminder) plus a worker that waits
+    for the head. One scheduler serves every student (and every shard).
+
+    Reminders are persisted before they are scheduled and claimed with
+    mark_reminder_fired() before delivery, so a restart re-loads anything still pending
+    and several processes sharing the database deliver each reminder once.
+    """
+
+    def __init__(self, deliver=print_reminder):
+        self.deliver = deliver
+        self._heap = []
+        self._queued_keys = set()
+        self._loaded_until = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def add(self, reminder_text: str, target: datetime, task_id: int = None) -> int:
+        """Saves a reminder for the current student at the local time `target` and schedules it; returns its ID or -1."""
+        reminder_id = insert_reminder(reminder_text, target, task_id)
+        if reminder_id == -1:
+            return -1
+        reminder = {
+            "id": reminder_id,
+            "reminder_text": reminder_text,
+            "target_datetime": target.strftime("%Y-%m-%d %H:%M:%S"),
+            "target_ts": math.ceil(target.timestamp()),  # as stored by insert_reminder()
+            "task_id": task_id,
+            "student_id": current_student_id(),
+        }
+        with self._cond:
+            # Beyond the loaded horizon the next refill picks it up from the database
+            if reminder["target_ts"] < self._loaded_until:
+                self._push(reminder)
+        return reminder_id
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    # --- Worker ---
+
+    def _push(self, reminder: dict) -> None:
+        # Reminder IDs are only unique within one student's database shard
+        key = (reminder["student_id"], reminder["id"])
+        if key in self._queued_keys:
+            return
+        self._queued_keys.add(key)
+        heapq.heappush(self._heap, (reminder["target_ts"], key, reminder))
+        if self._heap[0][1] == key:
+            self._cond.notify()  # new earliest reminder: re-arm the wait
+
+    def _refill(self, now: float) -> None:
+        until = int(now) + LOAD_HORIZON_S
+        rows = get_pending_reminders(until, LOAD_BATCH)
+        for reminder in rows:
+            self._push(reminder)
+        # A full batch may have cut off the horizon early; continue from its last row
+        self._loaded_until = rows[-1]["target_ts"] if len(rows) == LOAD_BATCH else until
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                if now >= self._loaded_until:
+                    self._refill(now)
+
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, key, reminder = heapq.heappop(self._heap)
+                    self._queued_keys.discard(key)
+                    due.append(reminder)
+
+                if due:
+                    # Deliver without holding the lock, so add() never waits on a slow callback
+                    self._cond.release()
+                    try:
+                        self._fire(due)
+                    finally:
+                        self._cond.acquire()
+                    continue
+
+                next_ts = self._heap[0][0] if self._heap else self._loaded_until
+                self._cond.wait(timeout=max(0.0, min(next_ts, self._loaded_until) - now))
+
+    def _fire(self, due: list) -> None:
+        for reminder in due:
+            if not mark_reminder_fired(reminder["id"], reminder["student_id"]):
+                continue  # already delivered elsewhere
+            try:
+                self.deliver(reminder)
+            except Exception as e:
+                print(f"[REMINDERS] Delivery failed for reminder {reminder['id']}: {e}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_reminder_scheduler(deliver=None) -> ReminderScheduler:
+    """
+    Returns the process-wide scheduler, started on first use.
+
+    Args:
+        deliver: Delivery callback to use instead of print_reminder(). It is set before
+            the worker starts, so reminders already due at startup reach it too.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReminderScheduler(deliver or print_reminder)
+            _scheduler.start()
+        elif deliver is not None:
+            _scheduler.deliver = deliver
+        return _scheduler
@@ -1,124 +1,138 @@
 
 # tools/task_extractor_tool.py
 
-from google import genai
+from tools.gemini_client import get_client, generate_content
 from google.genai import types
 from google.genai.errors import ClientError # <-- NEW IMPORT
+from tools.upload_cache import file_sha256
+from tools.pdf_text import document_contents, ASSIGNMENT_KEYWORDS
+from tools import extraction_cache
 import json
 import os
 from datetime import datetime, timedelta
-import time
 # print(os.environ.get('GEMINI_API_KEY'))
-client = genai.Client()
-MAX_RETRIES = 5
+EXTRACTION_MODEL = "gemini-2.5-flash"
+EXTRACTION_MAX_CHARS = 12000 # text budget when a PDF is sent as extracted text
 
-def extract_assignment_details(file_path: str) -> dict:
+# --- Extraction Prompt and Structure ---
 
-    """
-    Uploads a file (PDF, image, text) and extracts structured assignment details, with Exponential Backoff for 429 errors.
+# We use JSON schema to force the model to return clean, structured data.
 
-    Args:
+EXTRACTION_SCHEMA = {
 
-        file_path: Path to the input file (assignment details).
+    "type": "object",
 
-    Returns:
+    "properties": {
 
-        A dictionary containing the extracted assignment details.
+        "deadline": {"type": "string", "description": "The date and time the assignment is due, in YYYY-MM-DD HH:MM format."},
 
-    """
+        "task_type": {"type": "string", "description": "e.g., 'Essay', 'Presentation', 'Problem Set', 'Lab Report', 'Reading'"},
 
-    if not os.path.exists(file_path):
+        "subject": {"type": "string", "description": "The course or topic the assignment belongs to, e.g., 'Calculus', 'Microeconomics'"},
 
-        return {"error": f"File not found at: {file_path}"}
+        "priority": {"type": "string", "description": "One of: 'High', 'Medium', 'Low'. Based on deadline and difficulty."},
 
-    print(f"\n[Extraction Tool] Uploading file for analysis: {file_path}")
+        "word_count_or_length": {"type": "string", "description": "Required length, e.g., '2000 words', '10 slides', 'Chapter 5'"},
 
-    # --- 1. Upload File ---
-    # --- 1. Upload File ---
-    assignment_file = None
-    extracted_data = {}
-    try:
-        assignment_file = client.files.upload(file=file_path)
+        "description_snippet": {"type": "string", "description": "A very short (5-10 word) summary of the task."},
 
-    except Exception as e:
-        return {"error": f"Failed to upload file: {e}"}
 
-    # --- 2. Define Extraction Prompt and Structure ---
+    },
 
-    # We use JSON schema to force the model to return clean, structured data.
+    "required": ["deadline", "task_type", "subject", "priority"]
 
-    json_schema = {
+}
 
-        "type": "object",
+EXTRACTION_PROMPT = (
 
-        "properties": {
+    "Analyze the provided document (which may be a PDF, image, or text) "
 
-            "deadline": {"type": "string", "description": "The date and time the assignment is due, in YYYY-MM-DD HH:MM format."},
+    "and extract the required assignment details into a perfect JSON object. "
 
-            "task_type": {"type": "string", "description": "e.g., 'Essay', 'Presentation', 'Problem Set', 'Lab Report', 'Reading'"},
+    "Infer any missing information (like priority) based on the context."
 
-            "subject": {"type": "string", "description": "The course or topic the assignment belongs to, e.g., 'Calculus', 'Microeconomics'"},
+)
 
-            "priority": {"type": "string", "description": "One of: 'High', 'Medium', 'Low'. Based on deadline and difficulty."},
+# Cached results are only valid for this exact schema + prompt (see tools/extraction_cache.py)
+EXTRACTION_VERSION = extraction_cache.schema_hash(EXTRACTION_SCHEMA, EXTRACTION_PROMPT)
 
-            "word_count_or_length": {"type": "string", "description": "Required length, e.g., '2000 words', '10 slides', 'Chapter 5'"},
+def _extract_with_model(file_path: str, content_hash: str) -> dict:
+    """Prepares the document (local text, relevant pages, or upload) and runs the JSON extraction."""
+    print(f"\n[Extraction Tool] Preparing file for analysis: {file_path}")
 
-            "description_snippet": {"type": "string", "description": "A very short (5-10 word) summary of the task."},
+    # --- 1. Prepare the Document ---
+    # Born-digital PDFs are sent as the text of their relevant pages (no upload); scans and
+    # images go through the shared, content-addressed upload cache (see tools/pdf_text.py).
+    extracted_data = {}
+    try:
+        document = document_contents(
+            get_client(), file_path, content_hash,
+            keywords=ASSIGNMENT_KEYWORDS, max_chars=EXTRACTION_MAX_CHARS
+        )
 
-            
-        },
+    except Exception as e:
+        return {"error": f"Failed to read/prepare document: {e}"}
 
-        "required": ["deadline", "task_type", "subject", "priority"]
+    # --- 2. Generate Content (JSON Extraction) ---
+    # Rate limiting and backoff on 429/5xx are handled centrally by tools.gemini_client.
+    try:
+        response = generate_content(
+            model=EXTRACTION_MODEL,
+            contents=document + [EXTRACTION_PROMPT],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=EXTRACTION_SCHEMA
+            )
+        )
+        extracted_data = json.loads(response.text)
 
-    }
+    except ClientError as e:
+        # Unrecoverable ClientError or retries exhausted
+        extracted_data = {"error": f"API/Extraction failed: {e}"}
 
-    extraction_prompt = (
+    except json.JSONDecodeError as e:
+        # Handle case where the LLM returns text instead of valid JSON
+        extracted_data = {"error": f"JSON parsing failed: {e}. Raw LLM output was likely invalid."}
 
-        "Analyze the provided document (which may be a PDF, image, or text) "
+    except Exception as e:
+        extracted_data = {"error": f"General Extraction failure: {e}"}
 
-        "and extract the required assignment details into a perfect JSON object. "
+    return extracted_data
 
-        "Infer any missing information (like priority) based on the context."
+def extract_assignment_details(file_path: str) -> dict:
 
-    )
-    # --- 3. Generate Content (JSON Extraction) ---
+    """
+    Uploads a file (PDF, image, text) and extracts structured assignment details (rate-limited, with backoff on 429 errors).
+
+    Args:
+
+        file_path: Path to the input file (assignment details).
+
+    Returns:
+
+        A dictionary containing the extracted assignment details.
+
+    """
+
+    if not os.path.exists(file_path):
+
+        return {"error": f"File not found at: {file_path}"}
+
+    # --- 0. Check the persistent result cache (no network call on a hit) ---
+    content_hash = file_sha256(file_path)
+    extracted_data = extraction_cache.get(content_hash, EXTRACTION_MODEL, EXTRACTION_VERSION)
+
+    if extracted_data is not None:
+        print(f"\n[Extraction Tool] Cache hit for {file_path}; skipping upload and model call.")
+    else:
+        extracted_data = _extract_with_model(file_path, content_hash)
+        if 'error' not in extracted_data:
+            # Cache the raw model output; the deadline safeguard below runs on every call
+            # so a defaulted deadline is always relative to *now*.
+            extraction_cache.put(content_hash, EXTRACTION_MODEL, EXTRACTION_VERSION, extracted_data)
+        else:
+            extraction_cache.record_failure(file_path, content_hash, extracted_data['error'])
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[assignment_file, extraction_prompt],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=json_schema
-                )
-            )
-            
-            # If successful, parse and break the retry loop
-            extracted_data = json.loads(response.text)
-            break # Success, exit the loop
-            
-        except ClientError as e:
-            if e.status_code == 429 and attempt < MAX_RETRIES - 1:
-                # Exponential Backoff: Wait 2^attempt seconds, max 16s
-                wait_time = 2 ** attempt
-                print(f"[EXTRACTION TOOL] Rate limit hit (429). Waiting {wait_time}s before retry ({attempt + 1}/{MAX_RETRIES}).")
-                time.sleep(wait_time)
-                continue # Retry
-            else:
-                # Unrecoverable ClientError or max retries reached
-                extracted_data = {"error": f"API/Extraction failed on attempt {attempt+1}: {e}"}
-                break # Exit loop
-        
-        except json.JSONDecodeError as e:
-            # Handle case where the LLM returns text instead of valid JSON
-            extracted_data = {"error": f"JSON parsing failed: {e}. Raw LLM output was likely invalid."}
-            break # Exit loop
-        
-        except Exception as e:
-            extracted_data = {"error": f"General Extraction failure: {e}"}
-            break # Exit loop
-            
     # --- 4. Clean up the uploaded file ---
     # ... (Cleanup logic remains the same) ...
 
@@ -0,0 +1,257 @@
+# tools/tracing.py
+#
+# Per-request tracing: where did the time of one request go?
+# A request opens a root span with trace(); model calls, tool runs, uploads and SQLite
+# statements inside it open child spans with span(). Spans carry attributes such as
+# token usage (from response.usage_metadata), retries and cache hits. Finished traces
+# are kept in memory (last_trace()), rendered by flame_summary(), and, if the
+# AGENT_TRACE_FILE environment variable is set, appended to that file as JSON lines.
+#
+# The current span lives in a ContextVar, so it follows asyncio tasks. Thread pools do
+# not inherit it: submit bind(func) instead of func to keep the worker's spans in the
+# request's trace. Outside a trace, span() does nothing (background threads, imports).
+
+import collections
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_FILE = os.environ.get("AGENT_TRACE_FILE")   # JSON lines export; unset = memory only
+KEEP_LAST_TRACES = 20
+
+_current_span = contextvars.ContextVar("trace_current_span", default=None)
+_recent_traces = collections.deque(maxlen=KEEP_LAST_TRACES)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation. Children are appended from any thread, under the trace's lock."""
+
+    def __init__(self, name: str, parent=None, attrs: dict = None):
+        self.name = name
+        self.parent = parent
+        self.attrs = dict(attrs or {})
+        self.children = []
+        self.span_id = uuid.uuid4().hex[:16]
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        if parent is None:
+            self.trace_id = uuid.uuid4().hex
+            self.started_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+            self._lock = threading.Lock()
+        else:
+            self.trace_id = parent.trace_id
+            self._lock = parent._lock
+            with self._lock:
+                parent.children.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def set(self, key: str, value) -> None:
+        self.attrs[key] = value
+
+    def add(self, key: str, amount=1) -> None:
+        with self._lock:
+            self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def walk(self):
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+
+class _NoSpan:
+    """Stand-in yielded by span() outside a trace, so callers never need to check."""
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def active() -> bool:
+    return _current_span.get() is not None
+
+
+@contextmanager
+def _enter(span_obj: Span):
+    token = _current_span.set(span_obj)
+    try:
+        yield span_obj
+    except BaseException as e:
+        span_obj.set("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        span_obj.end = time.perf_counter()
+        _current_span.reset(token)
+        if span_obj.parent is None:
+            _finish_trace(span_obj)
+
+
+def trace(name: str, **attrs):
+    """Starts a new trace (or, inside one, a child span) around a whole request."""
+    return _enter(Span(name, _current_span.get(), attrs))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a block as a child of the current span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NO_SPAN
+        return
+    with _enter(Span(name, parent, attrs)) as span_obj:
+        yield span_obj
+
+
+def current():
+    """The innermost open span, or a no-op stand-in outside a trace."""
+    return _current_span.get() or _NO_SPAN
+
+
+def record_usage(span_obj, response) -> None:
+    """Adds a response's token counts (usage_metadata) to `span_obj`."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for attr, key in (("prompt_token_count", "prompt_tokens"),
+                      ("candidates_token_count", "output_tokens"),
+                      ("cached_content_token_count", "cached_tokens"),
+                      ("thoughts_token_count", "thought_tokens")):
+        value = getattr(usage, attr, None)
+        if value:
+            span_obj.add(key, value)
+
+
+def bind(func):
+    """Wraps `func` so that, run on another thread, its spans join the caller's trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def run_in_trace(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run_in_trace
+
+
+def traced(name: str):
+    """Decorator form of trace() for sync and async functions."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with trace(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Export ---
+
+def _span_record(span_obj: Span, root: Span) -> dict:
+    record = {
+        "trace_id": span_obj.trace_id,
+        "span_id": span_obj.span_id,
+        "parent_id": span_obj.parent.span_id if span_obj.parent else None,
+        "name": span_obj.name,
+        "start_ms": round((span_obj.start - root.start) * 1000, 3),
+        "duration_ms": round(span_obj.duration_ms, 3),
+        "thread": span_obj.thread,
+        "attrs": span_obj.attrs,
+    }
+    if span_obj is root:
+        record["started_at"] = root.started_at
+    return record
+
+
+def to_records(root: Span) -> list:
+    """All spans of a trace as JSON-serialisable dicts, parents before children."""
+    return [_span_record(s, root) for s in root.walk()]
+
+
+def export_jsonl(root: Span, path: str) -> None:
+    lines = [json.dumps(record, default=str) for record in to_records(root)]
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _finish_trace(root: Span) -> None:
+    _recent_traces.append(root)
+    if TRACE_FILE:
+        try:
+            export_jsonl(root, TRACE_FILE)
+        except OSError as e:
+            print(f"[TRACING] Could not write {TRACE_FILE}: {e}")
+
+
+def last_trace():
+    """The most recently finished trace in this process, or None."""
+    return _recent_traces[-1] if _recent_traces else None
+
+
+# --- Flame summary ---
+# Sibling spans with the same name are merged (as in a flame graph), so a request with
+# 40 SQLite statements shows one "db x40" line. Concurrent siblings (parallel tools,
+# chunk summaries) overlap, so their total can exceed the parent's wall time.
+
+def _numeric_attrs(spans: list) -> dict:
+    totals = {}
+    for s in spans:
+        for key, value in s.attrs.items():
+            if isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + int(value)
+            elif isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _summary_lines(spans: list, depth: int, root_ms: float, lines: list) -> None:
+    groups = collections.OrderedDict()
+    for s in spans:
+        groups.setdefault(s.name, []).append(s)
+
+    for name, group in groups.items():
+        total_ms = sum(s.duration_ms for s in group)
+        label = "  " * depth + name + (f" x{len(group)}" if len(group) > 1 else "")
+        extras = " ".join(
+            f"{key}={value:g}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in _numeric_attrs(group).items() if value
+        )
+        share = 100 * total_ms / root_ms if root_ms else 0.0
+        lines.append(f"{label:<44}{total_ms:>10.1f} ms {share:>5.0f}%  {extras}".rstrip())
+        _summary_lines([c for s in group for c in s.children], depth + 1, root_ms, lines)
+
+
+def flame_summary(root: Span = None) -> str:
+    """Indented per-stage time and attribute totals of a trace (default: the last one)."""
+    root = root or last_trace()
+    if root is None:
+        return "No trace recorded."
+    lines = [f"Trace {root.trace_id[:8]} ({root.started_at})"]
+    _summary_lines([root], 0, root.duration_ms, lines)
+    return "\n".join(lines)
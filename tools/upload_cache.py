@@ -0,0 +1,125 @@
+# tools/upload_cache.py
+#
+# Content-addressed cache of files uploaded to the Gemini Files API.
+# The summarizer and the extractor often receive the same PDF in one orchestrator run;
+# both now go through get_or_upload(), which uploads each distinct file content once
+# and reuses the remote handle (across tools and processes) until it nears expiry.
+
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+from database import memory_service
+from tools import tracing
+
+HASH_CHUNK_SIZE = 1024 * 1024          # stream files in 1 MB blocks
+UPLOAD_TTL = timedelta(hours=48)       # Gemini deletes uploaded files after 48h
+EXPIRY_SAFETY_MARGIN = timedelta(hours=1)
+MAX_CACHED_UPLOADS = 100               # LRU bound on live remote files
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# One lock per content hash so concurrent tools never upload the same file twice.
+_hash_locks = {}
+_hash_locks_guard = threading.Lock()
+
+
+def file_sha256(file_path: str) -> str:
+    """Computes the SHA-256 of a file without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _lock_for(content_hash: str) -> threading.Lock:
+    with _hash_locks_guard:
+        return _hash_locks.setdefault(content_hash, threading.Lock())
+
+
+def get_or_upload(client, file_path: str, content_hash: str = None):
+    """
+    Returns a Gemini file handle for `file_path`, uploading only if this content
+    has not been uploaded before (or its remote copy is about to expire).
+
+    Args:
+        client: The genai.Client used for uploads and remote deletes.
+        file_path: Local path of the file.
+        content_hash: Pre-computed file_sha256(file_path), if the caller already has it.
+
+    Returns:
+        A types.File usable directly in generate_content contents.
+    """
+    with tracing.span("upload", file=os.path.basename(file_path)) as upload_span:
+        return _get_or_upload(client, file_path, content_hash, upload_span)
+
+
+def _get_or_upload(client, file_path: str, content_hash: str, upload_span):
+    content_hash = content_hash or file_sha256(file_path)
+    now = _utcnow()
+
+    with _lock_for(content_hash):
+        cached = memory_service.get_cached_upload(content_hash)
+        if cached:
+            expires_at = datetime.strptime(cached["expires_at"], TIME_FORMAT)
+            if expires_at - EXPIRY_SAFETY_MARGIN > now:
+                memory_service.touch_cached_upload(content_hash, now.strftime(TIME_FORMAT))
+                print(f"[UPLOAD CACHE] Reusing uploaded file {cached['remote_name']} for {file_path}")
+                upload_span.set("cache_hit", True)
+                return types.File(
+                    name=cached["remote_name"],
+                    uri=cached["remote_uri"],
+                    mime_type=cached["mime_type"],
+                )
+
+        upload_span.set("cache_hit", False)
+        upload_span.set("size_bytes", os.path.getsize(file_path))
+        uploaded = client.files.upload(file=file_path)
+
+        expires_at = uploaded.expiration_time
+        if expires_at is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            expires_at = now + UPLOAD_TTL
+
+        memory_service.save_cached_upload(
+            content_hash,
+            uploaded.name,
+            uploaded.uri,
+            uploaded.mime_type,
+            os.path.getsize(file_path),
+            expires_at.strftime(TIME_FORMAT),
+            now.strftime(TIME_FORMAT),
+        )
+
+    # Only a new upload can push the cache over its bound, so evict here, not on hits.
+    evict_uploads(client)
+    return uploaded
+
+
+def evict_uploads(client, max_entries: int = MAX_CACHED_UPLOADS) -> int:
+    """
+    Drops expired entries and the least recently used entries beyond `max_entries`,
+    deleting their remote files. Returns the number of entries evicted.
+    """
+    expires_before = (_utcnow() + EXPIRY_SAFETY_MARGIN).strftime(TIME_FORMAT)
+    evicted = 0
+
+    for entry in memory_service.get_evictable_uploads(expires_before, max_entries):
+        try:
+            client.files.delete(name=entry["remote_name"])
+        except Exception as e:
+            # Expired files are already gone on the server; nothing else to do.
+            print(f"[UPLOAD CACHE] Could not delete remote file {entry['remote_name']}: {e}")
+        memory_service.delete_cached_upload(entry["content_hash"])
+        evicted += 1
+
+    return evicted